@@ -0,0 +1,116 @@
+"""
+Administrative endpoints (ingestion).
+
+Disabled unless the ADMIN_TOKEN env var is set; requests then need an
+`Authorization: Bearer <token>` header.
+"""
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.dependencies import get_ingester
+from app.rate_limiter import limiter
+from core.config import get_env
+from core.constants import MAX_INGEST_BYTES
+from core.exceptions import IngestError
+from models.schemas import IngestResponse
+from services.ingest_service import IngestService
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+ADMIN_TOKEN_ENV = "ADMIN_TOKEN"
+
+router = APIRouter()
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Read a request body of at most max_bytes.
+
+    A declared Content-Length over the limit is refused before anything is
+    read; otherwise the body is streamed and reading stops as soon as it
+    passes the limit, so an oversized upload is never held in memory.
+
+    Raises:
+        HTTPException: 413 when the body is larger than max_bytes, 400 on a
+            malformed Content-Length
+    """
+    too_large = HTTPException(status_code=413, detail=f"CSV is too large. Send at most {max_bytes} bytes per request.")
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        try:
+            if int(declared) > max_bytes:
+                raise too_large
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header.")
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _authorize(authorization: Optional[str]) -> None:
+    """
+    Check the bearer token against ADMIN_TOKEN.
+
+    Raises:
+        HTTPException: 403 when admin endpoints are disabled, 401 on a missing or wrong token
+    """
+    token = get_env(ADMIN_TOKEN_ENV, "")
+    if not token:
+        raise HTTPException(status_code=403, detail=f"Admin endpoints are disabled. Set {ADMIN_TOKEN_ENV} to enable them.")
+    scheme, _, supplied = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+@router.post("/admin/ingest", response_model=IngestResponse)
+@limiter.limit("10/minute")
+async def ingest(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    ingester: Optional[IngestService] = Depends(get_ingester),
+):
+    """
+    Append rows to the data from a CSV request body.
+
+    The CSV needs a header row with at least the date, open, high, low,
+    close, volume and marketcap columns. Rows dated at or before the last
+    stored row are skipped. New rows are inserted into ClickHouse (with that
+    backend), appended to the local store and applied to the range
+    aggregate index, and cached results are invalidated.
+
+    Args:
+        authorization: Bearer token matching ADMIN_TOKEN
+        ingester: Ingestion service dependency (None without a local store)
+
+    Returns:
+        Ingestion response with row counts and the new date range
+    """
+    _authorize(authorization)
+    if ingester is None:
+        raise HTTPException(status_code=503, detail="Ingestion needs the local store (LOCAL_DATA_PATH).")
+
+    body = await _read_body(request, MAX_INGEST_BYTES)
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8.")
+
+    try:
+        result = await run_in_threadpool(ingester.ingest_csv, text)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Ingestion failed")
+        raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
+    return result._asdict()
@@ -6,6 +6,8 @@ import logging
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from db.client import DatabaseClient
 from models.schemas import EvalResponse, EvalTestCase
@@ -40,13 +42,13 @@ def _load_default_test_cases() -> list[EvalTestCase]:
 
 @router.get("/evals/run", response_model=EvalResponse)
 @limiter.limit("10/minute")
-def run_evals(
+async def run_evals(
     request: Request,
     db: DatabaseClient = Depends(get_database),
     generator: SQLGenerator = Depends(get_generator),
 ):
     """
-    Run evaluation test cases.
+    Run evaluation test cases concurrently and return the summary.
 
     Uses default test cases defined in cfg_evals.json.
 
@@ -59,5 +61,41 @@ def run_evals(
     """
     test_cases = _load_default_test_cases()
     eval_service = EvalService(db, generator)
-    result = eval_service.run_evals(test_cases)
+    result = await eval_service.arun_evals(test_cases)
     return EvalResponse(**result)
+
+
+@router.get("/evals/stream")
+@limiter.limit("10/minute")
+async def stream_evals(
+    request: Request,
+    db: DatabaseClient = Depends(get_database),
+    generator: SQLGenerator = Depends(get_generator),
+):
+    """
+    Run evaluation test cases, streaming results as NDJSON.
+
+    Emits one {"type": "result", "index": ..., "result": ...} line per case in
+    completion order, then a final {"type": "summary", ...} line shaped like
+    EvalResponse with results in test case order.
+
+    Args:
+        db: Database client dependency
+        generator: SQL generator dependency
+
+    Returns:
+        Streaming NDJSON response
+    """
+    test_cases = _load_default_test_cases()
+    eval_service = EvalService(db, generator)
+
+    async def lines():
+        results = [None] * len(test_cases)
+        async for index, result in eval_service.astream_evals(test_cases):
+            results[index - 1] = result
+            event = {"type": "result", "index": index, "total": len(test_cases), "result": result}
+            yield json.dumps(jsonable_encoder(event)) + "\n"
+        summary = {"type": "summary", **eval_service.summarize(results)}
+        yield json.dumps(jsonable_encoder(summary)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
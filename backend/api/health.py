@@ -1,8 +1,9 @@
 """
-Health check endpoint.
+Health check endpoints.
 """
 from fastapi import APIRouter, Request
 
+from app.instances import connection_stats
 from app.rate_limiter import limiter
 
 router = APIRouter()
@@ -13,3 +14,8 @@ router = APIRouter()
 def health(request: Request):
     return {"ok": True}
 
+
+@router.get("/health/connections")
+@limiter.limit("30/minute")
+def health_connections(request: Request):
+    return connection_stats()
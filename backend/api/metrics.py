@@ -0,0 +1,24 @@
+"""
+Prometheus metrics endpoint.
+"""
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from app.rate_limiter import limiter
+from utils.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+@limiter.limit("60/minute")
+def metrics(request: Request):
+    """
+    Query pipeline metrics of the worker that answers, in Prometheus text format.
+
+    Returns:
+        Per-stage latency histograms, in-flight gauges, error counts by
+        exception class, cache hit/miss counters, questions answered by
+        each SQL path (rules, cache, llm) and result row counts
+    """
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -2,17 +2,31 @@
 Query endpoint for natural language to SQL conversion.
 """
 import logging
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 
 from core.constants import MAX_QUESTION_LENGTH
-from core.exceptions import DateRangeError, QueryExecutionError, SQLGenerationError
+from core.exceptions import (
+    DateRangeError,
+    GenerationRateLimitError,
+    InvalidCursorError,
+    QueryCostError,
+    QueryExecutionError,
+    SQLGenerationError,
+)
 from db.client import DatabaseClient
-from models.schemas import QueryRequest, QueryResponse
-from services.query_service import QueryService
+from db.range_index import RangeAggregateIndex
+from models.schemas import BatchQueryRequest, BatchQueryResponse, PageRequest, QueryRequest, QueryResponse
+from services.query_service import QueryService, join_warnings
 from services.sql_generator import SQLGenerator
-from app.dependencies import get_database, get_generator
-from app.rate_limiter import limiter
+from utils.result_formats import FORMAT_JSON, UnsupportedFormatError, format_response, negotiate_format
+from utils.metrics import stage
+from utils.tracing import current_trace
+from utils.serialization import dumps, json_response
+from app.dependencies import get_database, get_generator, get_index
+from app.rate_limiter import charge_generation, limiter
 
 logger = logging.getLogger(__name__)
 
@@ -21,19 +35,33 @@ router = APIRouter()
 
 @router.post("/query", response_model=QueryResponse)
 @limiter.limit("10/minute")
-def query(
+async def query(
     request: Request,
     body: QueryRequest,
     db: DatabaseClient = Depends(get_database),
     generator: SQLGenerator = Depends(get_generator),
+    range_index: Optional[RangeAggregateIndex] = Depends(get_index),
+    response_format: Optional[str] = Query(
+        None,
+        alias="format",
+        description="json (default), columnar, arrow or msgpack; overrides the Accept header",
+    ),
 ):
     """
     Generate SQL from natural language query and execute it.
     
+    The result format is negotiated from the `format` parameter or the Accept
+    header (see utils/result_formats.py); the default is the row-oriented
+    QueryResponse JSON. Large row listings in JSON are returned a page at a
+    time, with `next_cursor` for /query/page; other formats apply the query
+    budget's LIMIT instead.
+    
     Args:
         body: Query request with natural language question
         db: Database client dependency
         generator: SQL generator dependency
+        range_index: Range aggregate index dependency (None when disabled)
+        response_format: Requested result format
         
     Returns:
         Query response with SQL and results
@@ -46,37 +74,266 @@ def query(
         )
     
     try:
-        query_service = QueryService(db, generator)
-        result = query_service.execute_query(body.question)
-        return QueryResponse(**result)
-    except SQLGenerationError as e:
-        logger.error(f"SQL generation failed: {str(e)}")
+        fmt = negotiate_format(response_format, request.headers.get("accept"))
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    
+    try:
+        query_service = QueryService(db, generator, range_index)
+        if fmt != FORMAT_JSON:
+            columnar = await query_service.aexecute_query_columns(body.question)
+            with stage("serialize"):
+                return format_response(
+                    fmt,
+                    columnar["result"],
+                    columnar["sql"],
+                    columnar["source"],
+                    columnar["warning"],
+                    request,
+                    sql_source=columnar["sql_source"],
+                )
+        result = await query_service.aexecute_query(body.question)
+        trace = current_trace()
+        if trace is not None:
+            result["timings"] = trace.timings()
+        # The payload is built by QueryService, so skip response-model validation
+        with stage("serialize"):
+            return json_response(dict(QueryResponse.model_construct(**result)), request)
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.post("/query/page", response_model=QueryResponse)
+@limiter.limit("60/minute")
+async def query_page(
+    request: Request,
+    body: PageRequest,
+    db: DatabaseClient = Depends(get_database),
+):
+    """
+    Fetch the next page of a paginated /query result.
+    
+    The SQL comes from the cursor, so no SQL is generated. The response has
+    the same shape as /query, with `next_cursor` unset on the last page.
+    
+    Args:
+        body: Page request with the cursor from an earlier response
+        db: Database client dependency
+        
+    Returns:
+        Query response with the page SQL and its rows
+    """
+    try:
+        result = await QueryService(db, None).aexecute_page(body.cursor)
+        trace = current_trace()
+        if trace is not None:
+            result["timings"] = trace.timings()
+        with stage("serialize"):
+            return json_response(dict(QueryResponse.model_construct(**result)), request)
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.post("/query/batch", response_model=BatchQueryResponse)
+@limiter.limit("10/minute")
+async def query_batch(
+    request: Request,
+    body: BatchQueryRequest,
+    db: DatabaseClient = Depends(get_database),
+    generator: SQLGenerator = Depends(get_generator),
+    range_index: Optional[RangeAggregateIndex] = Depends(get_index),
+):
+    """
+    Generate and execute SQL for many questions in one request.
+    
+    Repeated questions run once and questions are processed concurrently
+    (see QueryService.aexecute_batch). Each item carries either the fields
+    of a /query response or the status code and detail /query would have
+    failed with; a failing item never fails the batch.
+    
+    Besides the per-request limit, each unique question that starts an
+    OpenAI request (not answered by the rules or the SQL cache, and not
+    joining an identical request already in flight) is charged against the
+    client's per-minute generation budget; questions over it fail with 429.
+    
+    Args:
+        body: Batch request with natural language questions
+        db: Database client dependency
+        generator: SQL generator dependency
+        range_index: Range aggregate index dependency (None when disabled)
+        
+    Returns:
+        Batch response with one result per question, in input order
+    """
+    query_service = QueryService(db, generator, range_index)
+    accepted = [q for q in body.questions if len(q) <= MAX_QUESTION_LENGTH]
+    
+    def charge() -> None:
+        if not charge_generation(request):
+            raise GenerationRateLimitError(
+                "Rate limit exceeded for questions that need SQL generation. Try again in a minute."
+            )
+    
+    outcomes = iter(await query_service.aexecute_batch(accepted, before_model=charge))
+    
+    results = []
+    for question in body.questions:
+        if len(question) > MAX_QUESTION_LENGTH:
+            outcome = HTTPException(
+                status_code=400,
+                detail=f"Question is too long. Please keep it under {MAX_QUESTION_LENGTH} characters."
+            )
+        else:
+            outcome = next(outcomes)
+        
+        if isinstance(outcome, Exception):
+            error = _http_error(outcome)
+            results.append({
+                "question": question,
+                "ok": False,
+                "status_code": error.status_code,
+                "error": error.detail,
+            })
+        else:
+            results.append({"question": question, "ok": True, **outcome})
+    
+    succeeded = sum(1 for item in results if item["ok"])
+    # The payload is built here, so skip response-model validation
+    return json_response({
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }, request)
+
+
+@router.post("/query/stream")
+@limiter.limit("10/minute")
+async def stream_query(
+    request: Request,
+    body: QueryRequest,
+    db: DatabaseClient = Depends(get_database),
+    generator: SQLGenerator = Depends(get_generator),
+    range_index: Optional[RangeAggregateIndex] = Depends(get_index),
+):
+    """
+    Generate SQL from natural language query and stream its results as NDJSON.
+    
+    Rows are read from the database and sanitized block by block, so memory
+    use is bounded by the block size rather than the result size. Lines:
+    {"type": "meta", "sql", "columns", "source", "sql_source"}, then one
+    {"type": "rows", "rows"} per block, then {"type": "end", "row_count",
+    "warning"}. A failure after streaming started is reported as a final
+    {"type": "error", "detail"} line.
+    
+    Args:
+        body: Query request with natural language question
+        db: Database client dependency
+        generator: SQL generator dependency
+        range_index: Range aggregate index dependency (None when disabled)
+        
+    Returns:
+        Streaming NDJSON response
+    """
+    if len(body.question) > MAX_QUESTION_LENGTH:
         raise HTTPException(
+            status_code=400,
+            detail=f"Question is too long. Please keep it under {MAX_QUESTION_LENGTH} characters."
+        )
+    
+    query_service = QueryService(db, generator, range_index)
+    try:
+        stream = await query_service.astream_query(body.question)
+    except Exception as e:
+        raise _http_error(e)
+    
+    async def lines():
+        yield _ndjson({
+            "type": "meta",
+            "sql": stream.sql,
+            "columns": stream.columns,
+            "source": stream.source,
+            "sql_source": stream.sql_source,
+        })
+        row_count = 0
+        first_row = None
+        try:
+            async for rows in stream.blocks:
+                if first_row is None and rows:
+                    first_row = rows[0]
+                row_count += len(rows)
+                yield _ndjson({"type": "rows", "rows": rows})
+        except Exception as e:
+            error = _http_error(e)
+            yield _ndjson({"type": "error", "detail": error.detail})
+            return
+        warning = join_warnings(stream.warning, query_service.quality_warning(row_count, first_row))
+        yield _ndjson({"type": "end", "row_count": row_count, "warning": warning})
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _ndjson(event: dict) -> bytes:
+    """Encode one NDJSON line (datetimes as ISO strings, like the JSON responses)."""
+    return dumps(event) + b"\n"
+
+
+def _http_error(e: Exception) -> HTTPException:
+    """
+    Map query pipeline exceptions to HTTP errors.
+    
+    Args:
+        e: Exception raised while generating or executing a query
+        
+    Returns:
+        HTTPException with a status code and user-facing detail
+    """
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, GenerationRateLimitError):
+        logger.warning(f"Generation budget exceeded: {str(e)}")
+        return HTTPException(
+            status_code=429,
+            detail=str(e)
+        )
+    if isinstance(e, SQLGenerationError):
+        logger.error(f"SQL generation failed: {str(e)}")
+        return HTTPException(
             status_code=500,
             detail=f"Failed to generate SQL: {str(e)}"
         )
-    except DateRangeError as e:
+    if isinstance(e, DateRangeError):
         logger.warning(f"Date range validation failed: {str(e)}")
-        raise HTTPException(
+        return HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    if isinstance(e, QueryCostError):
+        logger.warning(f"Query rejected by cost budget: {str(e)}")
+        return HTTPException(
             status_code=400,
             detail=str(e)
         )
-    except QueryExecutionError as e:
+    if isinstance(e, QueryExecutionError):
         logger.error(f"Query execution failed: {str(e)}")
-        raise HTTPException(
+        return HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    if isinstance(e, InvalidCursorError):
+        logger.warning(f"Invalid cursor: {str(e)}")
+        return HTTPException(
             status_code=400,
             detail=str(e)
         )
-    except ValueError as e:
+    if isinstance(e, ValueError):
         logger.error(f"SQL validation failed: {str(e)}")
-        raise HTTPException(
+        return HTTPException(
             status_code=400,
             detail=f"Invalid SQL generated: {str(e)}"
         )
-    except Exception as e:
-        logger.exception("Unexpected error in query endpoint")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Query failed: {str(e)}"
-        )
-
+    logger.exception("Unexpected error in query endpoint")
+    return HTTPException(
+        status_code=500,
+        detail=f"Query failed: {str(e)}"
+    )
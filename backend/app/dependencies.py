@@ -5,13 +5,21 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from db.client import DatabaseClient
+    from db.range_index import RangeAggregateIndex
     from services.sql_generator import SQLGenerator
 
-from app.instances import get_db_client, get_sql_generator
+from app.instances import (
+    catch_up_ingested_rows,
+    get_db_client,
+    get_ingest_service,
+    get_range_index,
+    get_sql_generator,
+)
 
 
 def get_database():
-    """Dependency for database client."""
+    """Dependency for database client, first applying rows other workers ingested."""
+    catch_up_ingested_rows()
     return get_db_client()
 
 
@@ -19,3 +27,12 @@ def get_generator():
     """Dependency for SQL generator."""
     return get_sql_generator()
 
+
+def get_index():
+    """Dependency for the range aggregate index (None when disabled)."""
+    return get_range_index()
+
+
+def get_ingester():
+    """Dependency for the ingestion service (None without a local store)."""
+    return get_ingest_service()
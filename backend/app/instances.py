@@ -1,37 +1,120 @@
 """
 Global instance management for database client and SQL generator.
 Uses lazy initialization to avoid errors on import if environment variables are missing.
+
+Instances are per process: creation is guarded by a lock so concurrent
+threadpool requests build each one once, and a forked worker starts
+without its parent's instances (and their connection pools).
 """
 import logging
-from typing import Optional
+import os
+import threading
+from typing import Optional, Union
 
 from dotenv import load_dotenv
 
+from cache.result_cache import ResultCache
+from cache.sql_cache import SQLCache
+from core.config import ConfigurationError, get_env
+from core.data_bounds import set_data_bounds
 from db.client import DatabaseClient
-from services.sql_generator import SQLGenerator
+from db.ingest import CSVStore, format_date
+from db.local_client import LocalColumnarClient, default_data_path
+from db.range_index import RangeAggregateIndex
+from services.ingest_service import IngestService
+from services.sql_generator import SQLGenerator, prompt_fingerprint
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Database backend selection: "clickhouse" (Tinybird) or "local" (in-process NumPy engine)
+DB_BACKEND_ENV = "DB_BACKEND"
+DEFAULT_DB_BACKEND = "clickhouse"
+
+# Range aggregate index source: "csv", "clickhouse" (one-time dump) or "none"
+RANGE_INDEX_SOURCE_ENV = "RANGE_INDEX_SOURCE"
+DEFAULT_RANGE_INDEX_SOURCE = "csv"
+
 # Global instances (initialized on first use)
-_db_client: Optional[DatabaseClient] = None
+_db_client: Optional[Union[DatabaseClient, LocalColumnarClient]] = None
 _sql_generator: Optional[SQLGenerator] = None
+_range_index: Optional[RangeAggregateIndex] = None
+_csv_store: Optional[CSVStore] = None
+_csv_store_checked = False
+_ingest_service: Optional[IngestService] = None
+_lock = threading.RLock()
+
+
+def _reset_after_fork() -> None:
+    """Drop instances inherited from the parent; sockets must not be shared across processes."""
+    global _db_client, _sql_generator, _range_index, _csv_store, _csv_store_checked, _ingest_service, _lock
+    _db_client = None
+    _sql_generator = None
+    _range_index = None
+    _csv_store = None
+    _csv_store_checked = False
+    _ingest_service = None
+    _lock = threading.RLock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
 
-def get_db_client() -> DatabaseClient:
+def get_db_client() -> Union[DatabaseClient, LocalColumnarClient]:
     """
     Get or create database client instance (lazy initialization).
 
+    The backend is selected with the DB_BACKEND env var.
+
     Returns:
-        DatabaseClient instance
+        DatabaseClient or LocalColumnarClient instance
     """
     global _db_client
     if _db_client is None:
-        _db_client = DatabaseClient()
+        with _lock:
+            if _db_client is None:
+                backend = get_env(DB_BACKEND_ENV, DEFAULT_DB_BACKEND).lower()
+                if backend == "local":
+                    # Load through the store (mapping its snapshot) so ingested rows can be tailed from its offset
+                    store = get_csv_store()
+                    columns = store.load() if store is not None else None
+                    _db_client = LocalColumnarClient(columns=columns) if columns is not None else LocalColumnarClient()
+                    _set_bounds_from_store()
+                elif backend == "clickhouse":
+                    _db_client = DatabaseClient(result_cache=ResultCache.from_env())
+                else:
+                    raise ConfigurationError(
+                        f"Unknown {DB_BACKEND_ENV} '{backend}'. Use 'clickhouse' or 'local'."
+                    )
+                logger.info(f"Using {backend} database backend")
     return _db_client
 
 
+def get_csv_store() -> Optional[CSVStore]:
+    """
+    Get the local store (the CSV export), shared with ingestion.
+
+    Returns:
+        CSVStore instance, or None if the file doesn't exist
+    """
+    global _csv_store, _csv_store_checked
+    if not _csv_store_checked:
+        with _lock:
+            if not _csv_store_checked:
+                path = default_data_path()
+                _csv_store = CSVStore(path) if os.path.exists(path) else None
+                _csv_store_checked = True
+    return _csv_store
+
+
+def _set_bounds_from_store() -> None:
+    """Advertise the date range of the rows read from the store so far."""
+    store = _csv_store
+    if store is not None and store.last_date is not None:
+        set_data_bounds(format_date(store.first_date), format_date(store.last_date))
+
+
 def get_sql_generator() -> SQLGenerator:
     """
     Get or create SQL generator instance (lazy initialization).
@@ -41,5 +124,112 @@ def get_sql_generator() -> SQLGenerator:
     """
     global _sql_generator
     if _sql_generator is None:
-        _sql_generator = SQLGenerator()
+        with _lock:
+            if _sql_generator is None:
+                _sql_generator = SQLGenerator(sql_cache=SQLCache.from_env(prompt_fingerprint()))
     return _sql_generator
+
+
+def init_range_index() -> Optional[RangeAggregateIndex]:
+    """
+    Build the range aggregate index (called once at application startup).
+
+    Failures are logged and leave the index disabled; queries then go to the database.
+
+    Returns:
+        RangeAggregateIndex instance, or None if disabled or unavailable
+    """
+    global _range_index, _ingest_service
+    source = get_env(RANGE_INDEX_SOURCE_ENV, DEFAULT_RANGE_INDEX_SOURCE).lower()
+    with _lock:
+        _ingest_service = None  # rebuilt around the new index
+        try:
+            if source == "none":
+                _range_index = None
+            elif get_env(DB_BACKEND_ENV, DEFAULT_DB_BACKEND).lower() == "local":
+                # Reuse the columns the local backend already holds
+                _range_index = RangeAggregateIndex(get_db_client().columns)
+            elif source == "clickhouse":
+                _range_index = RangeAggregateIndex.from_clickhouse(get_db_client().client)
+            else:
+                store = get_csv_store()
+                columns = store.load() if store is not None else None
+                _range_index = RangeAggregateIndex(columns) if columns is not None else RangeAggregateIndex.from_csv(default_data_path())
+        except Exception:
+            logger.exception("Failed to build range aggregate index; continuing without it")
+            _range_index = None
+
+        try:
+            # Skip the rows already loaded, so catching up applies only ingested ones
+            store = get_csv_store()
+            if store is not None and store.offset == 0:
+                store.load()
+            _set_bounds_from_store()
+        except Exception:
+            logger.exception("Failed to read the local store; ingested rows won't be applied")
+    return _range_index
+
+
+def get_range_index() -> Optional[RangeAggregateIndex]:
+    """
+    Get the range aggregate index built at startup.
+
+    Returns:
+        RangeAggregateIndex instance, or None if disabled
+    """
+    return _range_index
+
+
+def get_ingest_service() -> Optional[IngestService]:
+    """
+    Get or create the ingestion service for this process.
+
+    Returns:
+        IngestService instance, or None without a local store
+    """
+    global _ingest_service
+    if _ingest_service is None:
+        with _lock:
+            if _ingest_service is None:
+                store = get_csv_store()
+                if store is None:
+                    return None
+                _ingest_service = IngestService(store, get_db_client(), _range_index)
+    return _ingest_service
+
+
+def catch_up_ingested_rows() -> int:
+    """
+    Apply rows other processes ingested since this one last looked.
+
+    Failures are logged; queries then run against the data already loaded.
+
+    Returns:
+        Number of rows applied
+    """
+    service = get_ingest_service()
+    if service is None:
+        return 0
+    try:
+        return service.catch_up()
+    except Exception:
+        logger.exception("Failed to catch up with ingested rows")
+        return 0
+
+
+def connection_stats() -> dict:
+    """
+    Outbound connection pool counters for this worker process.
+
+    Only instances that have been created are reported.
+
+    Returns:
+        Dictionary with "pid", "clickhouse" and "openai" entries
+    """
+    db_client = _db_client
+    generator = _sql_generator
+    return {
+        "pid": os.getpid(),
+        "clickhouse": db_client.connection_stats() if hasattr(db_client, "connection_stats") else None,
+        "openai": generator.connection_stats() if generator is not None else None,
+    }
@@ -3,21 +3,33 @@ Application factory and route registration.
 This module contains the FastAPI app creation logic.
 """
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-from api import health, query, evals, test
+from api import admin, health, metrics, query, evals, test
+from app.instances import init_range_index
+from app.middleware import TracingMiddleware, tracing_enabled
 from app.rate_limiter import limiter
 from core.config import get_env
+from security.sql_guard import warm_parser
 
 # Configure logging (only when this module is imported, not on package import)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build startup-time state before serving requests."""
+    warm_parser()
+    init_range_index()
+    yield
+
+
 def create_app() -> FastAPI:
     """
     Create and configure FastAPI application.
@@ -32,6 +44,7 @@ def create_app() -> FastAPI:
         title="DripDrop API",
         description="Natural language to SQL query API with CFG constraints",
         version="1.0.0",
+        lifespan=lifespan,
     )
 
     # Add rate limiting
@@ -51,11 +64,17 @@ def create_app() -> FastAPI:
         expose_headers=["*"],
     )
 
+    # Per-request stage timings (Server-Timing header, span export)
+    if tracing_enabled():
+        app.add_middleware(TracingMiddleware)
+
     # Register routes with tags
     app.include_router(health.router, tags=["health"])
+    app.include_router(metrics.router, tags=["health"])
     app.include_router(query.router, tags=["queries"])
     app.include_router(evals.router, tags=["evaluations"])
     app.include_router(test.router, tags=["testing"])
+    app.include_router(admin.router, tags=["admin"])
 
     return app
 
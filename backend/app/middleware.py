@@ -0,0 +1,76 @@
+"""
+ASGI middleware for per-request tracing.
+"""
+from typing import Iterable, Optional
+
+from core.config import get_env
+from utils.tracing import BackgroundExporter, Trace, end_trace, exporter_from_env, start_trace
+
+# Environment variable names
+TRACING_ENABLED_ENV = "TRACING_ENABLED"
+
+# Endpoints that run the query pipeline
+TRACED_PATHS = ("/query", "/query/page", "/query/batch", "/query/stream", "/evals/run", "/evals/stream")
+
+
+def tracing_enabled() -> bool:
+    return get_env(TRACING_ENABLED_ENV, "true").lower() not in ("0", "false", "no")
+
+
+class TracingMiddleware:
+    """
+    Traces requests to the pipeline endpoints.
+
+    The trace is current while the endpoint runs, so pipeline stages record
+    spans on it. The stages finished before the response starts are sent in
+    a Server-Timing header (for streamed responses that is everything up to
+    the first block); the finished trace goes to the exporter.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Iterable[str] = TRACED_PATHS,
+        exporter: Optional[BackgroundExporter] = None,
+    ):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: ASGI application to wrap
+            paths: Request paths to trace
+            exporter: Destination for finished traces (defaults to exporter_from_env())
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+        self.exporter = exporter if exporter is not None else exporter_from_env()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace = Trace(f"{scope['method']} {scope['path']}", traceparent)
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = start_trace(trace)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_trace(token)
+            trace.finish(status_code)
+            self.exporter.submit(trace)
@@ -1,18 +1,168 @@
 """
 Rate limiting configuration for API endpoints.
+
+Counters live in memory by default, which is per worker process. With more
+than one worker, point RATE_LIMIT_STORAGE_URI (or SHARED_STATE_URL) at a
+Redis-compatible server, or at a SQLite file (sqlite:///path) for workers on
+one host, so every worker enforces the same budget. If the storage is
+unreachable, limits are enforced per worker until it returns.
+
+Route limits count requests. A /query/batch request can carry hundreds of
+questions, so each of its questions that needs OpenAI is also charged
+against a per-client generation budget (charge_generation()).
 """
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+from fastapi import Request
+from limits import parse
+from limits.storage import Storage
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+from cache.store import REDIS_SCHEMES, SHARED_STATE_URL_ENV, SQLiteStore
 from core.config import get_env
 
+RATE_LIMIT_STORAGE_URI_ENV = "RATE_LIMIT_STORAGE_URI"
+RATE_LIMIT_ENABLED_ENV = "RATE_LIMIT_ENABLED"
+# Read by uvicorn as the default for --workers
+WEB_CONCURRENCY_ENV = "WEB_CONCURRENCY"
+
+SQLITE_SCHEME = "sqlite://"
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteLimitStorage(Storage):
+    """
+    Rate-limit counters in a SQLite file (SQLiteStore), shared by every
+    worker on the host. Supports the fixed-window strategy the limiter uses.
+    Registered with the limits library for sqlite:///path URIs.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        """
+        Initialize the storage.
+
+        Args:
+            uri: sqlite:///path of the database file (created if missing)
+            wrap_exceptions: Wrap SQLite errors in limits.errors.StorageError
+        """
+        super().__init__(uri, wrap_exceptions, **options)
+        self.store = SQLiteStore(uri[len(SQLITE_SCHEME):])
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        return self.store.incr(key, amount, ttl_seconds=expiry)
+
+    def get(self, key: str) -> int:
+        return self.store.counter(key)[0]
+
+    def get_expiry(self, key: str) -> float:
+        return self.store.counter(key)[1] or time.time()
+
+    def check(self) -> bool:
+        try:
+            self.store.counter("check")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self.store.clear_counters()
+
+    def clear(self, key: str) -> None:
+        self.store.delete_counter(key)
+
+
+def storage_uri() -> str:
+    """
+    Storage for rate-limit counters.
+
+    Returns:
+        RATE_LIMIT_STORAGE_URI, else SHARED_STATE_URL (a Redis server or a
+        SQLite file, as a sqlite:/// URI), else in-process memory
+    """
+    uri = get_env(RATE_LIMIT_STORAGE_URI_ENV)
+    if uri:
+        return uri
+    shared = get_env(SHARED_STATE_URL_ENV, "")
+    if not shared or shared.startswith((*REDIS_SCHEMES, SQLITE_SCHEME)):
+        return shared or "memory://"
+    # A plain file path, as cache/store.py accepts
+    return SQLITE_SCHEME + shared
+
+
+def warn_if_unshared(uri: str) -> bool:
+    """
+    Warn at startup when several workers would each count limits in memory.
+
+    Args:
+        uri: Rate-limit storage URI
+
+    Returns:
+        True if a warning was logged
+    """
+    try:
+        workers = int(get_env(WEB_CONCURRENCY_ENV, "1"))
+    except ValueError:
+        workers = 1
+    if workers > 1 and uri.startswith("memory://"):
+        logger.warning(
+            f"{workers} workers with in-memory rate limits: each worker enforces its own budget, "
+            f"so clients get {workers}x the configured limits. Set {SHARED_STATE_URL_ENV} or "
+            f"{RATE_LIMIT_STORAGE_URI_ENV} to a Redis server or a SQLite file."
+        )
+        return True
+    return False
+
+
 # Initialize rate limiter
 # Default: 10 requests per minute per IP address
 # Can be overridden with RATE_LIMIT_PER_MINUTE environment variable
 rate_limit_per_minute = int(get_env("RATE_LIMIT_PER_MINUTE", "10"))
+warn_if_unshared(storage_uri())
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=[f"{rate_limit_per_minute}/minute"],
-    storage_uri="memory://",  # In-memory storage (use Redis for distributed systems)
+    storage_uri=storage_uri(),
+    # Disabled only for local load tests (benchmarks/bench_load.py)
+    enabled=get_env(RATE_LIMIT_ENABLED_ENV, "true").lower() not in ("0", "false", "no"),
+    key_prefix="dripdrop",
+    # Fall back to per-worker counters while the shared storage is down,
+    # rather than failing requests
+    in_memory_fallback_enabled=True,
+    swallow_errors=True,
 )
 
+# OpenAI generations per client per minute from batch questions, the same
+# budget /query allows in requests
+generation_limit = parse(f"{rate_limit_per_minute}/minute")
+
+
+def charge_generation(request: Request) -> bool:
+    """
+    Charge one OpenAI generation to the requesting client.
+
+    Args:
+        request: Request the generation is made for
+
+    Returns:
+        True if the client is within its generation budget (or limits are
+        disabled or their storage fails), False if the budget is used up
+    """
+    if not limiter.enabled:
+        return True
+    try:
+        return limiter.limiter.hit(generation_limit, "dripdrop:generation", get_remote_address(request))
+    except Exception as e:
+        # Same policy as route limits (swallow_errors)
+        logger.warning(f"Generation rate limit check failed: {e}")
+        return True
@@ -0,0 +1,97 @@
+"""
+Benchmark loading the local data in a fresh worker process: parsing the CSV
+export versus mapping its columnar snapshot (db/snapshot.py).
+
+The history is synthetic (the real export's rows repeated with later
+dates) so load time can be compared at sizes beyond coin_Bitcoin.csv. Each
+measurement starts a new interpreter and reports:
+- load ms: time to get the column arrays (CSVStore.load())
+- private MB: anonymous memory the process gained while loading; mapped
+  snapshot pages are file-backed and shared with every other worker
+
+Run from backend directory: python -m benchmarks.bench_data_load [--rows N]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from db.ingest import CSVStore
+from db.local_client import DEFAULT_DATA_PATH, load_columns
+from db.snapshot import write_snapshot
+from security.schema import NUMERIC_COLUMNS
+
+REPEATS = 5
+DAY_SECONDS = 86_400
+
+_CHILD = """
+import json, sys, time
+from db.ingest import CSVStore
+
+def private_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("RssAnon:"))
+
+before = private_kb()
+started = time.perf_counter()
+columns = CSVStore(sys.argv[1]).load()
+elapsed = time.perf_counter() - started
+print(json.dumps([elapsed * 1000, (private_kb() - before) / 1024]))
+"""
+
+
+def write_history(path: Path, rows: int) -> None:
+    """Write a CSV export with the given number of daily rows."""
+    source = load_columns(DEFAULT_DATA_PATH)
+    repeat = np.arange(rows) % len(source["date"])
+    dates = (source["date"][0] + np.arange(rows, dtype=np.int64) * DAY_SECONDS).astype("datetime64[s]")
+    with open(path, "w") as f:
+        f.write("Date," + ",".join(column.capitalize() for column in NUMERIC_COLUMNS) + "\n")
+        for start in range(0, rows, 100_000):
+            block = slice(start, min(start + 100_000, rows))
+            values = [source[column][repeat[block]].astype(str) for column in NUMERIC_COLUMNS]
+            dates_text = np.char.replace(dates[block].astype(str), "T", " ")
+            f.writelines(",".join(fields) + "\n" for fields in zip(dates_text, *values))
+
+
+def _run(csv_path: Path) -> tuple[float, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, str(csv_path)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    load_ms, private_mb = json.loads(output.strip().splitlines()[-1])
+    return load_ms, private_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows of synthetic history")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = Path(directory) / "history.csv"
+        write_history(csv_path, args.rows)
+        print(f"{args.rows} rows, {csv_path.stat().st_size / 1e6:.1f} MB CSV; median of {REPEATS} fresh processes")
+        print(f"{'source':>10} {'load ms':>9} {'private MB':>11}")
+
+        runs = [_run(csv_path) for _ in range(REPEATS)]
+        print(f"{'csv':>10} {sorted(r[0] for r in runs)[REPEATS // 2]:>9.1f} {sorted(r[1] for r in runs)[REPEATS // 2]:>11.1f}")
+
+        store = CSVStore(csv_path)
+        write_snapshot(store.load(), csv_path, store.offset)
+        runs = [_run(csv_path) for _ in range(REPEATS)]
+        print(f"{'snapshot':>10} {sorted(r[0] for r in runs)[REPEATS // 2]:>9.1f} {sorted(r[1] for r in runs)[REPEATS // 2]:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
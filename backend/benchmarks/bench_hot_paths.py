@@ -0,0 +1,309 @@
+"""
+Micro-benchmarks of the pure-Python work done on every request, with
+regression checks against baselines kept in the repo.
+
+Each case records ops/sec (best of REPEATS runs, each long enough to time
+reliably, in process CPU time so other load on the machine doesn't count)
+and the peak memory allocated by one call (tracemalloc). Inputs
+cover short and 1000-character questions and results of 1 to 100,000 rows.
+
+Machines differ in speed, so ops/sec is compared after dividing by a fixed
+pure-Python calibration loop measured in the same run. A case fails when
+its normalized ops/sec falls, or its peak allocation grows, by more than
+--threshold relative to benchmarks/baselines/hot_paths.json. The exit
+status is 1 when any case regresses, so CI can run this directly.
+
+    python -m benchmarks.bench_hot_paths                  # check
+    python -m benchmarks.bench_hot_paths --update         # accept new baseline
+    python -m benchmarks.bench_hot_paths --only sanitize  # subset
+
+Run from backend directory: python -m benchmarks.bench_hot_paths
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.local_client import LocalColumnarClient
+from models.schemas import QueryResponse
+from security.sql_guard import _parse_text, parse_sql, validate_sql
+from services.eval_service import EvalService
+from services.sql_generator import SQLGenerator
+from utils.data_helpers import sanitize_data_for_json
+from utils.date_helpers import validate_date_range
+from utils.query_validation import validate_query_input
+from utils.serialization import json_response
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "hot_paths.json"
+DEFAULT_THRESHOLD = 0.25
+# Allocation changes smaller than this are noise (interned strings, caches)
+ALLOCATION_SLACK_BYTES = 1024
+MIN_RUN_SECONDS = 0.05
+REPEATS = 5
+DEFAULT_RETRIES = 2
+
+SHORT_QUESTION = "average close in march 2020"
+_SENTENCE = "What was the average closing price of bitcoin per day in march 2020 and how did volume change? "
+LONG_QUESTION = (_SENTENCE * (1000 // len(_SENTENCE) + 1))[:1000]
+
+SHORT_SQL = "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-03-01' AND '2020-03-31'"
+LONG_SQL = (
+    "SELECT AVG(close) AS avg_close, MAX(high) AS max_high, MIN(low) AS min_low, "
+    "SUM(volume) AS total_volume, COUNT(*) AS days FROM coin_Bitcoin "
+    "WHERE date BETWEEN '2020-03-01' AND '2020-03-31' AND date >= now() - INTERVAL 3 DAY "
+    "GROUP BY toStartOfDay(date) ORDER BY avg_close DESC, max_high LIMIT 100"
+)
+SINGLE_DAY_SQL = "SELECT close FROM coin_Bitcoin WHERE date = '2020-03-12'"
+ROW_COUNTS = (1, 1_000, 100_000)
+
+
+class Case(NamedTuple):
+    name: str
+    func: Callable[[], object]
+
+
+def _rows(count: int, with_nan: bool = False) -> dict:
+    """A realistic result: every column of the CSV export, tiled to count rows."""
+    result = LocalColumnarClient().query(
+        "SELECT date, open, high, low, close, volume, marketcap FROM coin_Bitcoin "
+        "WHERE date BETWEEN '2013-04-29' AND '2021-07-06'"
+    )
+    source = [tuple(row) for row in result["rows"]]
+    rows = [source[i % len(source)] for i in range(count)]
+    if with_nan:
+        rows[count // 2] = rows[count // 2][:4] + (math.nan,) + rows[count // 2][5:]
+    return {"columns": list(result["columns"]), "rows": rows}
+
+
+def build_cases() -> List[Case]:
+    """Benchmark cases, with their inputs prepared up front."""
+    generator = SQLGenerator(api_key="bench", use_rules=False)
+    eval_service = EvalService(db_client=None, sql_generator=None)
+    single_day = parse_sql(SINGLE_DAY_SQL)
+    long_query = parse_sql(LONG_SQL)
+
+    cases = [
+        Case("validate_query_input short", lambda: validate_query_input(SHORT_QUESTION)),
+        Case("validate_query_input 1000 chars", lambda: validate_query_input(LONG_QUESTION)),
+        # Repeated SQL is served from the parse cache; new SQL is parsed
+        Case("validate_sql short cached", lambda: validate_sql(SHORT_SQL)),
+        Case("validate_sql grouped cached", lambda: validate_sql(LONG_SQL)),
+        Case("validate_sql short uncached", lambda: (_parse_text.cache_clear(), validate_sql(SHORT_SQL))),
+        Case("validate_sql grouped uncached", lambda: (_parse_text.cache_clear(), validate_sql(LONG_SQL))),
+        Case("normalize_date_filters unchanged",
+             lambda: generator._normalize_date_filters(long_query, LONG_SQL)),
+        Case("normalize_date_filters single day",
+             lambda: generator._normalize_date_filters(single_day, SINGLE_DAY_SQL)),
+        Case("validate_date_range sql text", lambda: validate_date_range(LONG_SQL)),
+        Case("validate_date_range parsed", lambda: validate_date_range(long_query)),
+        Case("eval normalize_sql", lambda: eval_service._normalize_sql(LONG_SQL)),
+    ]
+
+    for count in ROW_COUNTS:
+        data = _rows(count)
+        result = {"sql": SHORT_SQL, "data": data, "source": "database", "sql_source": "llm"}
+        cases += [
+            Case(f"sanitize_data_for_json {count} rows", lambda data=data: sanitize_data_for_json(data)),
+            Case(f"QueryResponse validate {count} rows", lambda result=result: QueryResponse(**result)),
+            Case(f"QueryResponse construct+encode {count} rows",
+                 lambda result=result: json_response(dict(QueryResponse.model_construct(**result)))),
+        ]
+    with_nan = _rows(ROW_COUNTS[-1], with_nan=True)
+    cases.append(Case(f"sanitize_data_for_json {ROW_COUNTS[-1]} rows with NaN",
+                      lambda: sanitize_data_for_json(with_nan)))
+    return cases
+
+
+def _calibration() -> int:
+    total = 0
+    values = {}
+    for i in range(2000):
+        values[str(i)] = i * i
+        total += len(str(i))
+    return total + sum(values.values())
+
+
+def ops_per_second(func: Callable[[], object]) -> float:
+    """
+    Best-of-REPEATS throughput of func.
+
+    Args:
+        func: Zero-argument callable
+
+    Returns:
+        Calls per second
+    """
+    iterations = 1
+    while True:
+        started = time.process_time()
+        for _ in range(iterations):
+            func()
+        elapsed = time.process_time() - started
+        if elapsed >= MIN_RUN_SECONDS:
+            break
+        iterations *= 2
+
+    best = elapsed / iterations
+    for _ in range(REPEATS - 1):
+        started = time.process_time()
+        for _ in range(iterations):
+            func()
+        best = min(best, (time.process_time() - started) / iterations)
+    return 1 / best
+
+
+def peak_allocation(func: Callable[[], object]) -> int:
+    """
+    Peak bytes allocated while func runs once (after a warm-up call).
+
+    Args:
+        func: Zero-argument callable
+
+    Returns:
+        Peak traced memory in bytes
+    """
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(case: Case) -> dict:
+    """
+    Measure one case, with a calibration run right before it so that clock
+    and load changes during the suite affect both equally.
+
+    Returns:
+        ops/sec, calibration-normalized ops/sec and peak allocation
+    """
+    calibration = ops_per_second(_calibration)
+    ops = ops_per_second(case.func)
+    return {
+        "ops_per_sec": round(ops, 2),
+        "normalized": round(ops / calibration, 6),
+        "peak_alloc_bytes": peak_allocation(case.func),
+    }
+
+
+def run(cases: List[Case]) -> dict:
+    """
+    Measure every case.
+
+    Returns:
+        Results with interpreter details and per-case measurements
+    """
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {case.name: measure(case) for case in cases},
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> Dict[str, str]:
+    """
+    Find regressions of current against baseline.
+
+    Args:
+        baseline: Earlier run() output
+        current: New run() output
+        threshold: Allowed fractional slowdown or allocation growth (0.25 = 25%)
+
+    Returns:
+        Dictionary of case name -> description, for regressed cases only
+    """
+    regressions = {}
+    for name, new in current["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None:
+            continue
+        problems = []
+        if new["normalized"] < old["normalized"] * (1 - threshold):
+            change = new["normalized"] / old["normalized"] - 1
+            problems.append(f"throughput {change:+.0%} (normalized ops/sec)")
+        grown = new["peak_alloc_bytes"] - old["peak_alloc_bytes"]
+        if grown > ALLOCATION_SLACK_BYTES and new["peak_alloc_bytes"] > old["peak_alloc_bytes"] * (1 + threshold):
+            problems.append(f"peak allocation {old['peak_alloc_bytes']} -> {new['peak_alloc_bytes']} bytes")
+        if problems:
+            regressions[name] = "; ".join(problems)
+    return regressions
+
+
+def print_results(current: dict, baseline: Optional[dict]) -> None:
+    print("vs baseline compares calibration-normalized ops/sec")
+    print(f"{'case':>48} {'ops/s':>12} {'peak KiB':>10} {'vs baseline':>12}")
+    old_cases: Dict[str, dict] = (baseline or {}).get("cases", {})
+    for name, result in current["cases"].items():
+        old = old_cases.get(name)
+        delta = f"{result['normalized'] / old['normalized'] - 1:+.1%}" if old else "new"
+        print(f"{name:>48} {result['ops_per_sec']:>12,.1f} "
+              f"{result['peak_alloc_bytes'] / 1024:>10.1f} {delta:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path micro-benchmarks with regression checks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed fractional regression (default 0.25)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="times to re-measure a regressed case before failing")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline file")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    cases = build_cases()
+    if args.only:
+        cases = [case for case in cases if args.only in case.name]
+    current = run(cases)
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    print_results(current, baseline)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=2) + "\n")
+
+    if args.update:
+        if baseline is not None and args.only:
+            # Keep the cases that weren't re-run
+            current = {**current, "cases": {**baseline["cases"], **current["cases"]}}
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"\nwrote {baseline_path}")
+        return
+
+    if baseline is None:
+        print(f"\nno baseline at {baseline_path}; run with --update to create one")
+        return
+
+    regressions = compare_results(baseline, current, args.threshold)
+    by_name = {case.name: case for case in cases}
+    for _ in range(args.retries):
+        if not regressions:
+            break
+        # Measure suspects again so one noisy sample doesn't fail the run
+        for name in regressions:
+            again = measure(by_name[name])
+            if again["normalized"] > current["cases"][name]["normalized"]:
+                current["cases"][name] = again
+        regressions = compare_results(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for name, message in regressions.items():
+            print(f"  {name}: {message}")
+        sys.exit(1)
+    print(f"\nno regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+End-to-end load test of POST /query without external services.
+
+Starts the fake OpenAI and ClickHouse servers (benchmarks/fakes.py), then the
+app under uvicorn pointed at them, and drives /query at a fixed concurrency.
+Per-stage latency comes from the Server-Timing header (utils/tracing.py), so
+the report shows where time goes (llm, sql_cache, database, serialize, ...)
+next to client-side latency, throughput and status counts.
+
+Results are written as JSON, by default to .cache/loadtest/<commit>.json, so
+two commits can be compared:
+
+    python -m benchmarks.bench_load --output before.json
+    git checkout my-branch
+    python -m benchmarks.bench_load --compare before.json
+
+Caches are on by default, as in production; pass --unique to make every
+question distinct so each request goes through the LLM and the database.
+
+Run from backend directory: python -m benchmarks.bench_load --concurrency 32 --requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fakes import WORKLOAD
+
+BACKEND_DIR = Path(__file__).parent.parent
+DEFAULT_OUTPUT_DIR = BACKEND_DIR / ".cache" / "loadtest"
+SERVER_LOG = DEFAULT_OUTPUT_DIR / "server.log"
+STARTUP_TIMEOUT_SECONDS = 120
+PERCENTILES = (50, 95, 99)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """
+    Parse a Server-Timing header.
+
+    Args:
+        header: e.g. "llm;dur=812.4, database;dur=35.1, total;dur=851.0"
+
+    Returns:
+        Dictionary of metric name -> milliseconds (metrics without dur are skipped)
+    """
+    timings = {}
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Latency summary of a list of millisecond samples (nearest-rank percentiles).
+
+    Args:
+        samples: Latencies in milliseconds
+
+    Returns:
+        Dictionary with count, mean, max and p50/p95/p99
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    summary = {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 3)}
+    for p in PERCENTILES:
+        rank = max(1, -(-p * len(ordered) // 100))  # ceil(p/100 * n)
+        summary[f"p{p}"] = round(ordered[rank - 1], 3)
+    summary["max"] = round(ordered[-1], 3)
+    return summary
+
+
+class _Processes:
+    """Fake upstreams plus the app server, stopped together."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.procs: List[subprocess.Popen] = []
+        self.base_url = ""
+        self._log = None
+
+    def __enter__(self) -> "_Processes":
+        try:
+            self._start()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _start(self) -> None:
+        args = self.args
+        fakes = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fakes",
+             "--llm-latency", args.llm_latency, "--db-latency", args.db_latency],
+            cwd=BACKEND_DIR,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.procs.append(fakes)
+        ports = json.loads(fakes.stdout.readline())
+
+        port = _free_port()
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "load-test",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{ports['openai_port']}/v1",
+            "DB_BACKEND": "clickhouse",
+            "TB_CLICKHOUSE_HOST": "127.0.0.1",
+            "TB_CLICKHOUSE_PORT": str(ports["clickhouse_port"]),
+            "TB_CLICKHOUSE_SECURE": "false",
+            "TINYBIRD_TOKEN": "load-test",
+            # The fake answers uncompressed Native blocks only
+            "CLICKHOUSE_COMPRESSION": "none",
+            "RATE_LIMIT_ENABLED": "false",
+            "TRACING_ENABLED": "true",
+            # Keep runs independent of any shared state configured in .env
+            "SHARED_STATE_URL": "",
+            "SQL_CACHE_PATH": "",
+            "RESULT_CACHE_PATH": "",
+            "SQL_CACHE_ENABLED": "false" if args.no_sql_cache else "true",
+            "RESULT_CACHE_ENABLED": "false" if args.no_result_cache else "true",
+            "SQL_RULES_ENABLED": "false" if args.no_rules else "true",
+            "RANGE_INDEX_SOURCE": "none" if args.no_range_index else "csv",
+        }
+        SERVER_LOG.parent.mkdir(parents=True, exist_ok=True)
+        self._log = open(SERVER_LOG, "w")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+        self.procs.append(server)
+        self.base_url = f"http://127.0.0.1:{port}"
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"App server exited with code {server.returncode}; see {SERVER_LOG}")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"App server not healthy after {STARTUP_TIMEOUT_SECONDS}s")
+            time.sleep(0.2)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for proc in reversed(self.procs):
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if self._log is not None:
+            self._log.close()
+
+
+async def drive(base_url: str, args: argparse.Namespace) -> dict:
+    """
+    Send questions to /query from `concurrency` workers.
+
+    Args:
+        base_url: App server URL
+        args: Parsed command line options
+
+    Returns:
+        Raw samples: client latencies, per-stage timings and status counts
+    """
+    questions = list(WORKLOAD)
+    client_ms: List[float] = []
+    stage_ms: Dict[str, List[float]] = {}
+    statuses: Counter = Counter()
+    sent = 0
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    def next_question() -> Optional[str]:
+        nonlocal sent
+        if deadline is not None:
+            if time.monotonic() >= deadline:
+                return None
+        elif sent >= args.requests:
+            return None
+        question = questions[sent % len(questions)]
+        if args.unique:
+            question = f"{question} (run {sent})"
+        sent += 1
+        return question
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+
+        async def worker() -> None:
+            while (question := next_question()) is not None:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/query", json={"question": question})
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                client_ms.append((time.perf_counter() - started) * 1000)
+                statuses[str(response.status_code)] += 1
+                for name, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                    stage_ms.setdefault(name, []).append(ms)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"elapsed": elapsed, "client_ms": client_ms, "stage_ms": stage_ms, "statuses": statuses}
+
+
+def report(samples: dict, args: argparse.Namespace) -> dict:
+    """Machine-readable result of a run."""
+    commit = _git("rev-parse", "--short", "HEAD")
+    completed = len(samples["client_ms"])
+    return {
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests if not args.duration else None,
+            "duration_seconds": args.duration,
+            "unique": args.unique,
+            "llm_latency": args.llm_latency,
+            "db_latency": args.db_latency,
+            "sql_cache": not args.no_sql_cache,
+            "result_cache": not args.no_result_cache,
+            "rules": not args.no_rules,
+            "range_index": not args.no_range_index,
+        },
+        "elapsed_seconds": round(samples["elapsed"], 3),
+        "completed": completed,
+        "throughput_rps": round(completed / samples["elapsed"], 2) if samples["elapsed"] else 0.0,
+        "statuses": dict(samples["statuses"]),
+        "latency_ms": summarize(samples["client_ms"]),
+        "stages_ms": {name: summarize(values) for name, values in samples["stage_ms"].items()},
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"commit {result['commit'] or '?'}{' (dirty)' if result['dirty'] else ''}")
+    print(f"{result['completed']} requests in {result['elapsed_seconds']}s: "
+          f"{result['throughput_rps']} req/s, statuses {result['statuses']}")
+    print(f"{'ms':>16} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    rows = {"client": result["latency_ms"], **result["stages_ms"]}
+    for name, s in rows.items():
+        if not s.get("count"):
+            continue
+        print(f"{name:>16} {s['count']:>6} {s['mean']:>9.1f} {s['p50']:>9.1f} "
+              f"{s['p95']:>9.1f} {s['p99']:>9.1f} {s['max']:>9.1f}")
+
+
+def compare(baseline: dict, result: dict) -> None:
+    """Print current vs baseline for throughput and p50/p95/p99 per stage."""
+    print(f"\nvs {baseline.get('commit') or 'baseline'}")
+    if baseline.get("config") != result["config"]:
+        print("  note: configurations differ")
+
+    def row(label: str, old: Optional[float], new: Optional[float]) -> None:
+        if old is None or new is None:
+            return
+        delta = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{label:>24} {old:>10.1f} {new:>10.1f} {delta:>8}")
+
+    print(f"{'':>24} {'baseline':>10} {'current':>10} {'delta':>8}")
+    row("throughput rps", baseline.get("throughput_rps"), result["throughput_rps"])
+    stages = {"client": (baseline.get("latency_ms", {}), result["latency_ms"])}
+    for name, current in result["stages_ms"].items():
+        stages[name] = (baseline.get("stages_ms", {}).get(name, {}), current)
+    for name, (old, new) in stages.items():
+        for p in PERCENTILES:
+            row(f"{name} p{p} ms", old.get(f"p{p}"), new.get(f"p{p}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST /query against fake upstreams")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--requests", type=int, default=200, help="total requests")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of --requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    parser.add_argument("--unique", action="store_true", help="make every question distinct (defeats caches)")
+    parser.add_argument("--llm-latency", default="lognormal:800,0.4", help="fake OpenAI latency (ms)")
+    parser.add_argument("--db-latency", default="lognormal:40,0.5", help="fake ClickHouse latency (ms)")
+    parser.add_argument("--no-sql-cache", action="store_true")
+    parser.add_argument("--no-result-cache", action="store_true")
+    parser.add_argument("--no-rules", action="store_true")
+    parser.add_argument("--no-range-index", action="store_true")
+    parser.add_argument("--output", help="result file (default .cache/loadtest/<commit>.json)")
+    parser.add_argument("--compare", help="baseline result file to compare against")
+    args = parser.parse_args()
+
+    with _Processes(args) as processes:
+        samples = asyncio.run(drive(processes.base_url, args))
+
+    result = report(samples, args)
+    print_report(result)
+
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"{result['commit'] or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n")
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark validate_query_input on 1000-character questions.
+
+Compares the previous loop (one re.search per SUSPICIOUS_PATTERNS entry)
+with the combined single-pass matcher in utils.query_validation, and the
+batch API with a per-question loop.
+
+Run from backend directory: python -m benchmarks.bench_query_validation
+"""
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.exceptions import SQLGenerationError
+from utils.query_validation import SUSPICIOUS_PATTERNS, check_query_input, validate_queries
+
+LENGTH = 1000
+ITERATIONS = 2000
+REPEATS = 5
+
+_SENTENCE = "What was the average closing price of bitcoin per day in march 2020 and how did volume change? "
+
+
+def _question(tail: str) -> str:
+    body = (_SENTENCE * (LENGTH // len(_SENTENCE) + 1))[:LENGTH - len(tail)]
+    return body + tail
+
+
+QUESTIONS = {
+    "clean": _question(""),
+    "match at end": _question("; drop table x"),
+    "late pattern": _question(" execute"),
+}
+
+
+def before(question: str) -> Optional[str]:
+    """The previous implementation: one re.search per pattern."""
+    question_lower = question.lower()
+    for pattern, error_msg in SUSPICIOUS_PATTERNS:
+        if re.search(pattern, question_lower, re.IGNORECASE):
+            return error_msg
+    if '%' in question or '\\x' in question or '\\u' in question:
+        return "encoded"
+    return None
+
+
+def after(question: str) -> Optional[SQLGenerationError]:
+    return check_query_input(question)
+
+
+def _best_us(func: Callable, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(ITERATIONS):
+            func(*args)
+        timings.append((time.perf_counter() - started) / ITERATIONS * 1e6)
+    return min(timings)
+
+
+def main():
+    print(f"{LENGTH}-character questions, best of {REPEATS} x {ITERATIONS}")
+    print(f"{'question':>14} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, question in QUESTIONS.items():
+        expected, actual = before(question), after(question)
+        assert (expected is None) == (actual is None)
+        assert expected is None or expected in str(actual)
+        old = _best_us(before, question)
+        new = _best_us(after, question)
+        print(f"{name:>14} {old:>10.1f} {new:>10.1f} {old / new:>7.1f}x")
+
+    batch = list(QUESTIONS.values()) * 100
+    loop = _best_us(lambda: [check_query_input(q) for q in batch])
+    batched = _best_us(validate_queries, batch)
+    print(f"batch of {len(batch)}: loop {loop / 1000:.2f} ms, validate_queries {batched / 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
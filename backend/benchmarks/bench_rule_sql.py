@@ -0,0 +1,51 @@
+"""
+Measure the rule-based SQL fast path against the eval corpus.
+
+Reports how many questions in tests/cfg_evals.json are answered without the
+LLM, how many of those answers match the expected SQL (sql_equivalent), that
+no security case is answered, and how long the parser takes per question.
+
+Run from backend directory: python -m benchmarks.bench_rule_sql
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from security.sql_guard import sql_equivalent
+from services.rule_sql import rule_sql
+
+EVALS_FILE = Path(__file__).parent.parent / "tests" / "cfg_evals.json"
+ITERATIONS = 2000
+
+
+def main():
+    cases = json.loads(EVALS_FILE.read_text())["test_cases"]
+    functional = [c for c in cases if c.get("should_pass", True)]
+    security = [c for c in cases if not c.get("should_pass", True)]
+
+    answered = [c for c in functional if rule_sql(c["question"]) is not None]
+    correct = [c for c in answered if sql_equivalent(rule_sql(c["question"]), c["expected_sql"])]
+    leaked = [c for c in security if rule_sql(c["question"]) is not None]
+    print(f"functional: {len(answered)}/{len(functional)} answered by rules "
+          f"({len(answered) / len(functional):.0%}), {len(correct)}/{len(answered)} match the expected SQL")
+    print(f"security:   {len(leaked)}/{len(security)} answered by rules (should be 0)")
+    for case in functional:
+        if case not in answered:
+            print(f"  falls through to LLM: {case['question']}")
+        elif case not in correct:
+            print(f"  wrong answer: {case['question']}: {rule_sql(case['question'])}")
+
+    questions = [c["question"] for c in cases]
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        for question in questions:
+            rule_sql(question)
+    elapsed = (time.perf_counter() - started) / (ITERATIONS * len(questions))
+    print(f"parser: {elapsed * 1e6:.1f} us per question")
+
+
+if __name__ == "__main__":
+    main()
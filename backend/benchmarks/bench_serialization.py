@@ -0,0 +1,96 @@
+"""
+Benchmark the /query response path: sanitize, validate and encode a result.
+
+Compares the previous path (per-value recursive sanitizer, QueryResponse
+validation, FastAPI's jsonable conversion and stdlib json) with the
+column-oriented sanitizer and the direct encoder in utils.serialization.
+
+Run from backend directory: python -m benchmarks.bench_serialization
+"""
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.local_client import LocalColumnarClient
+from models.schemas import QueryResponse
+from utils.data_helpers import sanitize_data_for_json
+from utils.serialization import dumps, orjson
+
+SQL = (
+    "SELECT date, open, high, low, close, volume, marketcap FROM coin_Bitcoin "
+    "WHERE date BETWEEN '2013-04-29' AND '2021-07-06'"
+)
+SIZES = (3_000, 100_000)
+REPEATS = 5
+
+_adapter = TypeAdapter(QueryResponse)
+
+
+def _per_value_sanitize(data: dict) -> dict:
+    """The previous sanitizer: a recursive isinstance walk over every value."""
+    def sanitize_value(value: Any) -> Any:
+        if isinstance(value, float):
+            if math.isnan(value) or math.isinf(value):
+                return None
+        elif isinstance(value, (list, tuple)):
+            return [sanitize_value(v) for v in value]
+        elif isinstance(value, dict):
+            return {k: sanitize_value(v) for k, v in value.items()}
+        return value
+
+    return {"columns": data["columns"], "rows": [sanitize_value(row) for row in data["rows"]]}
+
+
+def before(sql: str, data: dict) -> bytes:
+    result = {"sql": sql, "data": _per_value_sanitize(data), "source": "database"}
+    response = _adapter.validate_python(QueryResponse(**result))
+    content = _adapter.dump_python(response, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def after(sql: str, data: dict) -> bytes:
+    result = {"sql": sql, "data": sanitize_data_for_json(data), "source": "database"}
+    return dumps(dict(QueryResponse.model_construct(**result)))
+
+
+def _best_ms(func: Callable, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def _dataset(rows: list, size: int, with_nan: bool) -> dict:
+    repeated = (rows * (size // len(rows) + 1))[:size]
+    if with_nan:
+        repeated = [
+            row[:4] + (float("nan"),) + row[5:] if i % 100 == 0 else row
+            for i, row in enumerate(repeated)
+        ]
+    return {"columns": ["date", "open", "high", "low", "close", "volume", "marketcap"], "rows": repeated}
+
+
+def main():
+    rows = LocalColumnarClient().query(SQL)["rows"]
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}, best of {REPEATS}")
+    print(f"{'rows':>8} {'NaN':>5} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        for with_nan in (False, True):
+            data = _dataset(rows, size, with_nan)
+            assert json.loads(before(SQL, data)) == json.loads(after(SQL, data))
+            old = _best_ms(before, SQL, data)
+            new = _best_ms(after, SQL, data)
+            print(f"{size:>8} {'1%' if with_nan else 'none':>5} {old:>10.1f} {new:>10.1f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
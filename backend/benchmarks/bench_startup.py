@@ -0,0 +1,72 @@
+"""
+Benchmark first-request SQL validation latency in a fresh worker process.
+
+Each measurement starts a new interpreter, as a deploy or autoscale event
+would, and reports:
+- startup ms: time spent in the lifespan warmup (warm_parser), if any
+- first request ms: time of the first validate_sql call
+
+Scenarios:
+- cold: no parser cache and no warmup; the first request compiles the grammar
+- cached: serialized parser on disk, no warmup; the first request loads it
+- warm: serialized parser on disk and lifespan warmup; the first request only parses
+
+Run from backend directory: python -m benchmarks.bench_startup
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+REPEATS = 5
+
+_CHILD = """
+import json, sys, time
+from security.sql_guard import validate_sql, warm_parser
+startup = 0.0
+if sys.argv[1] == "1":
+    started = time.perf_counter()
+    warm_parser()
+    startup = time.perf_counter() - started
+started = time.perf_counter()
+validate_sql("SELECT AVG(close) AS a FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01'")
+print(json.dumps([startup * 1000, (time.perf_counter() - started) * 1000]))
+"""
+
+
+def _run(cache_dir: str, warmup: bool) -> tuple[float, float]:
+    env = {**os.environ, "SQL_PARSER_CACHE_DIR": cache_dir}
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, "1" if warmup else "0"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    startup, first = json.loads(output.strip().splitlines()[-1])
+    return startup, first
+
+
+def main():
+    print(f"median of {REPEATS} fresh processes")
+    print(f"{'scenario':>10} {'startup ms':>11} {'first request ms':>17}")
+    with tempfile.TemporaryDirectory() as cached_dir:
+        _run(cached_dir, warmup=False)  # populate the parser cache
+        scenarios = {
+            "cold": ("", False),
+            "cached": (cached_dir, False),
+            "warm": (cached_dir, True),
+        }
+        for name, (cache_dir, warmup) in scenarios.items():
+            runs = [_run(cache_dir, warmup) for _ in range(REPEATS)]
+            startup = sorted(r[0] for r in runs)[REPEATS // 2]
+            first = sorted(r[1] for r in runs)[REPEATS // 2]
+            print(f"{name:>10} {startup:>11.1f} {first:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
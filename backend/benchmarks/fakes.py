@@ -0,0 +1,319 @@
+"""
+Local stand-ins for the OpenAI Responses API and the ClickHouse HTTP interface.
+
+FakeOpenAI answers POST /v1/responses with a custom_tool_call item carrying
+SQL for the question. FakeClickHouse runs the SQL it receives on the
+in-process NumPy engine (db/local_client.py) over the CSV export and answers
+in ClickHouse's Native format, so clickhouse_connect parses real result
+blocks. Both sleep for a configurable latency distribution per request.
+
+Used by benchmarks/bench_load.py. Can also run standalone:
+
+Run from backend directory: python -m benchmarks.fakes --llm-latency lognormal:800,0.4
+"""
+import argparse
+import json
+import math
+import numbers
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.local_client import LocalColumnarClient
+from services.sql_generator import TOOL_NAME
+
+# Questions with known SQL (tests/cfg_evals.json plus grouped and row-listing
+# shapes); anything else gets DEFAULT_SQL
+WORKLOAD: Dict[str, str] = {
+    "sum the total marketcap in the last 30 hours":
+        "SELECT SUM(marketcap) FROM coin_Bitcoin WHERE date BETWEEN '2021-07-05' AND '2021-07-06'",
+    "average closing price over the last 7 days":
+        "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2021-06-30' AND '2021-07-06'",
+    "maximum high price in the last 2 days":
+        "SELECT MAX(high) FROM coin_Bitcoin WHERE date BETWEEN '2021-07-04' AND '2021-07-06'",
+    "average close between 2020-08-01 and 2020-11-30":
+        "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-08-01' AND '2020-11-30'",
+    "what was the close on november 15 2016":
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-11-15 00:00:00' AND '2016-11-15 23:59:59' LIMIT 1",
+    "daily average close in june 2021":
+        "SELECT AVG(close) AS avg_close FROM coin_Bitcoin "
+        "WHERE date BETWEEN '2021-06-01' AND '2021-06-30' GROUP BY toStartOfDay(date)",
+    "top 10 closing prices in 2020":
+        "SELECT date, close FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-12-31' "
+        "ORDER BY close DESC LIMIT 10",
+    "all closing prices in 2020":
+        "SELECT date, close FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-12-31'",
+}
+DEFAULT_SQL = "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2021-01-01' AND '2021-06-30'"
+
+_FORMAT_CLAUSE = re.compile(r"\s+FORMAT\s+\w+\s*$", re.IGNORECASE)
+_RUN_SUFFIX = re.compile(r"\s*\(run \d+\)$")
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec: "fixed:MS", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA" (milliseconds)
+
+    Returns:
+        Function returning a latency sample in seconds
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Bad latency spec '{spec}'. Use fixed:MS, uniform:LO,HI or lognormal:MEDIAN,SIGMA")
+
+
+def sql_for_question(question: str) -> str:
+    """SQL the fake model returns; '(run N)' suffixes added by the load test are ignored."""
+    return WORKLOAD.get(_RUN_SUFFIX.sub("", question.strip()).lower(), DEFAULT_SQL)
+
+
+# ClickHouse Native format
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _varint(len(data)) + data
+
+
+def _column_type(values: Sequence) -> str:
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, datetime) for v in present):
+        base = "DateTime"
+    elif present and all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in present):
+        base = "UInt64" if all(v >= 0 for v in present) else "Int64"
+    elif all(isinstance(v, numbers.Real) for v in present):
+        base = "Float64"
+    else:
+        base = "String"
+    return f"Nullable({base})" if len(present) < len(values) else base
+
+
+def _encode_values(base: str, values: Sequence) -> bytes:
+    if base == "Float64":
+        return struct.pack(f"<{len(values)}d", *(float(v) if v is not None else 0.0 for v in values))
+    if base in ("UInt64", "Int64"):
+        code = "Q" if base == "UInt64" else "q"
+        return struct.pack(f"<{len(values)}{code}", *(int(v) if v is not None else 0 for v in values))
+    if base == "DateTime":
+        seconds = [
+            int(v.replace(tzinfo=timezone.utc).timestamp()) if v is not None else 0 for v in values
+        ]
+        return struct.pack(f"<{len(values)}I", *seconds)
+    return b"".join(_string("" if v is None else str(v)) for v in values)
+
+
+def encode_native(columns: List[str], rows: List[Sequence], types: Optional[List[str]] = None) -> bytes:
+    """
+    Encode a result as one ClickHouse Native format block.
+
+    Args:
+        columns: Column names
+        rows: Row tuples
+        types: ClickHouse type per column (inferred from the values if omitted)
+
+    Returns:
+        Native format bytes
+    """
+    column_values = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+    if types is None:
+        types = [_column_type(values) for values in column_values]
+
+    out = bytearray(_varint(len(columns)) + _varint(len(rows)))
+    for name, type_name, values in zip(columns, types, column_values):
+        out += _string(name) + _string(type_name)
+        if type_name.startswith("Nullable("):
+            out += bytes(v is None for v in values)
+            out += _encode_values(type_name[len("Nullable("):-1], values)
+        else:
+            out += _encode_values(type_name, values)
+    return bytes(out)
+
+
+# Servers
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Keep-alive handler delegating to the fake that owns the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, b"Ok.\n", "text/plain")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, payload, content_type = self.server.fake.handle(self.path, body)
+        self._reply(status, payload, content_type)
+
+
+class _FakeServer:
+    """Threaded HTTP server on 127.0.0.1, started in a background thread."""
+
+    def __init__(self, latency: Callable[[], float]):
+        self.latency = latency
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, port: int = 0) -> int:
+        """
+        Start serving.
+
+        Args:
+            port: Port to bind (0 picks a free one)
+
+        Returns:
+            The bound port
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def handle(self, path: str, body: bytes) -> tuple[int, bytes, str]:
+        self.requests += 1
+        time.sleep(self.latency())
+        return self.respond(path, body)
+
+    def respond(self, path: str, body: bytes) -> tuple[int, bytes, str]:
+        raise NotImplementedError
+
+
+class FakeOpenAI(_FakeServer):
+    """Responses API returning a CFG tool call with SQL for each question."""
+
+    def __init__(self, latency: Callable[[], float], sql_for: Callable[[str], str] = sql_for_question):
+        super().__init__(latency)
+        self.sql_for = sql_for
+
+    def respond(self, path: str, body: bytes) -> tuple[int, bytes, str]:
+        if not path.rstrip("/").endswith("/responses"):
+            return 404, b'{"error": {"message": "not found"}}', "application/json"
+        request = json.loads(body)
+        question = request.get("input", "")
+        if not isinstance(question, str):
+            question = json.dumps(question)
+        response = {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": request.get("model", "fake"),
+            "output": [{
+                "type": "custom_tool_call",
+                "id": f"ctc_{uuid.uuid4().hex}",
+                "call_id": f"call_{uuid.uuid4().hex}",
+                "name": TOOL_NAME,
+                "input": self.sql_for(question),
+                "status": "completed",
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": request.get("tool_choice", "auto"),
+            "tools": request.get("tools", []),
+            "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+        }
+        return 200, json.dumps(response).encode("utf-8"), "application/json"
+
+
+class FakeClickHouse(_FakeServer):
+    """ClickHouse HTTP interface executing queries on the local NumPy engine."""
+
+    def __init__(self, latency: Callable[[], float], engine: Optional[LocalColumnarClient] = None):
+        super().__init__(latency)
+        self.engine = engine or LocalColumnarClient()
+
+    def handle(self, path: str, body: bytes) -> tuple[int, bytes, str]:
+        sql = body.decode("utf-8") or parse_qs(urlparse(path).query).get("query", [""])[0]
+        # Connection setup queries don't count as load
+        if "version()" in sql or "system.settings" in sql:
+            return self.respond(path, body)
+        return super().handle(path, body)
+
+    def respond(self, path: str, body: bytes) -> tuple[int, bytes, str]:
+        sql = body.decode("utf-8") or parse_qs(urlparse(path).query).get("query", [""])[0]
+        if "version()" in sql:
+            return 200, b"24.8.1.1\tUTC\n", "text/tab-separated-values"
+        if "system.settings" in sql:
+            native = encode_native(["name", "value", "readonly"], [], ["String", "String", "UInt8"])
+            return 200, native, "application/octet-stream"
+
+        try:
+            result = self.engine.query(_FORMAT_CLAUSE.sub("", sql))
+        except Exception as e:
+            message = f"Code: 62. DB::Exception: {e}. (SYNTAX_ERROR)\n"
+            return 500, message.encode("utf-8"), "text/plain"
+        return 200, encode_native(list(result["columns"]), result["rows"]), "application/octet-stream"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fake OpenAI and ClickHouse servers")
+    parser.add_argument("--openai-port", type=int, default=0)
+    parser.add_argument("--clickhouse-port", type=int, default=0)
+    parser.add_argument("--llm-latency", default="lognormal:800,0.4", help="OpenAI latency distribution (ms)")
+    parser.add_argument("--db-latency", default="lognormal:40,0.5", help="ClickHouse latency distribution (ms)")
+    args = parser.parse_args()
+
+    openai_port = FakeOpenAI(parse_latency(args.llm_latency)).start(args.openai_port)
+    clickhouse_port = FakeClickHouse(parse_latency(args.db_latency)).start(args.clickhouse_port)
+    # First line of output tells a parent process where the fakes listen
+    print(json.dumps({"openai_port": openai_port, "clickhouse_port": clickhouse_port}), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Caching layers for generated SQL and query results."""
@@ -0,0 +1,154 @@
+"""
+Thread-safe in-process LRU cache with TTL and size bounds.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class TTLCache:
+    """
+    Least-recently-used cache whose entries also expire after a fixed TTL.
+
+    Entries are bounded both by count (``max_entries``) and, optionally, by a
+    total size budget (``max_bytes``) measured with ``sizeof``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Default lifetime of an entry (None means no expiry)
+            max_bytes: Optional total size budget across all entries
+            sizeof: Function returning the size of a value (required with max_bytes)
+        """
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("sizeof is required when max_bytes is set")
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[str, tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a key is stored (without counting a lookup)."""
+        return key in self._entries
+
+    def get(self, key: str, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Look up a key, refreshing its recency on hit.
+
+        Args:
+            key: Cache key
+            accept: Optional check of the cached value; a rejected value
+                counts as a miss (and is kept for other callers)
+
+        Returns:
+            Cached value or None on miss/expiry/rejection
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            if accept is not None and not accept(value):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value, evicting least-recently-used entries to respect the bounds.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Per-entry TTL overriding the default
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self._sizeof(value) if self._sizeof else 0
+
+        # A single value larger than the whole budget is never cached
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, expires_at, size)
+            self.current_bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Snapshot of cache counters.
+
+        Returns:
+            Dictionary with size and hit/miss/eviction counters
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry. Caller must hold the lock."""
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
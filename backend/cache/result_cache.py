@@ -0,0 +1,448 @@
+"""
+Result cache for database queries keyed by canonical SQL.
+
+Results are stored as compressed columnar blobs (typed arrays plus a null
+mask per column) rather than lists of Python row tuples, and the cache is
+bounded by the total size of those blobs. A data-version epoch is part of
+every key, so bumping it invalidates the whole cache in one step.
+
+With a shared store (SQLite file or Redis-compatible server) the blobs and
+the epoch are shared by every worker: a result computed by one worker is a
+hit in the others, and an epoch bump reaches them within a second.
+"""
+import hashlib
+import json
+import logging
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Union
+
+from cache.lru import TTLCache
+from cache.store import STORE_ERRORS, RedisStore, SQLiteStore, shared_store
+from core.config import get_env
+from core.constants import (
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_RELATIVE_TTL_SECONDS,
+    RESULT_CACHE_STORE_TTL_SECONDS,
+)
+from security.sql_guard import canonicalize_sql
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+CACHE_ENABLED_ENV = "RESULT_CACHE_ENABLED"
+CACHE_MAX_BYTES_ENV = "RESULT_CACHE_MAX_BYTES"
+CACHE_MAX_ENTRIES_ENV = "RESULT_CACHE_MAX_ENTRIES"
+CACHE_RELATIVE_TTL_ENV = "RESULT_CACHE_RELATIVE_TTL_SECONDS"
+CACHE_PATH_ENV = "RESULT_CACHE_PATH"
+CACHE_STORE_TTL_ENV = "RESULT_CACHE_STORE_TTL_SECONDS"
+DATA_VERSION_ENV = "DATA_VERSION"
+
+# Shared-store key holding the data-version epoch, and how often workers re-read it
+EPOCH_KEY = "result:epoch"
+EPOCH_CHECK_SECONDS = 1.0
+
+# Fixed per-entry bookkeeping overhead counted against the byte budget
+ENTRY_OVERHEAD_BYTES = 256
+
+# Column encodings
+_FLOAT = "f"  # float64
+_INT = "i"  # int64
+_DATETIME = "t"  # int64 microseconds since the Unix epoch (naive datetimes)
+_JSON = "j"  # JSON list for anything else that is plain JSON
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class _Unencodable(Exception):
+    """Raised when a result contains values the blob format can't represent."""
+
+
+def _column_kind(values: list) -> str:
+    present = [v for v in values if v is not None]
+    if present and all(type(v) is float for v in present):
+        return _FLOAT
+    if present and all(type(v) is int and -2**63 <= v < 2**63 for v in present):
+        return _INT
+    if present and all(type(v) is datetime and v.tzinfo is None for v in present):
+        return _DATETIME
+    if all(v is None or type(v) in (str, int, float, bool) for v in present):
+        return _JSON
+    raise _Unencodable()
+
+
+def _encode_column(values: list) -> tuple[str, bytes]:
+    kind = _column_kind(values)
+    if kind == _JSON:
+        return kind, json.dumps(values).encode("utf-8")
+
+    nulls = bytes(v is None for v in values)
+    if kind == _FLOAT:
+        data = array("d", (0.0 if v is None else v for v in values))
+    elif kind == _INT:
+        data = array("q", (0 if v is None else v for v in values))
+    else:
+        data = array("q", (0 if v is None else (v - _EPOCH) // _MICROSECOND for v in values))
+    return kind, nulls + data.tobytes()
+
+
+def _decode_column(kind: str, payload: bytes, row_count: int) -> list:
+    if kind == _JSON:
+        return json.loads(payload)
+
+    nulls = payload[:row_count]
+    data = array("d" if kind == _FLOAT else "q")
+    data.frombytes(payload[row_count:])
+    values = data.tolist()
+    if kind == _DATETIME:
+        values = [_EPOCH + v * _MICROSECOND for v in values]
+    if any(nulls):
+        values = [None if is_null else v for v, is_null in zip(values, nulls)]
+    return values
+
+
+def encode_result(result: dict) -> bytes:
+    """
+    Encode a query result as a compressed columnar blob.
+
+    Args:
+        result: Dictionary with 'columns' and 'rows' keys
+
+    Returns:
+        zlib-compressed blob
+
+    Raises:
+        _Unencodable: If a column holds values the format can't represent
+    """
+    columns = list(result.get("columns", []))
+    rows = result.get("rows", [])
+    column_values = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+
+    kinds = []
+    payloads = []
+    for values in column_values:
+        kind, payload = _encode_column(values)
+        kinds.append(kind)
+        payloads.append(payload)
+
+    header = json.dumps({
+        "columns": columns,
+        "kinds": kinds,
+        "sizes": [len(p) for p in payloads],
+        "rows": len(rows),
+    }).encode("utf-8")
+    return zlib.compress(struct.pack("<I", len(header)) + header + b"".join(payloads))
+
+
+def decode_result(blob: bytes) -> dict:
+    """
+    Decode a blob produced by encode_result.
+
+    Args:
+        blob: Compressed columnar blob
+
+    Returns:
+        Dictionary with 'columns' and 'rows' keys
+    """
+    raw = zlib.decompress(blob)
+    (header_size,) = struct.unpack_from("<I", raw)
+    offset = 4 + header_size
+    header = json.loads(raw[4:offset])
+
+    column_values = []
+    for kind, size in zip(header["kinds"], header["sizes"]):
+        column_values.append(_decode_column(kind, raw[offset:offset + size], header["rows"]))
+        offset += size
+
+    rows = list(zip(*column_values)) if column_values else []
+    return {"columns": header["columns"], "rows": rows}
+
+
+def _entry_size(entry: tuple[bytes, tuple]) -> int:
+    blob, _ = entry
+    return len(blob) + ENTRY_OVERHEAD_BYTES
+
+
+def _pack_entry(blob: bytes, aliases: tuple) -> bytes:
+    """Serialize a cache entry (blob plus column aliases) for the shared store."""
+    header = json.dumps(list(aliases)).encode("utf-8")
+    return struct.pack("<I", len(header)) + header + blob
+
+
+def _unpack_entry(value: bytes) -> tuple[bytes, tuple]:
+    (header_size,) = struct.unpack_from("<I", value)
+    aliases = tuple(json.loads(value[4:4 + header_size]))
+    return value[4 + header_size:], aliases
+
+
+def _relabels(aliases: tuple, stored_aliases: tuple) -> bool:
+    """
+    Whether a result stored under stored_aliases can be relabeled for a
+    query with aliases: a position aliased only in the stored query has an
+    unknown natural name.
+    """
+    return all(
+        alias is not None or stored_alias is None
+        for alias, stored_alias in zip(aliases, stored_aliases)
+    )
+
+
+class ResultCache:
+    """
+    Bounded, memory-accounted cache of query results keyed by canonical SQL.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        relative_ttl_seconds: float = RESULT_CACHE_RELATIVE_TTL_SECONDS,
+        epoch: int = 0,
+        store: Optional[Union[SQLiteStore, RedisStore]] = None,
+        store_ttl_seconds: float = RESULT_CACHE_STORE_TTL_SECONDS,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Budget for the total size of cached blobs
+            max_entries: Maximum number of cached results
+            relative_ttl_seconds: TTL for now()-relative queries (0 disables caching them)
+            epoch: Initial data-version epoch
+            store: Optional shared tier for results and the epoch
+            store_ttl_seconds: Lifetime of absolute-range results in the shared tier
+        """
+        self.relative_ttl_seconds = relative_ttl_seconds
+        self.epoch = epoch
+        self.memory = TTLCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            sizeof=_entry_size,
+        )
+        self.store = store
+        self.store_ttl_seconds = store_ttl_seconds
+        self._lock = threading.Lock()
+        self._epoch_checked = float("-inf")
+        self.bypassed = 0
+
+        # Counters for the shared tier (memory tier keeps its own)
+        self.store_hits = 0
+        self.store_misses = 0
+        self.store_errors = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        """
+        Build a cache from environment configuration.
+
+        Returns:
+            ResultCache instance, or None if caching is disabled
+        """
+        if get_env(CACHE_ENABLED_ENV, "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            max_bytes=int(get_env(CACHE_MAX_BYTES_ENV, str(RESULT_CACHE_MAX_BYTES))),
+            max_entries=int(get_env(CACHE_MAX_ENTRIES_ENV, str(RESULT_CACHE_MAX_ENTRIES))),
+            relative_ttl_seconds=float(
+                get_env(CACHE_RELATIVE_TTL_ENV, str(RESULT_CACHE_RELATIVE_TTL_SECONDS))
+            ),
+            epoch=int(get_env(DATA_VERSION_ENV, "0")),
+            store=shared_store(get_env(CACHE_PATH_ENV)),
+            store_ttl_seconds=float(
+                get_env(CACHE_STORE_TTL_ENV, str(RESULT_CACHE_STORE_TTL_SECONDS))
+            ),
+        )
+
+    def _shared_epoch(self) -> Optional[int]:
+        """Epoch recorded in the shared store (0 if unset), or None if unavailable."""
+        try:
+            value = self.store.get(EPOCH_KEY)
+        except STORE_ERRORS as e:
+            self.store_errors += 1
+            logger.warning(f"Result cache store epoch lookup failed: {e}")
+            return None
+        return int(value) if value else 0
+
+    def _publish_epoch(self, epoch: int) -> None:
+        try:
+            self.store.set(EPOCH_KEY, str(epoch).encode("ascii"))
+        except STORE_ERRORS as e:
+            self.store_errors += 1
+            logger.warning(f"Result cache store epoch write failed: {e}")
+
+    def _sync_epoch(self) -> None:
+        """
+        Adopt a newer epoch bumped by another worker (checked at most once per
+        EPOCH_CHECK_SECONDS), or publish ours if a deploy raised DATA_VERSION.
+        """
+        if self.store is None:
+            return
+        now = time.monotonic()
+        if now - self._epoch_checked < EPOCH_CHECK_SECONDS:
+            return
+        self._epoch_checked = now
+
+        shared = self._shared_epoch()
+        if shared is None:
+            return
+        with self._lock:
+            if shared > self.epoch:
+                self.epoch = shared
+                self.memory.clear()
+                return
+            publish = shared < self.epoch
+        if publish:
+            self._publish_epoch(self.epoch)
+
+    def bump_epoch(self) -> int:
+        """
+        Invalidate every cached result after the underlying table changed.
+
+        With a shared store the new epoch is published to every worker.
+
+        Returns:
+            The new epoch
+        """
+        shared = self._shared_epoch() if self.store is not None else None
+        with self._lock:
+            self.epoch = max(self.epoch, shared or 0) + 1
+            self.memory.clear()
+            epoch = self.epoch
+        if self.store is not None:
+            self._publish_epoch(epoch)
+        return epoch
+
+    def _key(self, canonical_key: str) -> str:
+        digest = hashlib.sha256(canonical_key.encode("utf-8")).hexdigest()
+        return f"result:{self.epoch}:{digest}"
+
+    def get(self, sql: str) -> Optional[dict]:
+        """
+        Look up the result of a query.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            Dictionary with 'columns' and 'rows' keys, or None on miss
+        """
+        try:
+            canonical = canonicalize_sql(sql)
+        except ValueError:
+            self.bypassed += 1
+            return None
+        if canonical.is_relative and self.relative_ttl_seconds <= 0:
+            self.bypassed += 1
+            return None
+
+        self._sync_epoch()
+        key = self._key(canonical.key)
+
+        # The key ignores aliases, so an entry is only usable if every column
+        # this query leaves unaliased has its natural name in the stored result
+        def usable(entry: tuple[bytes, tuple]) -> bool:
+            return _relabels(canonical.aliases, entry[1])
+
+        entry = self.memory.get(key, accept=usable)
+        if entry is None and key not in self.memory:
+            entry = self._from_store(key, canonical.is_relative, usable)
+        if entry is None:
+            return None
+
+        blob, _ = entry
+        result = decode_result(blob)
+        result["columns"] = [
+            alias if alias is not None else name
+            for name, alias in zip(result["columns"], canonical.aliases)
+        ]
+        return result
+
+    def set(self, sql: str, result: dict) -> None:
+        """
+        Cache the result of a query.
+
+        Args:
+            sql: SQL query string
+            result: Dictionary with 'columns' and 'rows' keys
+        """
+        try:
+            canonical = canonicalize_sql(sql)
+        except ValueError:
+            return
+
+        ttl = None
+        if canonical.is_relative:
+            if self.relative_ttl_seconds <= 0:
+                return
+            ttl = self.relative_ttl_seconds
+
+        if len(result.get("columns", [])) != len(canonical.aliases):
+            return
+
+        try:
+            blob = encode_result(result)
+        except _Unencodable:
+            logger.debug("Result contains values that can't be cached")
+            return
+
+        self._sync_epoch()
+        key = self._key(canonical.key)
+        self.memory.set(key, (blob, canonical.aliases), ttl_seconds=ttl)
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, _pack_entry(blob, canonical.aliases), ttl or self.store_ttl_seconds)
+        except STORE_ERRORS as e:
+            self.store_errors += 1
+            logger.warning(f"Result cache store write failed: {e}")
+
+    def _from_store(
+        self,
+        key: str,
+        is_relative: bool,
+        usable: Callable[[tuple[bytes, tuple]], bool],
+    ) -> Optional[tuple[bytes, tuple]]:
+        """Look up an entry in the shared tier, copying hits into memory."""
+        if self.store is None:
+            return None
+        try:
+            value = self.store.get(key)
+        except STORE_ERRORS as e:
+            self.store_errors += 1
+            logger.warning(f"Result cache store lookup failed: {e}")
+            return None
+
+        if value is None:
+            self.store_misses += 1
+            return None
+
+        entry = _unpack_entry(value)
+        ttl = self.relative_ttl_seconds if is_relative else None
+        self.memory.set(key, entry, ttl_seconds=ttl)
+        if not usable(entry):
+            self.store_misses += 1
+            return None
+        self.store_hits += 1
+        return entry
+
+    def stats(self) -> dict:
+        """
+        Snapshot of cache counters.
+
+        Returns:
+            Dictionary of counters
+        """
+        return {
+            **self.memory.stats(),
+            "bypassed": self.bypassed,
+            "epoch": self.epoch,
+            "store_hits": self.store_hits,
+            "store_misses": self.store_misses,
+            "store_errors": self.store_errors,
+        }
@@ -0,0 +1,142 @@
+"""
+Single-flight coalescing of identical in-flight upstream calls.
+
+When several requests need the same upstream result at the same time (N
+dashboard widgets asking the same question), only the first one calls
+upstream; the others wait for its outcome. Nothing is kept once the call
+finishes, so this complements the caches rather than replacing them.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers with the same key.
+
+    Thread callers use do(); coroutines use ado(). The two have separate
+    in-flight tables, since a thread can't await an asyncio future. Results
+    and exceptions of the shared call are delivered to every waiter.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the group.
+
+        Args:
+            name: Label used in log messages
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._async_calls: Dict[Hashable, "asyncio.Task"] = {}
+
+        # Counters
+        self.calls = 0  # upstream calls made
+        self.coalesced = 0  # upstream calls saved by joining an in-flight call
+        self.errors = 0  # upstream calls that raised
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn, or wait for the identical call another thread has in flight.
+
+        Args:
+            key: Identity of the call
+            fn: Function making the upstream call
+
+        Returns:
+            The result of the shared call
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.debug(f"Joined in-flight {self.name} call")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result
+
+    async def ado(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        on_lead: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """
+        Await fn(), or wait for the identical call already in flight.
+
+        The call runs as its own task, so a waiter being cancelled (a client
+        disconnecting) doesn't cancel it for the others.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine function making the upstream call
+            on_lead: Called only when this caller starts the call (not when
+                it joins one in flight), before it starts; may raise to
+                refuse it, and then nothing is started
+
+        Returns:
+            The result of the shared call
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        task = self._async_calls.get(key)
+        if task is None:
+            if on_lead is not None:
+                on_lead()
+            task = asyncio.ensure_future(fn())
+            self._async_calls[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joined in-flight {self.name} call")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Task") -> None:
+        """Forget a finished async call (and mark its exception as retrieved)."""
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if task.cancelled() or task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        """
+        Snapshot of coalescing counters.
+
+        Returns:
+            Dictionary of counters
+        """
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._calls) + len(self._async_calls),
+        }
@@ -0,0 +1,200 @@
+"""
+Tiered cache for natural language question -> generated SQL.
+
+Tier 1 is an in-process LRU with TTL. Tier 2 is an optional shared store: a
+SQLite file shared by all workers on the host, or a Redis-compatible server
+shared by workers on every host. Keys include a fingerprint of the grammar and
+system instructions, so changing either silently invalidates old entries.
+"""
+import hashlib
+import logging
+import re
+from typing import Optional, Union
+
+from cache.lru import TTLCache
+from cache.store import STORE_ERRORS, RedisStore, SQLiteStore, shared_store
+from core.config import get_env
+from core.constants import SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+CACHE_ENABLED_ENV = "SQL_CACHE_ENABLED"
+CACHE_MAX_ENTRIES_ENV = "SQL_CACHE_MAX_ENTRIES"
+CACHE_TTL_ENV = "SQL_CACHE_TTL_SECONDS"
+CACHE_PATH_ENV = "SQL_CACHE_PATH"
+
+KEY_PREFIX = "sql"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalize a question so trivial variations share a cache entry.
+
+    Args:
+        prompt: Natural language question
+
+    Returns:
+        Lowercased, whitespace-collapsed question without trailing punctuation
+    """
+    normalized = _WHITESPACE.sub(" ", prompt.strip().lower())
+    return normalized.rstrip(" ?.!")
+
+
+def fingerprint(*parts: str) -> str:
+    """
+    Hash the generation inputs (grammar, instructions) into a short fingerprint.
+
+    Args:
+        parts: Strings that affect what SQL the model generates
+
+    Returns:
+        Hex digest prefix
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()[:16]
+
+
+class SQLCache:
+    """
+    Two-tier cache mapping (question, model) to validated SQL.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        max_entries: int = SQL_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SQL_CACHE_TTL_SECONDS,
+        store: Optional[Union[SQLiteStore, RedisStore]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            fingerprint: Hash of the grammar and system instructions
+            max_entries: Maximum entries in the in-process tier
+            ttl_seconds: Lifetime of an entry in both tiers
+            store: Optional shared persistent tier
+        """
+        self.fingerprint = fingerprint
+        self.ttl_seconds = ttl_seconds
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.store = store
+
+        # Counters for the shared tier (memory tier keeps its own)
+        self.store_hits = 0
+        self.store_misses = 0
+        self.store_errors = 0
+
+    @classmethod
+    def from_env(cls, fingerprint: str) -> Optional["SQLCache"]:
+        """
+        Build a cache from environment configuration.
+
+        Args:
+            fingerprint: Hash of the grammar and system instructions
+
+        Returns:
+            SQLCache instance, or None if caching is disabled
+        """
+        if get_env(CACHE_ENABLED_ENV, "true").lower() in ("0", "false", "no"):
+            return None
+
+        store = shared_store(get_env(CACHE_PATH_ENV))
+        return cls(
+            fingerprint=fingerprint,
+            max_entries=int(get_env(CACHE_MAX_ENTRIES_ENV, str(SQL_CACHE_MAX_ENTRIES))),
+            ttl_seconds=float(get_env(CACHE_TTL_ENV, str(SQL_CACHE_TTL_SECONDS))),
+            store=store,
+        )
+
+    def key(self, prompt: str, model: str) -> str:
+        """
+        Build the cache key for a question.
+
+        Args:
+            prompt: Natural language question
+            model: Model name used for generation
+
+        Returns:
+            Cache key string
+        """
+        digest = hashlib.sha256(
+            f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")
+        ).hexdigest()
+        return f"{KEY_PREFIX}:{self.fingerprint}:{digest}"
+
+    def get(self, prompt: str, model: str) -> Optional[str]:
+        """
+        Look up SQL for a question, checking the in-process tier first.
+
+        Args:
+            prompt: Natural language question
+            model: Model name used for generation
+
+        Returns:
+            Cached SQL or None
+        """
+        key = self.key(prompt, model)
+        sql = self.memory.get(key)
+        if sql is not None or self.store is None:
+            return sql
+
+        try:
+            value = self.store.get(key)
+        except STORE_ERRORS as e:
+            self.store_errors += 1
+            logger.warning(f"SQL cache store lookup failed: {e}")
+            return None
+
+        if value is None:
+            self.store_misses += 1
+            return None
+
+        self.store_hits += 1
+        sql = value.decode("utf-8")
+        self.memory.set(key, sql)
+        return sql
+
+    def set(self, prompt: str, model: str, sql: str) -> None:
+        """
+        Store validated SQL for a question in every tier.
+
+        Args:
+            prompt: Natural language question
+            model: Model name used for generation
+            sql: Validated SQL
+        """
+        key = self.key(prompt, model)
+        self.memory.set(key, sql)
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, sql.encode("utf-8"), self.ttl_seconds)
+        except STORE_ERRORS as e:
+            self.store_errors += 1
+            logger.warning(f"SQL cache store write failed: {e}")
+
+    def stats(self) -> dict:
+        """
+        Snapshot of cache counters across tiers.
+
+        Returns:
+            Dictionary of counters
+        """
+        memory = self.memory.stats()
+        return {
+            "entries": memory["entries"],
+            "hits": memory["hits"] + self.store_hits,
+            "misses": self.store_misses if self.store is not None else memory["misses"],
+            "evictions": memory["evictions"],
+            "expirations": memory["expirations"],
+            "memory_hits": memory["hits"],
+            "store_hits": self.store_hits,
+            "store_errors": self.store_errors,
+        }
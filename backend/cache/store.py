@@ -0,0 +1,351 @@
+"""
+Persistent key-value stores used as the shared tier of the caches.
+
+The SQLite store lives in a single file, so it survives restarts and is shared
+by every uvicorn worker on the same host (put it on /dev/shm to keep it in
+shared memory). The Redis store works with any Redis-compatible server and is
+shared by workers on every host.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Union
+
+from core.config import get_env
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+SHARED_STATE_URL_ENV = "SHARED_STATE_URL"
+
+# URL schemes served by RedisStore
+REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+
+
+class StoreUnavailable(Exception):
+    """Raised when a shared store can't be reached; callers fall back to per-process state."""
+
+
+# Errors a cache should treat as "shared tier unavailable"
+STORE_ERRORS = (sqlite3.Error, StoreUnavailable)
+
+
+class SQLiteStore:
+    """
+    Bytes key-value store backed by a SQLite file with per-entry expiry,
+    plus expiring integer counters (the rate limiter's shared storage).
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 2000):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the SQLite database file (created if missing)
+            busy_timeout_ms: How long writers wait on a lock held by another worker
+        """
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Get the connection for the current process, reconnecting after a fork.
+        Caller must hold the lock.
+        """
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_ms / 1000,
+                check_same_thread=False,
+                isolation_level=None,  # autocommit
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " expires_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " key TEXT PRIMARY KEY,"
+                " count INTEGER NOT NULL,"
+                " expires_at REAL)"
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Fetch a value.
+
+        Args:
+            key: Entry key
+
+        Returns:
+            Stored bytes, or None if missing or expired
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value, replacing any existing entry.
+
+        Args:
+            key: Entry key
+            value: Bytes to store
+            ttl_seconds: Lifetime of the entry (None means no expiry)
+        """
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if present."""
+        with self._lock:
+            self._connection().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._connection().execute("DELETE FROM kv")
+
+    def incr(self, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        """
+        Add to a counter, atomically across every process using the file.
+
+        Args:
+            key: Counter key
+            amount: Amount to add
+            ttl_seconds: Lifetime of the counter, set when it is created (or
+                restarted after expiring); later increments keep that expiry
+
+        Returns:
+            Counter value after the increment
+        """
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            conn = self._connection()
+            # Take the write lock up front so the read below sees our increment only
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM counters WHERE key = ? AND expires_at <= ?", (key, now))
+                conn.execute(
+                    "INSERT INTO counters (key, count, expires_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET count = count + excluded.count",
+                    (key, amount, expires_at),
+                )
+                (count,) = conn.execute("SELECT count FROM counters WHERE key = ?", (key,)).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def counter(self, key: str) -> tuple[int, Optional[float]]:
+        """
+        Read a counter.
+
+        Args:
+            key: Counter key
+
+        Returns:
+            Value and expiry time (epoch seconds); (0, None) if missing or expired
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT count, expires_at FROM counters WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return 0, None
+        return row
+
+    def delete_counter(self, key: str) -> None:
+        """Remove a counter if present."""
+        with self._lock:
+            self._connection().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def clear_counters(self) -> int:
+        """
+        Remove every counter.
+
+        Returns:
+            Number of counters removed
+        """
+        with self._lock:
+            return self._connection().execute("DELETE FROM counters").rowcount
+
+    def _purge_expired(self) -> None:
+        """Drop expired rows so the file does not grow across restarts."""
+        try:
+            with self._lock:
+                conn = self._connection()
+                for table in ("kv", "counters"):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                        (time.time(),),
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to purge expired cache entries: {e}")
+
+
+class RedisStore:
+    """
+    Bytes key-value store on a Redis-compatible server.
+
+    Keys are namespaced with a prefix so clear() only touches this app's
+    entries. After a failed call the store reports itself unavailable for
+    retry_seconds without touching the network, so an outage costs each
+    request nothing beyond the in-process cache tier.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        prefix: str = "dripdrop:",
+        timeout_seconds: float = 0.25,
+        retry_seconds: float = 5.0,
+        client=None,
+    ):
+        """
+        Initialize the store. No connection is made until first use.
+
+        Args:
+            url: Server URL (redis://, rediss:// or unix://)
+            prefix: Namespace prepended to every key
+            timeout_seconds: Connect and socket timeout per call
+            retry_seconds: How long to skip the server after a failure
+            client: Pre-built client with the redis-py interface (instead of url)
+        """
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(
+                url,
+                socket_timeout=timeout_seconds,
+                socket_connect_timeout=timeout_seconds,
+            )
+            self._errors = (OSError, redis.RedisError)
+        else:
+            self._errors = (OSError,)
+        self.url = url
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds
+        self._client = client
+        self._down_until = 0.0
+
+    def _call(self, method: str, *args, **kwargs):
+        """Run one client call, translating failures to StoreUnavailable."""
+        if time.monotonic() < self._down_until:
+            raise StoreUnavailable(f"{self.url or 'store'} marked down")
+        try:
+            return getattr(self._client, method)(*args, **kwargs)
+        except self._errors as e:
+            self._down_until = time.monotonic() + self.retry_seconds
+            raise StoreUnavailable(str(e)) from e
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Fetch a value.
+
+        Args:
+            key: Entry key
+
+        Returns:
+            Stored bytes, or None if missing or expired
+
+        Raises:
+            StoreUnavailable: If the server can't be reached
+        """
+        value = self._call("get", self.prefix + key)
+        return None if value is None else bytes(value)
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value, replacing any existing entry.
+
+        Args:
+            key: Entry key
+            value: Bytes to store
+            ttl_seconds: Lifetime of the entry (None means no expiry)
+
+        Raises:
+            StoreUnavailable: If the server can't be reached
+        """
+        px = max(1, int(ttl_seconds * 1000)) if ttl_seconds is not None else None
+        self._call("set", self.prefix + key, value, px=px)
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if present."""
+        self._call("delete", self.prefix + key)
+
+    def clear(self) -> None:
+        """Remove every entry under this store's prefix."""
+        keys = list(self._call("scan_iter", match=self.prefix + "*", count=500))
+        for start in range(0, len(keys), 500):
+            self._call("delete", *keys[start:start + 500])
+
+
+def open_store(url: str) -> Union[SQLiteStore, RedisStore]:
+    """
+    Open a shared store from a URL.
+
+    Args:
+        url: redis://, rediss:// or unix:// for a Redis-compatible server;
+            sqlite:///path or a plain file path for a SQLite file
+
+    Returns:
+        Store instance
+    """
+    if url.startswith(REDIS_SCHEMES):
+        return RedisStore(url)
+    if url.startswith("sqlite://"):
+        url = url[len("sqlite://"):]
+    return SQLiteStore(url)
+
+
+def shared_store(path: Optional[str] = None) -> Optional[Union[SQLiteStore, RedisStore]]:
+    """
+    The store a cache should share with other workers.
+
+    SHARED_STATE_URL wins over a cache's own SQLite path, so one setting
+    moves every cache to the same Redis server.
+
+    Args:
+        path: The cache's own SQLite file path, if configured
+
+    Returns:
+        Store instance, or None if nothing is configured
+    """
+    url = get_env(SHARED_STATE_URL_ENV) or path
+    if not url:
+        return None
+    try:
+        return open_store(url)
+    except (ImportError, ValueError, OSError, sqlite3.Error) as e:
+        logger.warning(f"Shared store {url} unavailable, using per-process caches: {e}")
+        return None
@@ -1,13 +1,58 @@
 """
 Application constants.
 """
+from pathlib import Path
 
-# Data date range constants (from database inspection)
+# backend/ directory; default on-disk paths are anchored here, not at the working directory
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Data date range constants (from database inspection; ingestion extends them, see core/data_bounds.py)
 DATA_MIN_DATE = "2013-04-29"
 DATA_MAX_DATE = "2021-07-06"
+DATA_ROWS_PER_DAY = 1  # daily candles; used to estimate rows scanned
 
 # Query limits
 MAX_QUESTION_LENGTH = 1000
 MAX_DATE_RANGE_DAYS = 365 * 9  # 9 years
 LARGE_RESULT_SET_THRESHOLD = 10000
+STREAM_BLOCK_ROWS = 10000  # rows per block when re-chunking streamed results
+RESPONSE_COMPRESSION_MIN_BYTES = 1024  # compress larger JSON bodies (-1 disables)
+
+# Per-query budget (admission control and ClickHouse resource limits)
+QUERY_MAX_ROWS_TO_READ = 10_000_000
+QUERY_MAX_RESULT_ROWS = 100_000
+QUERY_MAX_RESULT_BYTES = 64 * 1024 * 1024
+QUERY_MAX_EXECUTION_SECONDS = 10
+QUERY_OVER_BUDGET = "limit"  # oversized results: "limit" (add a LIMIT) or "reject"
+QUERY_PAGE_ROWS = 10_000  # larger row listings are returned a page at a time (0 disables)
+
+# Ingestion
+MAX_INGEST_BYTES = 16 * 1024 * 1024  # largest CSV body accepted by /admin/ingest
+
+# Outbound connection pools (per worker process)
+OPENAI_MAX_CONNECTIONS = 20
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = 30
+CLICKHOUSE_POOL_SIZE = 16  # connections per ClickHouse host, for the sync and the async client
+CLICKHOUSE_KEEPALIVE_IDLE_SECONDS = 30  # TCP keep-alive probe delay (sync), idle connection expiry (async)
+CLICKHOUSE_COMPRESSION = "lz4"  # response compression: lz4, zstd, br, gzip or none
+
+# Lark cache of the LALR tables for sql_guard, keyed by grammar hash
+PARSER_CACHE_DIR = str(BACKEND_DIR / ".cache")
+
+# SQL generation cache
+SQL_CACHE_MAX_ENTRIES = 1024
+SQL_CACHE_TTL_SECONDS = 60 * 60 * 24  # 1 day
+
+# Query result cache
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MiB of compressed blobs
+RESULT_CACHE_MAX_ENTRIES = 4096
+RESULT_CACHE_RELATIVE_TTL_SECONDS = 60  # now() - INTERVAL queries
+RESULT_CACHE_STORE_TTL_SECONDS = 60 * 60 * 24  # absolute-range results in the shared tier
+
+# Batch query endpoint
+BATCH_CONCURRENCY = 8  # questions in flight at once
 
+# Eval runner
+EVAL_CONCURRENCY = 4  # cases in flight at once
+EVAL_CASE_TIMEOUT_SECONDS = 60
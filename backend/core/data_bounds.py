@@ -0,0 +1,56 @@
+"""
+Advertised date range of the data.
+
+Starts at DATA_MIN_DATE/DATA_MAX_DATE and follows the data as rows are
+loaded and ingested (see services/ingest_service.py). Date validation, the
+system prompt, rule-based SQL and cost estimates read the current bounds
+here rather than the constants, so they move without a restart.
+"""
+from typing import NamedTuple
+
+from core.constants import DATA_MAX_DATE, DATA_MIN_DATE
+
+
+class DataBounds(NamedTuple):
+    """First and last day with data (YYYY-MM-DD)."""
+    min_date: str
+    max_date: str
+
+
+_bounds = DataBounds(DATA_MIN_DATE, DATA_MAX_DATE)
+
+
+def data_bounds() -> DataBounds:
+    """Current advertised date range."""
+    return _bounds
+
+
+def set_data_bounds(min_date: str, max_date: str) -> DataBounds:
+    """
+    Replace the advertised date range (e.g. with the range of loaded data).
+
+    Args:
+        min_date: First day with data (YYYY-MM-DD)
+        max_date: Last day with data (YYYY-MM-DD)
+
+    Returns:
+        The new bounds
+    """
+    global _bounds
+    _bounds = DataBounds(min_date[:10], max_date[:10])
+    return _bounds
+
+
+def extend_data_bounds(min_date: str, max_date: str) -> DataBounds:
+    """
+    Widen the advertised date range to include [min_date, max_date].
+
+    Args:
+        min_date: First day of new data (YYYY-MM-DD)
+        max_date: Last day of new data (YYYY-MM-DD)
+
+    Returns:
+        The new bounds
+    """
+    current = _bounds
+    return set_data_bounds(min(current.min_date, min_date[:10]), max(current.max_date, max_date[:10]))
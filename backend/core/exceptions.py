@@ -17,3 +17,22 @@ class QueryExecutionError(Exception):
     """Raised when query execution fails."""
     pass
 
+
+class QueryCostError(QueryExecutionError):
+    """Raised when a query's estimated cost exceeds the query budget."""
+    pass
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or can't be resumed."""
+    pass
+
+
+class IngestError(Exception):
+    """Raised when rows can't be ingested."""
+    pass
+
+
+class GenerationRateLimitError(Exception):
+    """Raised when a client has used up its per-minute budget of OpenAI generations."""
+    pass
@@ -1,31 +1,133 @@
 """
 Tinybird/ClickHouse database client.
 """
+import asyncio
+import logging
 import os
+import threading
+from typing import AsyncIterator, Iterator, Optional
+
+import aiohttp
 import clickhouse_connect
+from clickhouse_connect.driver import httputil
 from dotenv import load_dotenv
 
+from cache.result_cache import ResultCache
+from cache.single_flight import SingleFlight
+from core.config import get_env
+from core.constants import (
+    CLICKHOUSE_COMPRESSION,
+    CLICKHOUSE_KEEPALIVE_IDLE_SECONDS,
+    CLICKHOUSE_POOL_SIZE,
+    STREAM_BLOCK_ROWS,
+)
+from db.columnar import ColumnarResult, columns_from_numpy_blocks, columns_from_rows
+from db.query_cost import CostEstimate, QueryBudget, clickhouse_settings, estimate_cost
+from security.schema import NUMERIC_COLUMNS, TABLE
+from security.sql_guard import canonicalize_sql, parse_sql
+from utils.http_pool import PoolMetrics
+from utils.metrics import record_cache
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+PORT_ENV = "TB_CLICKHOUSE_PORT"
+SECURE_ENV = "TB_CLICKHOUSE_SECURE"
+POOL_SIZE_ENV = "CLICKHOUSE_POOL_SIZE"
+KEEPALIVE_IDLE_ENV = "CLICKHOUSE_KEEPALIVE_IDLE_SECONDS"
+COMPRESSION_ENV = "CLICKHOUSE_COMPRESSION"
+
 
 class DatabaseClient:
     """
     Client for executing queries against Tinybird/ClickHouse.
     """
     
-    def __init__(self):
-        host = os.environ["TB_CLICKHOUSE_HOST"]
-        token = os.environ["TINYBIRD_TOKEN"]
-
-        self.client = clickhouse_connect.get_client(
-            host=host,
-            port=443,
-            username="default",
-            password=token,
-            secure=True,
-            connect_timeout=10,
-            send_receive_timeout=30,
+    def __init__(
+        self,
+        result_cache: Optional[ResultCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        budget: Optional[QueryBudget] = None,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            result_cache: Optional cache of query results keyed by canonical SQL
+            single_flight: Coalescer for concurrent identical queries
+                (defaults to a private one)
+            budget: Resource limits sent with every query as ClickHouse
+                settings (defaults to QueryBudget.from_env())
+        """
+        self.connection_params = {
+            "host": os.environ["TB_CLICKHOUSE_HOST"],
+            "port": int(get_env(PORT_ENV, "443")),
+            "username": "default",
+            "password": os.environ["TINYBIRD_TOKEN"],
+            "secure": get_env(SECURE_ENV, "true").lower() not in ("0", "false", "no"),
+            "connect_timeout": 10,
+            "send_receive_timeout": 30,
+            # Compressed responses: lz4/zstd cost little CPU and shrink result transfer
+            "compress": _compression(get_env(COMPRESSION_ENV, CLICKHOUSE_COMPRESSION)),
+            # One client is shared by all request threads, and ClickHouse
+            # rejects concurrent queries within a single session
+            "autogenerate_session_id": False,
+        }
+
+        self.result_cache = result_cache
+        self.single_flight = single_flight or SingleFlight("ClickHouse")
+        self.budget = budget or QueryBudget.from_env()
+
+        # Per-process keep-alive connection pools, one per client, sized alike
+        self.pool_size = int(get_env(POOL_SIZE_ENV, str(CLICKHOUSE_POOL_SIZE)))
+        self.keepalive_seconds = int(get_env(KEEPALIVE_IDLE_ENV, str(CLICKHOUSE_KEEPALIVE_IDLE_SECONDS)))
+        self.pool_manager = httputil.get_pool_manager(
+            maxsize=self.pool_size,
+            num_pools=1,
+            keep_idle=self.keepalive_seconds,
         )
+        self.client = clickhouse_connect.get_client(pool_mgr=self.pool_manager, **self.connection_params)
+        self._async_client = None
+        # Created on first use: __init__ may run outside an event loop
+        self._async_client_lock: Optional[asyncio.Lock] = None
+        self._lock = threading.Lock()
+        self.async_metrics = PoolMetrics(self.pool_size)
+        self._trace_config = _pool_trace_config(self.async_metrics)
+
+    async def get_async_client(self):
+        """
+        Lazily create the async ClickHouse client (one per process).
+
+        Its aiohttp connector is sized like the sync pool and metered into
+        async_metrics.
+
+        Returns:
+            clickhouse_connect AsyncClient
+        """
+        if self._async_client is None:
+            if self._async_client_lock is None:
+                with self._lock:
+                    if self._async_client_lock is None:
+                        self._async_client_lock = asyncio.Lock()
+            async with self._async_client_lock:
+                if self._async_client is None:
+                    self._async_client = await clickhouse_connect.get_async_client(
+                        connector_limit=self.pool_size,
+                        connector_limit_per_host=self.pool_size,
+                        # Idle connections are kept this long before closing
+                        keepalive_timeout=self.keepalive_seconds,
+                        **self.connection_params,
+                    )
+        self._meter_session(self._async_client)
+        return self._async_client
+
+    def _meter_session(self, client) -> None:
+        """Attach the pool trace config to the client's aiohttp session (recreated after a pool reset)."""
+        session = getattr(client, "_session", None)
+        if session is not None and self._trace_config not in session.trace_configs:
+            session.trace_configs.append(self._trace_config)
 
     def query(self, sql: str) -> dict:
         """
@@ -40,9 +142,286 @@ class DatabaseClient:
         Raises:
             Exception: If query execution fails
         """
-        result = self.client.query(sql)
+        cached = self._cached(sql)
+        if cached is not None:
+            return cached
+
+        # Concurrent identical queries share one round trip
+        return self.single_flight.do(
+            _flight_key("rows", sql),
+            lambda: self._store(sql, self.client.query(sql, settings=self._settings(sql))),
+        )
+
+    async def aquery(self, sql: str) -> dict:
+        """
+        Async variant of query() using the async ClickHouse client.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            Dictionary with 'columns' and 'rows' keys
+
+        Raises:
+            Exception: If query execution fails
+        """
+        cached = self._cached(sql)
+        if cached is not None:
+            return cached
+
+        async def run() -> dict:
+            client = await self.get_async_client()
+            return self._store(sql, await client.query(sql, settings=self._settings(sql)))
+
+        return await self.single_flight.ado(_flight_key("rows", sql), run)
+
+    def query_columns(self, sql: str) -> ColumnarResult:
+        """
+        Execute a SQL query and return one typed NumPy array per column.
+
+        Reads NumPy blocks from ClickHouse, so no per-row Python objects are
+        created for numeric and date columns. Results are not written to the
+        result cache (which stores row-oriented data), but cached results are
+        served.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            ColumnarResult
+
+        Raises:
+            Exception: If query execution fails
+        """
+        cached = self._cached(sql)
+        if cached is not None:
+            return columns_from_rows(cached)
+
+        def run() -> ColumnarResult:
+            with self.client.query_np_stream(sql, settings=self._settings(sql)) as stream:
+                names = list(stream.source.column_names)
+                return columns_from_numpy_blocks(names, list(stream))
+
+        return self.single_flight.do(_flight_key("columns", sql), run)
+
+    async def aquery_columns(self, sql: str) -> ColumnarResult:
+        """
+        Async variant of query_columns().
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            ColumnarResult
+
+        Raises:
+            Exception: If query execution fails
+        """
+        cached = self._cached(sql)
+        if cached is not None:
+            return columns_from_rows(cached)
+
+        async def run() -> ColumnarResult:
+            client = await self.get_async_client()
+            async with await client.query_np_stream(sql, settings=self._settings(sql)) as stream:
+                names = list(stream.source.column_names)
+                blocks = [block async for block in stream]
+            return columns_from_numpy_blocks(names, blocks)
+
+        return await self.single_flight.ado(_flight_key("columns", sql), run)
+
+    def stream_query(self, sql: str) -> Iterator[tuple[list[str], list]]:
+        """
+        Execute a SQL query and yield results block by block.
+
+        Uses ClickHouse block streaming, so only one block of rows is held in
+        memory at a time. Streamed results bypass the result cache on write
+        (caching would mean materializing them), but cached results are
+        replayed in blocks.
+
+        Args:
+            sql: SQL query string
+
+        Yields:
+            (columns, rows) per block; at least one block is yielded, so an
+            empty result still carries its column names
+
+        Raises:
+            Exception: If query execution fails
+        """
+        cached = self._cached(sql)
+        if cached is not None:
+            yield from _chunks(cached)
+            return
+
+        with self.client.query_row_block_stream(sql, settings=self._settings(sql)) as stream:
+            columns = list(stream.source.column_names)
+            empty = True
+            for block in stream:
+                empty = False
+                yield columns, block
+            if empty:
+                yield columns, []
+
+    async def astream_query(self, sql: str) -> AsyncIterator[tuple[list[str], list]]:
+        """
+        Async variant of stream_query() using the async ClickHouse client.
+
+        Args:
+            sql: SQL query string
+
+        Yields:
+            (columns, rows) per block; at least one block is yielded
+
+        Raises:
+            Exception: If query execution fails
+        """
+        cached = self._cached(sql)
+        if cached is not None:
+            for chunk in _chunks(cached):
+                yield chunk
+            return
+
+        client = await self.get_async_client()
+        async with await client.query_row_block_stream(sql, settings=self._settings(sql)) as stream:
+            columns = list(stream.source.column_names)
+            empty = True
+            async for block in stream:
+                empty = False
+                yield columns, block
+            if empty:
+                yield columns, []
+
+    def insert_columns(self, columns: dict) -> None:
+        """
+        Insert rows into the table (used by ingestion; queries are read-only).
+
+        Args:
+            columns: 'date' as int64 epoch seconds plus float64 numeric columns
+        """
+        data = [columns["date"].astype("datetime64[s]").astype(object).tolist()]
+        data += [columns[column].tolist() for column in NUMERIC_COLUMNS]
+        self.client.insert(TABLE, data, column_names=["date", *NUMERIC_COLUMNS], column_oriented=True)
+        logger.info(f"Inserted {len(data[0])} rows into {TABLE}")
+
+    def connection_stats(self) -> dict:
+        """
+        Connection pool counters for the ClickHouse clients.
+
+        The sync pool is urllib3's: it counts connections opened and requests
+        made per host pool, and requests beyond the connections opened reused
+        a kept-alive connection. The async pool (aiohttp, which serves the
+        request path) is metered with PoolMetrics.
+
+        Returns:
+            Dictionary with "sync" and "async" pool stats (async is None until
+            the async client is created)
+        """
+        requests = opened = in_use = 0
+        for key in list(self.pool_manager.pools.keys()):
+            try:
+                pool = self.pool_manager.pools[key]
+            except KeyError:
+                continue
+            requests += pool.num_requests
+            opened += pool.num_connections
+            # The queue holds idle connections and free slots; the rest are checked out
+            if pool.pool is not None:
+                in_use += max(0, self.pool_size - pool.pool.qsize())
+
+        reused = max(0, requests - opened)
         return {
+            "sync": {
+                "pool_size": self.pool_size,
+                "requests": requests,
+                "connections_opened": opened,
+                "reused": reused,
+                "reuse_ratio": reused / requests if requests else 0.0,
+                "in_use": in_use,
+                "saturation": in_use / self.pool_size if self.pool_size else 0.0,
+            },
+            "async": self.async_metrics.stats() if self._async_client is not None else None,
+        }
+
+    def _settings(self, sql: str) -> dict:
+        """
+        ClickHouse resource-limit settings for a query (see db/query_cost.py).
+        SQL outside the grammar gets the budget's own limits.
+        """
+        try:
+            estimate = estimate_cost(parse_sql(sql), self.budget.rows_per_day)
+        except ValueError:
+            estimate = CostEstimate(self.budget.max_rows_to_read, self.budget.max_result_rows, 0)
+        return clickhouse_settings(estimate, self.budget)
+
+    def _cached(self, sql: str) -> Optional[dict]:
+        """Look up a query in the result cache."""
+        if self.result_cache is None:
+            return None
+        cached = self.result_cache.get(sql)
+        record_cache("result", cached is not None)
+        if cached is not None:
+            logger.info("Serving query result from cache")
+        return cached
+
+    def _store(self, sql: str, result) -> dict:
+        """Convert a clickhouse_connect result and store it in the result cache."""
+        data = {
             "columns": result.column_names,
             "rows": result.result_rows,
         }
 
+        if self.result_cache is not None:
+            self.result_cache.set(sql, data)
+
+        return data
+
+
+def _compression(setting: str):
+    """Map the CLICKHOUSE_COMPRESSION setting to clickhouse_connect's compress argument."""
+    setting = setting.strip().lower()
+    return False if setting in ("", "none", "false", "0") else setting
+
+
+def _flight_key(kind: str, sql: str) -> tuple:
+    """
+    Coalescing key for a query: its canonical form plus its column aliases,
+    since waiters receive the leader's result (column names included) as is.
+    """
+    try:
+        canonical = canonicalize_sql(sql)
+    except ValueError:
+        return kind, sql
+    return kind, canonical.key, canonical.aliases
+
+
+def _chunks(data: dict, block_rows: int = STREAM_BLOCK_ROWS) -> Iterator[tuple[list[str], list]]:
+    """Split a materialized result into (columns, rows) blocks."""
+    columns = list(data["columns"])
+    rows = data["rows"]
+    yield columns, rows[:block_rows]
+    for offset in range(block_rows, len(rows), block_rows):
+        yield columns, rows[offset:offset + block_rows]
+
+
+def _pool_trace_config(metrics: PoolMetrics) -> aiohttp.TraceConfig:
+    """
+    aiohttp trace hooks recording PoolMetrics, like the OpenAI transports.
+    A request is in flight until its response headers arrive.
+    """
+    async def started(session, context, params) -> None:
+        metrics.started()
+
+    async def finished(session, context, params) -> None:
+        metrics.finished()
+
+    async def connected(session, context, params) -> None:
+        metrics.connected()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(started)
+    trace_config.on_request_end.append(finished)
+    trace_config.on_request_exception.append(finished)
+    trace_config.on_connection_create_end.append(connected)
+    trace_config.freeze()
+    return trace_config
@@ -0,0 +1,83 @@
+"""
+Column-oriented query results.
+
+The row-tuple shape ({"columns", "rows"}) is what the JSON API has always
+returned. The binary and columnar response formats instead take one typed
+NumPy array per column, straight from clickhouse_connect's NumPy blocks or
+the local engine's result arrays.
+"""
+from datetime import datetime
+from typing import Iterable, NamedTuple
+
+import numpy as np
+
+
+class ColumnarResult(NamedTuple):
+    """Query result as one array per column."""
+    columns: list[str]
+    arrays: list[np.ndarray]
+
+    @property
+    def row_count(self) -> int:
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def first_row(self) -> list:
+        """First row as Python values (NaN as None), or an empty list."""
+        if not self.row_count:
+            return []
+        row = []
+        for values in self.arrays:
+            value = values[:1].tolist()[0]
+            row.append(None if isinstance(value, float) and value != value else value)
+        return row
+
+
+def columns_from_rows(data: dict) -> ColumnarResult:
+    """
+    Convert a row-oriented result (e.g. from the result cache) to arrays.
+
+    Args:
+        data: Dictionary with 'columns' and 'rows' keys
+
+    Returns:
+        ColumnarResult
+    """
+    names = list(data.get("columns", []))
+    rows = data.get("rows", [])
+    arrays = []
+    for values in (zip(*rows) if rows else [() for _ in names]):
+        first = next((v for v in values if v is not None), None)
+        if isinstance(first, datetime) and None not in values:
+            arrays.append(np.array(values, dtype="datetime64[us]"))
+        elif isinstance(first, float):
+            arrays.append(np.array(values, dtype=np.float64))
+        elif isinstance(first, int) and not isinstance(first, bool) and None not in values:
+            arrays.append(np.array(values, dtype=np.int64))
+        else:
+            arrays.append(np.array(values, dtype=object))
+    return ColumnarResult(names, arrays)
+
+
+def columns_from_numpy_blocks(names: list[str], blocks: Iterable[np.ndarray]) -> ColumnarResult:
+    """
+    Assemble clickhouse_connect NumPy blocks into one array per column.
+
+    query_np_stream yields 2-D arrays when every column has the same dtype
+    and structured arrays otherwise.
+
+    Args:
+        names: Column names
+        blocks: Blocks from query_np_stream
+
+    Returns:
+        ColumnarResult
+    """
+    parts: list[list[np.ndarray]] = [[] for _ in names]
+    for block in blocks:
+        for i, name in enumerate(names):
+            parts[i].append(block[name] if block.dtype.names else block[:, i])
+    arrays = [
+        np.concatenate(chunks) if chunks else np.array([], dtype=object)
+        for chunks in parts
+    ]
+    return ColumnarResult(names, arrays)
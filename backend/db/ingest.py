@@ -0,0 +1,290 @@
+"""
+The CSV export as an append-only store.
+
+data/coin_Bitcoin.csv is the local store's on-disk form and doubles as the
+log of ingested rows. Ingestion appends rows dated after the last stored
+row under an exclusive file lock, so the CLI and every worker can append
+concurrently. Each process reads only the bytes past its own offset, so a
+process that holds the data in memory (the local backend's columns, the
+range aggregate index) catches up with rows another process appended
+without reloading the file. A process starting up maps the columnar
+snapshot of the file (db/snapshot.py) and parses only the rows after it.
+"""
+import csv
+import fcntl
+import io
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from core.exceptions import IngestError
+from db.local_client import parse_columns
+from db.query_plan import LocalQueryError
+from db.snapshot import Snapshot, open_snapshot, snapshot_path
+from security.schema import COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Non-schema column numbering the rows of the Kaggle export
+SERIAL_COLUMN = "sno"
+# Bytes read back from the end of the snapshot's range to find the last row
+COVERED_TAIL_BYTES = 64 * 1024
+
+
+def parse_csv(text: str) -> dict[str, np.ndarray]:
+    """
+    Parse CSV text with a header row into typed columns sorted by date.
+
+    Args:
+        text: CSV with at least the schema columns (any case, any order)
+
+    Returns:
+        Column arrays in the load_columns() layout
+
+    Raises:
+        IngestError: If the header lacks a schema column or a value doesn't parse
+    """
+    reader = csv.reader(io.StringIO(text))
+    try:
+        return parse_columns(next(reader, []), reader)
+    except (LocalQueryError, ValueError, IndexError) as e:
+        raise IngestError(f"Invalid CSV: {e}") from e
+
+
+def row_count(columns: dict[str, np.ndarray]) -> int:
+    return len(columns["date"])
+
+
+def concat_columns(
+    first: Optional[dict[str, np.ndarray]], second: Optional[dict[str, np.ndarray]]
+) -> Optional[dict[str, np.ndarray]]:
+    """Rows of first followed by rows of second (either may be None)."""
+    if first is None or second is None:
+        return first if second is None else second
+    return {name: np.concatenate((values, second[name])) for name, values in first.items()}
+
+
+def rows_after(columns: dict[str, np.ndarray], last_date: Optional[int]) -> dict[str, np.ndarray]:
+    """
+    Rows dated after last_date, keeping the first of rows with equal dates.
+
+    Args:
+        columns: Column arrays sorted by date
+        last_date: Epoch seconds of the last stored row, or None if the store is empty
+
+    Returns:
+        Column arrays of the remaining rows
+    """
+    dates = columns["date"]
+    keep = np.ones(len(dates), dtype=bool)
+    keep[1:] = dates[1:] != dates[:-1]
+    if last_date is not None:
+        keep &= dates > last_date
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def format_date(epoch_seconds: int) -> str:
+    """Format epoch seconds like the CSV export (YYYY-MM-DD HH:MM:SS)."""
+    return str(np.datetime64(int(epoch_seconds), "s")).replace("T", " ")
+
+
+class CSVStore:
+    """
+    Append-only CSV store shared by every process on the host.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the store. Nothing is read until read_new() or append().
+
+        Args:
+            path: Path of the CSV export
+        """
+        self.path = Path(path)
+        self.offset = 0  # bytes of the file this process has read
+        self.header: Optional[list[str]] = None
+        self.first_date: Optional[int] = None  # epoch seconds
+        self.last_date: Optional[int] = None
+        self.last_row: Optional[list[str]] = None
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def has_new_rows(self) -> bool:
+        """Whether the file grew past what this process has read (one stat call)."""
+        try:
+            return os.path.getsize(self.path) > self.offset
+        except OSError:
+            return False
+
+    def read_new(self) -> Optional[dict[str, np.ndarray]]:
+        """
+        Rows appended since this process last read the file (every row on
+        the first call).
+
+        Returns:
+            Column arrays in the load_columns() layout, or None if there are no new rows
+
+        Raises:
+            IngestError: If the file shrank (it was replaced; reload it instead)
+        """
+        with self._lock:
+            return self._read_new()
+
+    def load(self, snapshot: Optional[Union[str, Path]] = None) -> Optional[dict[str, np.ndarray]]:
+        """
+        Every row of the file, on first read. When the columnar snapshot is
+        current its arrays are mapped instead of parsed, and only rows
+        appended after it are read from the file.
+
+        Args:
+            snapshot: Snapshot path (defaults to the file's .snapshot sibling)
+
+        Returns:
+            Column arrays in the load_columns() layout, or None if there are no rows
+
+        Raises:
+            IngestError: If the file shrank (it was replaced; reload it instead)
+        """
+        with self._lock:
+            if self.offset:
+                return self._read_new()
+            mapped = open_snapshot(snapshot or snapshot_path(self.path), self.path)
+            if mapped is None:
+                return self._read_new()
+            self._resume(mapped)
+            appended = self._read_new()
+            if appended is not None:
+                # Concatenating copies the mapped arrays; a fresh snapshot keeps them shared
+                logger.info(f"{row_count(appended)} rows are newer than the snapshot of {self.path}")
+            return concat_columns(mapped.columns, appended)
+
+    def _resume(self, snapshot: Snapshot) -> None:
+        """Continue reading the file where the snapshot ends."""
+        with open(self.path, "rb") as f:
+            header_line = f.readline()
+            start = max(0, snapshot.source_bytes - COVERED_TAIL_BYTES)
+            f.seek(start)
+            tail = f.read(snapshot.source_bytes - start)
+        last_line = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        self.header = next(csv.reader([header_line.decode("utf-8")]))
+        self.offset = snapshot.source_bytes
+        self._advance(snapshot.columns, next(csv.reader([last_line.decode("utf-8")])))
+
+    def _read_new(self) -> Optional[dict[str, np.ndarray]]:
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            raise IngestError(f"{self.path} shrank since it was loaded; restart to reload it")
+        if size == self.offset:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        # Only whole lines: another process may be in the middle of an append
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        self.offset += end
+        rows = list(csv.reader(io.StringIO(data[:end].decode("utf-8"))))
+        if self.header is None:
+            self.header, rows = rows[0], rows[1:]
+        rows = [row for row in rows if row]
+        if not rows:
+            return None
+
+        columns = parse_columns(self.header, rows)
+        self._advance(columns, rows[-1])
+        return columns
+
+    def _advance(self, columns: dict[str, np.ndarray], last_row: list[str]) -> None:
+        """Record rows that are now in the file."""
+        dates = columns["date"]
+        if self.first_date is None:
+            self.first_date = int(dates[0])
+        self.last_date = int(dates[-1]) if self.last_date is None else max(self.last_date, int(dates[-1]))
+        self.last_row = last_row
+        self.rows += len(dates)
+
+    def _encode(self, columns: dict[str, np.ndarray]) -> tuple[bytes, list[str]]:
+        """
+        CSV lines for new rows in the file's column order. Schema columns
+        come from the rows; other columns (Name, Symbol) repeat the last
+        stored row, and SNo keeps counting.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if self.header is None:
+            # Empty file: start it with the schema columns
+            self.header = list(COLUMNS)
+            writer.writerow(self.header)
+        header = self.header
+        previous = self.last_row or [""] * len(header)
+        row = previous
+        for i in range(row_count(columns)):
+            row = []
+            for position, name in enumerate(header):
+                key = name.lower()
+                if key == "date":
+                    row.append(format_date(columns["date"][i]))
+                elif key in columns:
+                    row.append(repr(float(columns[key][i])))
+                elif key == SERIAL_COLUMN and previous[position].isdigit():
+                    row.append(str(int(previous[position]) + i + 1))
+                else:
+                    row.append(previous[position])
+            writer.writerow(row)
+        return buffer.getvalue().encode("utf-8"), row
+
+    def append(
+        self,
+        columns: dict[str, np.ndarray],
+        before_write: Optional[Callable[[dict[str, np.ndarray]], None]] = None,
+    ) -> tuple[Optional[dict[str, np.ndarray]], dict[str, np.ndarray]]:
+        """
+        Append the rows dated after the last stored row.
+
+        Runs under an exclusive lock on the file. Rows other processes
+        appended since this process last read are read first, so they are
+        not appended twice and the caller can apply them too.
+
+        Args:
+            columns: Column arrays sorted by date
+            before_write: Called with the rows to append before they are
+                written (e.g. to insert them into ClickHouse); if it raises,
+                nothing is written
+
+        Returns:
+            (rows other processes appended or None, rows appended by this call)
+
+        Raises:
+            IngestError: If the file shrank since it was loaded
+        """
+        with self._lock, open(self.path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                pending = self._read_new()
+                if os.path.getsize(self.path) > self.offset:
+                    # The last line has no newline yet; end it so it is read
+                    f.write(b"\n")
+                    f.flush()
+                    pending = concat_columns(pending, self._read_new())
+                fresh = rows_after(columns, self.last_date)
+                if not row_count(fresh):
+                    return pending, fresh
+                if before_write is not None:
+                    before_write(fresh)
+
+                data, last_row = self._encode(fresh)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self.offset += len(data)
+                self._advance(fresh, last_row)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        logger.info(f"Appended {row_count(fresh)} rows to {self.path}")
+        return pending, fresh
@@ -0,0 +1,354 @@
+"""
+In-process columnar query engine over data/coin_Bitcoin.csv.
+
+Every query accepted by the CFG grammar is a single-table scan with a date
+filter, optional aggregation, toStartOfDay/toStartOfHour grouping, ORDER BY
+and LIMIT. That is small enough to run locally with NumPy instead of paying a
+network round trip to Tinybird: the date column is sorted, so filters are a
+binary search, aggregates are vectorized reductions over the selected slice,
+and ORDER BY ... LIMIT uses argpartition.
+"""
+import csv
+import logging
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from core.config import get_env
+from core.constants import STREAM_BLOCK_ROWS
+from db.columnar import ColumnarResult
+from db.query_plan import LocalQueryError, PlanCompiler, QueryPlan, resolve_bounds
+from security.schema import COLUMNS, NUMERIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+DATA_PATH_ENV = "LOCAL_DATA_PATH"
+
+DEFAULT_DATA_PATH = Path(__file__).parent.parent.parent / "data" / "coin_Bitcoin.csv"
+
+
+def default_data_path() -> str:
+    """CSV path of the local store (LOCAL_DATA_PATH env var or data/coin_Bitcoin.csv)."""
+    return get_env(DATA_PATH_ENV, str(DEFAULT_DATA_PATH))
+
+
+def parse_columns(header: list[str], rows: Iterable[list[str]]) -> dict[str, np.ndarray]:
+    """
+    Convert CSV rows into typed column arrays sorted by date.
+
+    Args:
+        header: CSV field names (matched to schema columns case-insensitively)
+        rows: CSV rows as lists of strings
+
+    Returns:
+        Mapping of schema column name to array; 'date' is int64 epoch seconds,
+        numeric columns are float64 (blank values are NaN)
+
+    Raises:
+        LocalQueryError: If the header lacks a schema column
+    """
+    fields = {name.lower(): i for i, name in enumerate(header)}
+    missing = [column for column in COLUMNS if column not in fields]
+    if missing:
+        raise LocalQueryError(f"CSV is missing columns: {', '.join(missing)}")
+    raw = {column: [] for column in COLUMNS}
+    for row in rows:
+        for column in COLUMNS:
+            raw[column].append(row[fields[column]] or "nan")
+
+    dates = np.array(raw["date"], dtype="datetime64[s]").astype(np.int64)
+    order = np.argsort(dates, kind="stable")
+    columns = {"date": dates[order]}
+    for column in NUMERIC_COLUMNS:
+        columns[column] = np.array(raw[column], dtype=np.float64)[order]
+    return columns
+
+
+def load_columns(path: Union[str, Path]) -> dict[str, np.ndarray]:
+    """
+    Load the coin_Bitcoin CSV into typed column arrays sorted by date.
+
+    Args:
+        path: Path to the CSV export
+
+    Returns:
+        Mapping of schema column name to array (see parse_columns)
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        return parse_columns(next(reader, []), reader)
+
+
+def _reduce(func: str, values: Optional[np.ndarray], starts: np.ndarray, length: int) -> np.ndarray:
+    """Vectorized per-group reduction over contiguous groups beginning at `starts`."""
+    if func == "count":
+        if values is None or values.dtype.kind != "f":
+            return np.diff(np.append(starts, length))
+        return np.add.reduceat((~np.isnan(values)).astype(np.int64), starts)
+    if func == "sum":
+        return np.add.reduceat(values, starts)
+    if func == "min":
+        return np.minimum.reduceat(values, starts)
+    if func == "max":
+        return np.maximum.reduceat(values, starts)
+    counts = np.diff(np.append(starts, length))
+    return np.add.reduceat(values, starts) / counts
+
+
+def _empty_aggregate(func: str) -> np.ndarray:
+    """ClickHouse results for aggregates over zero rows."""
+    if func == "count":
+        return np.array([0], dtype=np.int64)
+    if func == "avg":
+        return np.array([np.nan])
+    return np.array([0.0])
+
+
+def _to_python(values: np.ndarray, is_date: bool) -> list:
+    """Convert a result array to Python values (datetimes for the date column)."""
+    if is_date:
+        return values.astype("datetime64[s]").astype(object).tolist()
+    return values.tolist()
+
+
+class LocalColumnarClient:
+    """
+    Drop-in alternative to DatabaseClient that answers queries from in-memory
+    NumPy column arrays.
+    """
+
+    def __init__(self, data_path: Optional[str] = None, columns: Optional[dict[str, np.ndarray]] = None):
+        """
+        Initialize the client.
+
+        Args:
+            data_path: CSV to load (defaults to LOCAL_DATA_PATH env var or data/coin_Bitcoin.csv)
+            columns: Pre-loaded column arrays (skips loading the CSV and its snapshot)
+        """
+        if columns is None:
+            from db.ingest import CSVStore  # db.ingest builds on this module
+
+            path = data_path or default_data_path()
+            started = time.perf_counter()
+            # Maps the columnar snapshot when it is current (db/snapshot.py)
+            columns = CSVStore(path).load() or load_columns(path)
+            logger.info(
+                f"Loaded {len(columns['date'])} rows from {path} "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+        self.columns = columns
+        self.compiler = PlanCompiler()
+
+    def append(self, columns: dict[str, np.ndarray]) -> None:
+        """
+        Append rows dated after the last loaded row.
+
+        The column arrays are swapped in as one dict, so queries running
+        concurrently see either the old or the new data.
+
+        Args:
+            columns: Column arrays in the load_columns() layout, sorted by date
+        """
+        self.columns = {
+            name: np.concatenate((values, columns[name])) for name, values in self.columns.items()
+        }
+
+    def _column(self, name: str, start: int, stop: int) -> np.ndarray:
+        if name not in self.columns:
+            raise LocalQueryError(f"Missing columns: '{name}'")
+        return self.columns[name][start:stop]
+
+    def execute(self, plan: QueryPlan) -> dict:
+        """
+        Run a compiled plan.
+
+        Args:
+            plan: Plan returned by PlanCompiler.compile
+
+        Returns:
+            Dictionary with 'columns' and 'rows' keys
+        """
+        arrays = self._execute_arrays(plan)
+        python_columns = [
+            _to_python(values, is_date=output.func is None and output.column == "date")
+            for output, values in zip(plan.outputs, arrays)
+        ]
+        return {"columns": [o.name for o in plan.outputs], "rows": list(zip(*python_columns))}
+
+    def _execute_arrays(self, plan: QueryPlan) -> list[np.ndarray]:
+        """Run a compiled plan, returning one result array per output column."""
+        start, stop = resolve_bounds(plan, self.columns["date"])
+        aggregates = [o for o in plan.outputs if o.func is not None]
+        plain = [o for o in plan.outputs if o.func is None]
+
+        if aggregates and plain or (plan.bucket_seconds and plain):
+            raise LocalQueryError(
+                f"Column `{plain[0].column}` is not under aggregate function and not in GROUP BY"
+            )
+
+        if plan.bucket_seconds:
+            buckets = self.columns["date"][start:stop] // plan.bucket_seconds * plan.bucket_seconds
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+            arrays = []
+            for output in plan.outputs:
+                if start == stop:
+                    arrays.append(np.array([], dtype=np.float64))
+                    continue
+                values = self._column(output.column, start, stop) if output.column else None
+                arrays.append(_reduce(output.func, values, starts, stop - start))
+        elif aggregates:
+            arrays = []
+            for output in plan.outputs:
+                if start == stop:
+                    arrays.append(_empty_aggregate(output.func))
+                    continue
+                values = self._column(output.column, start, stop) if output.column else None
+                arrays.append(_reduce(output.func, values, np.array([0]), stop - start))
+        else:
+            arrays = [self._column(o.column, start, stop) for o in plan.outputs]
+
+        return self._order_and_limit(plan, arrays, start, stop)
+
+    def _order_and_limit(
+        self, plan: QueryPlan, arrays: list[np.ndarray], start: int, stop: int
+    ) -> list[np.ndarray]:
+        """Apply ORDER BY and LIMIT, using argpartition when only the top rows are needed."""
+        length = len(arrays[0]) if arrays else 0
+        limit = plan.limit if plan.limit is not None else length
+
+        if plan.order and length > 1:
+            positions = {}
+            for i, output in enumerate(plan.outputs):
+                positions.setdefault(output.name, i)
+
+            keys = []
+            for target, descending in plan.order:
+                if target in positions:
+                    key = arrays[positions[target]]
+                elif not plan.bucket_seconds and not any(o.func for o in plan.outputs):
+                    key = self._column(target, start, stop)
+                else:
+                    raise LocalQueryError(f"Unknown ORDER BY target: '{target}'")
+                keys.append(-key if descending else key)
+
+            if len(keys) == 1 and limit < length:
+                # Only the first `limit` rows are needed: partition, then sort that slice
+                top = np.argpartition(keys[0], limit - 1)[:limit] if limit > 0 else np.array([], dtype=np.int64)
+                index = top[np.argsort(keys[0][top], kind="stable")]
+            elif len(keys) == 1:
+                index = np.argsort(keys[0], kind="stable")
+            else:
+                index = np.lexsort(keys[::-1])
+            index = index[:limit]
+            return [values[index] for values in arrays]
+
+        return [values[:limit] for values in arrays]
+
+    def query(self, sql: str) -> dict:
+        """
+        Execute a SQL query and return results.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            Dictionary with 'columns' and 'rows' keys
+
+        Raises:
+            ValueError: If SQL doesn't match the grammar
+            LocalQueryError: If the query can't be executed
+        """
+        return self.execute(self.compiler.compile(sql))
+
+    async def aquery(self, sql: str) -> dict:
+        """
+        Async counterpart of query(). Local execution takes microseconds, so it
+        runs inline on the event loop.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            Dictionary with 'columns' and 'rows' keys
+        """
+        return self.query(sql)
+
+    def query_columns(self, sql: str) -> ColumnarResult:
+        """
+        Execute a SQL query and return the result arrays without building rows.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            ColumnarResult; the date column is datetime64[s]
+
+        Raises:
+            ValueError: If SQL doesn't match the grammar
+            LocalQueryError: If the query can't be executed
+        """
+        plan = self.compiler.compile(sql)
+        arrays = [
+            values.view("datetime64[s]") if output.func is None and output.column == "date" else values
+            for output, values in zip(plan.outputs, self._execute_arrays(plan))
+        ]
+        return ColumnarResult([o.name for o in plan.outputs], arrays)
+
+    async def aquery_columns(self, sql: str) -> ColumnarResult:
+        """
+        Async counterpart of query_columns().
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            ColumnarResult
+        """
+        return self.query_columns(sql)
+
+    def stream_query(self, sql: str, block_rows: int = STREAM_BLOCK_ROWS) -> Iterator[tuple[list[str], list]]:
+        """
+        Execute a SQL query and yield results block by block.
+
+        The result arrays are computed once; only the Python row tuples are
+        built per block, which is where the memory goes for large results.
+
+        Args:
+            sql: SQL query string
+            block_rows: Rows per yielded block
+
+        Yields:
+            (columns, rows) per block; at least one block is yielded
+
+        Raises:
+            ValueError: If SQL doesn't match the grammar
+            LocalQueryError: If the query can't be executed
+        """
+        plan = self.compiler.compile(sql)
+        arrays = self._execute_arrays(plan)
+        columns = [o.name for o in plan.outputs]
+        is_date = [o.func is None and o.column == "date" for o in plan.outputs]
+        length = len(arrays[0]) if arrays else 0
+
+        for offset in range(0, max(length, 1), block_rows):
+            python_columns = [
+                _to_python(values[offset:offset + block_rows], date)
+                for values, date in zip(arrays, is_date)
+            ]
+            yield columns, list(zip(*python_columns))
+
+    async def astream_query(self, sql: str) -> AsyncIterator[tuple[list[str], list]]:
+        """
+        Async counterpart of stream_query().
+
+        Args:
+            sql: SQL query string
+
+        Yields:
+            (columns, rows) per block; at least one block is yielded
+        """
+        for block in self.stream_query(sql):
+            yield block
@@ -0,0 +1,215 @@
+"""
+Keyset pagination for large row listings.
+
+A row listing (no aggregates, no GROUP BY) with absolute date bounds whose
+estimated result is larger than a page runs one page at a time: ordered by
+date and limited to a page, with each following page selected by narrowing
+the date range past the last row returned instead of by OFFSET, so a page
+only reads the rows it returns. Each row of coin_Bitcoin has its own
+timestamp, so the date alone identifies the position in the result.
+
+A cursor records the original query, the last date returned and how many
+rows were returned so far. It is opaque to clients but not trusted: its
+SQL goes through the grammar and date validation again before a page runs.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from core.config import get_env
+from core.constants import DATA_ROWS_PER_DAY, QUERY_PAGE_ROWS
+from core.exceptions import InvalidCursorError
+from db.query_cost import estimate_cost
+from security.sql_ast import DateFilter, OrderItem, SelectItem, SelectQuery
+from security.sql_guard import parse_sql
+
+# Environment variable names
+PAGE_ROWS_ENV = "QUERY_PAGE_ROWS"
+
+CURSOR_VERSION = 1
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# DateTime has second resolution, so the next page starts one second later
+KEYSET_STEP = timedelta(seconds=1)
+
+
+def page_rows_from_env() -> int:
+    """Rows per page from the QUERY_PAGE_ROWS env var (0 disables pagination)."""
+    return int(get_env(PAGE_ROWS_ENV, str(QUERY_PAGE_ROWS)))
+
+
+@dataclass(frozen=True)
+class Page:
+    """One page of a paginated query."""
+    query: SelectQuery  # what to run for this page
+    original: SelectQuery  # the query being paged through
+    returned: int  # rows returned by earlier pages
+    date_index: int  # position of the date column in the page's result
+    added_date: bool  # date was appended to the select list for the cursor
+
+    def next_cursor(self, data: dict) -> Optional[str]:
+        """
+        Cursor for the page after this one.
+
+        Args:
+            data: Unsanitized result of this page's query
+
+        Returns:
+            Cursor, or None when this is the last page
+        """
+        rows = data.get("rows", [])
+        returned = self.returned + len(rows)
+        if not rows or len(rows) < self.query.limit:
+            return None
+        if self.original.limit is not None and returned >= self.original.limit:
+            return None
+        return encode_cursor(self.original, _date_literal(rows[-1][self.date_index]), returned)
+
+    def strip(self, data: dict) -> dict:
+        """Drop the date column added for the cursor, if any."""
+        if not self.added_date:
+            return data
+        return {
+            "columns": list(data["columns"])[:-1],
+            "rows": [tuple(row)[:-1] for row in data["rows"]],
+        }
+
+
+def _pageable(query: SelectQuery) -> bool:
+    """Whether the query is a date-bounded row listing ordered by date, if at all."""
+    if query.group_by is not None or any(item.is_aggregate for item in query.items):
+        return False
+    start, end = query.date_bounds()
+    if start is None or end is None:
+        return False
+    if not query.order_by:
+        return True
+    if len(query.order_by) != 1:
+        return False
+    target = query.order_by[0].target
+    date_aliases = {item.alias for item in query.items if item.column == "date" and item.alias}
+    return target == "date" or target in date_aliases
+
+
+def _page(original: SelectQuery, after: Optional[str], returned: int, page_rows: int) -> Page:
+    """Build the page of original that starts after the given date."""
+    date_index = next(
+        (i for i, item in enumerate(original.items) if item.func is None and item.column == "date"),
+        None,
+    )
+    query = original
+    added_date = date_index is None
+    if added_date:
+        query = replace(query, items=query.items + (SelectItem(None, "date"),))
+        date_index = len(query.items) - 1
+    if not query.order_by:
+        query = replace(query, order_by=(OrderItem("date"),))
+
+    if after is not None:
+        start, end = query.date_bounds()
+        last = datetime.strptime(after, DATE_FORMAT)
+        if query.order_by[0].descending:
+            keyset = DateFilter("between", start, (last - KEYSET_STEP).strftime(DATE_FORMAT))
+        else:
+            keyset = DateFilter("between", (last + KEYSET_STEP).strftime(DATE_FORMAT), end)
+        query = replace(query, filters=query.filters + (keyset,))
+
+    limit = page_rows
+    if original.limit is not None:
+        limit = min(limit, original.limit - returned)
+    return Page(replace(query, limit=limit), original, returned, date_index, added_date)
+
+
+def first_page(
+    query: SelectQuery,
+    page_rows: int,
+    rows_per_day: float = DATA_ROWS_PER_DAY,
+) -> Optional[Page]:
+    """
+    First page of a query whose result is estimated to exceed a page.
+
+    Args:
+        query: Validated query
+        page_rows: Rows per page (0 or less disables pagination)
+        rows_per_day: Rows stored per day of data
+
+    Returns:
+        Page, or None when the query is small enough or can't be paged
+        (aggregates, relative date filters, or ordered by another column)
+    """
+    if page_rows <= 0 or not _pageable(query):
+        return None
+    if estimate_cost(query, rows_per_day).result_rows <= page_rows:
+        return None
+    return _page(query, None, 0, page_rows)
+
+
+def page_from_cursor(cursor: str, page_rows: int) -> Page:
+    """
+    The page a cursor points to.
+
+    Args:
+        cursor: Value returned by Page.next_cursor()
+        page_rows: Rows per page
+
+    Returns:
+        Page to run
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or its query can't be paged
+    """
+    original, after, returned = decode_cursor(cursor)
+    if not _pageable(original):
+        raise InvalidCursorError("Invalid cursor: query can't be paged.")
+    return _page(original, after, returned, max(1, page_rows))
+
+
+def encode_cursor(original: SelectQuery, after: str, returned: int) -> str:
+    """Encode the position after a page as an opaque, URL-safe string."""
+    payload = json.dumps(
+        {"v": CURSOR_VERSION, "sql": original.render(), "after": after, "returned": returned},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[SelectQuery, str, int]:
+    """
+    Decode and validate a cursor.
+
+    Args:
+        cursor: Value returned by encode_cursor()
+
+    Returns:
+        (original query, last date returned, rows returned so far)
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or its SQL is not accepted by the grammar
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["v"] != CURSOR_VERSION:
+            raise InvalidCursorError("Cursor is from an incompatible version. Run the question again.")
+        after = payload["after"]
+        datetime.strptime(after, DATE_FORMAT)
+        returned = int(payload["returned"])
+        query = parse_sql(payload["sql"])
+    except InvalidCursorError:
+        raise
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}") from e
+    if returned < 0:
+        raise InvalidCursorError("Invalid cursor: negative row count.")
+    return query, after, returned
+
+
+def _date_literal(value) -> str:
+    """Format a date value from a result row as a SQL DateTime literal."""
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).strftime(DATE_FORMAT)
+    return datetime.fromisoformat(str(value).replace("T", " ").rstrip("Z")).strftime(DATE_FORMAT)
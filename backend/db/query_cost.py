@@ -0,0 +1,219 @@
+"""
+Cost-based admission control for queries accepted by the CFG grammar.
+
+Every such query is a scan of coin_Bitcoin over a date range, so its cost
+can be predicted before it runs: rows scanned follow from the date bounds
+and the data's row density, and result rows from the grouping, aggregates
+and LIMIT. A QueryBudget caps both. Queries that would scan too much are
+rejected; queries that would return too many rows are rejected or capped
+with a LIMIT. Every ClickHouse query is also sent with resource-limit
+settings derived from its estimate and the budget, so a misestimated query
+is stopped by the server instead of pinning it.
+"""
+import math
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from core.config import get_env
+from core.constants import (
+    DATA_ROWS_PER_DAY,
+    QUERY_MAX_EXECUTION_SECONDS,
+    QUERY_MAX_RESULT_BYTES,
+    QUERY_MAX_RESULT_ROWS,
+    QUERY_MAX_ROWS_TO_READ,
+    QUERY_OVER_BUDGET,
+)
+from core.data_bounds import data_bounds
+from core.exceptions import QueryCostError
+from security.sql_ast import OrderItem, SelectQuery
+
+# Environment variable names
+MAX_ROWS_TO_READ_ENV = "QUERY_MAX_ROWS_TO_READ"
+MAX_RESULT_ROWS_ENV = "QUERY_MAX_RESULT_ROWS"
+MAX_RESULT_BYTES_ENV = "QUERY_MAX_RESULT_BYTES"
+MAX_EXECUTION_SECONDS_ENV = "QUERY_MAX_EXECUTION_SECONDS"
+OVER_BUDGET_ENV = "QUERY_OVER_BUDGET"
+ROWS_PER_DAY_ENV = "DATA_ROWS_PER_DAY"
+
+OVER_BUDGET_LIMIT = "limit"
+OVER_BUDGET_REJECT = "reject"
+
+# Server-side limits allow this much more than estimated before stopping a query
+ESTIMATE_SLACK = 4
+# ClickHouse counts rows read per granule (8192 rows), so small queries need headroom
+MIN_ROWS_TO_READ = 100_000
+MIN_RESULT_ROWS = 1_000
+
+BYTES_PER_VALUE = 8  # Float64 columns; DateTime is smaller
+SECONDS_PER_DAY = 86400
+HOURS_PER_DAY = 24
+
+
+class CostEstimate(NamedTuple):
+    """Predicted cost of running a query."""
+    rows_scanned: int
+    result_rows: int
+    result_bytes: int
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """Resource limits applied to each query."""
+    max_rows_to_read: int = QUERY_MAX_ROWS_TO_READ
+    max_result_rows: int = QUERY_MAX_RESULT_ROWS
+    max_result_bytes: int = QUERY_MAX_RESULT_BYTES
+    max_execution_seconds: float = QUERY_MAX_EXECUTION_SECONDS
+    over_budget: str = QUERY_OVER_BUDGET  # "limit" or "reject" for oversized results
+    rows_per_day: float = DATA_ROWS_PER_DAY
+
+    @classmethod
+    def from_env(cls) -> "QueryBudget":
+        """
+        Build a budget from environment configuration.
+
+        Returns:
+            QueryBudget instance
+
+        Raises:
+            ValueError: If QUERY_OVER_BUDGET is not "limit" or "reject"
+        """
+        over_budget = get_env(OVER_BUDGET_ENV, QUERY_OVER_BUDGET).strip().lower()
+        if over_budget not in (OVER_BUDGET_LIMIT, OVER_BUDGET_REJECT):
+            raise ValueError(f"Unknown {OVER_BUDGET_ENV} '{over_budget}'. Use 'limit' or 'reject'.")
+        return cls(
+            max_rows_to_read=int(get_env(MAX_ROWS_TO_READ_ENV, str(QUERY_MAX_ROWS_TO_READ))),
+            max_result_rows=int(get_env(MAX_RESULT_ROWS_ENV, str(QUERY_MAX_RESULT_ROWS))),
+            max_result_bytes=int(get_env(MAX_RESULT_BYTES_ENV, str(QUERY_MAX_RESULT_BYTES))),
+            max_execution_seconds=float(
+                get_env(MAX_EXECUTION_SECONDS_ENV, str(QUERY_MAX_EXECUTION_SECONDS))
+            ),
+            over_budget=over_budget,
+            rows_per_day=float(get_env(ROWS_PER_DAY_ENV, str(DATA_ROWS_PER_DAY))),
+        )
+
+
+def _timestamp(literal: Optional[str], default: str) -> datetime:
+    """Parse a date literal; missing or unparseable literals fall back to default."""
+    try:
+        return datetime.fromisoformat(literal or default)
+    except ValueError:
+        return datetime.fromisoformat(default)
+
+
+def _span_days(query: SelectQuery) -> float:
+    """Days covered by the query's filters, clipped to the data range."""
+    first, last = data_bounds()
+    data_start = _timestamp(first, first)
+    data_end = _timestamp(last, last)
+    start, end = query.date_bounds()
+    lower = max(_timestamp(start, first), data_start)
+    upper = min(_timestamp(end, last), data_end)
+    days = max(0.0, (upper - lower).total_seconds() / SECONDS_PER_DAY)
+
+    for f in query.filters:
+        if f.is_relative:
+            window = f.amount / HOURS_PER_DAY if f.unit == "HOUR" else float(f.amount)
+            days = min(days, window)
+    return days
+
+
+def estimate_cost(query: SelectQuery, rows_per_day: float = DATA_ROWS_PER_DAY) -> CostEstimate:
+    """
+    Predict rows scanned and result size from the date bounds and grouping.
+
+    Args:
+        query: Parsed query
+        rows_per_day: Rows stored per day of data
+
+    Returns:
+        CostEstimate (upper bounds: every day in range is assumed present)
+    """
+    days = _span_days(query)
+    # Both ends of a date range are inclusive
+    rows_scanned = math.ceil(days * rows_per_day) + math.ceil(rows_per_day)
+
+    if query.group_by is not None:
+        buckets = math.ceil(days * (HOURS_PER_DAY if query.group_by == "hour" else 1)) + 1
+        result_rows = min(rows_scanned, buckets)
+    elif all(item.is_aggregate for item in query.items):
+        result_rows = 1
+    else:
+        result_rows = rows_scanned
+    if query.limit is not None:
+        result_rows = min(result_rows, query.limit)
+
+    return CostEstimate(rows_scanned, result_rows, result_rows * len(query.items) * BYTES_PER_VALUE)
+
+
+def admit(query: SelectQuery, budget: QueryBudget) -> tuple[SelectQuery, Optional[str]]:
+    """
+    Check a query against the budget before running it.
+
+    Queries whose result would exceed the budget get a LIMIT (row listings
+    are ordered by date first, so the rows kept are the earliest ones)
+    unless the budget says to reject them.
+
+    Args:
+        query: Parsed query
+        budget: Resource limits
+
+    Returns:
+        (query to run, warning or None); the query is unchanged when within budget
+
+    Raises:
+        QueryCostError: If the query would scan too many rows, or return too
+            many rows or bytes and the budget rejects oversized results
+    """
+    estimate = estimate_cost(query, budget.rows_per_day)
+    if estimate.rows_scanned > budget.max_rows_to_read:
+        raise QueryCostError(
+            f"Query would scan about {estimate.rows_scanned:,} rows (limit {budget.max_rows_to_read:,}). "
+            "Try a smaller date range."
+        )
+
+    bytes_per_row = max(1, len(query.items) * BYTES_PER_VALUE)
+    max_rows = min(budget.max_result_rows, budget.max_result_bytes // bytes_per_row)
+    if estimate.result_rows <= max_rows:
+        return query, None
+
+    if budget.over_budget == OVER_BUDGET_REJECT or max_rows < 1:
+        raise QueryCostError(
+            f"Query would return about {estimate.result_rows:,} rows (limit {max_rows:,}). "
+            "Try a smaller date range or an aggregate such as AVG or MAX."
+        )
+
+    order_by = query.order_by
+    if not order_by and query.group_by is None:
+        order_by = (OrderItem("date"),)
+    limited = replace(query, order_by=order_by, limit=max_rows)
+    return limited, (
+        f"Result limited to the first {max_rows:,} of about {estimate.result_rows:,} rows. "
+        "Narrow the date range to see the rest."
+    )
+
+
+def clickhouse_settings(estimate: CostEstimate, budget: QueryBudget) -> dict:
+    """
+    Per-query ClickHouse settings: a read-only session with resource limits
+    set to a multiple of the estimate, capped by the budget.
+
+    Args:
+        estimate: Predicted cost of the query
+        budget: Resource limits
+
+    Returns:
+        Settings dictionary for clickhouse_connect
+    """
+    return {
+        "readonly": 1,
+        "max_execution_time": math.ceil(budget.max_execution_seconds),  # whole seconds
+        "max_rows_to_read": min(
+            budget.max_rows_to_read, max(MIN_ROWS_TO_READ, estimate.rows_scanned * ESTIMATE_SLACK)
+        ),
+        "max_result_rows": min(
+            budget.max_result_rows, max(MIN_RESULT_ROWS, estimate.result_rows * ESTIMATE_SLACK)
+        ),
+        "max_result_bytes": budget.max_result_bytes,
+        "result_overflow_mode": "throw",
+    }
@@ -0,0 +1,159 @@
+"""
+Execution plans for the local query engines.
+
+A plan is the compiled, data-independent form of a query accepted by the CFG
+grammar: its select items, date bounds, grouping, ordering and limit. Both the
+in-process columnar engine and the range aggregate index execute plans.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from cache.lru import TTLCache
+from security.sql_ast import SelectQuery
+from security.sql_guard import parse_sql
+
+PLAN_CACHE_MAX_ENTRIES = 512
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+BUCKET_SECONDS = {"day": SECONDS_PER_DAY, "hour": SECONDS_PER_HOUR}
+
+
+class LocalQueryError(Exception):
+    """Raised when a query can't be executed by the local engine."""
+    pass
+
+
+@dataclass(frozen=True)
+class OutputColumn:
+    """One select item: an aggregate or a plain column."""
+    func: Optional[str]  # sum/avg/min/max/count, or None for a plain column
+    column: Optional[str]  # None for COUNT(*)
+    alias: Optional[str]
+
+    @property
+    def name(self) -> str:
+        """Result column name, following ClickHouse naming for unaliased items."""
+        if self.alias:
+            return self.alias
+        if self.func is None:
+            return self.column
+        return f"{self.func}({self.column or ''})"
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Compiled, data-independent execution plan."""
+    outputs: tuple[OutputColumn, ...]
+    lower: Optional[int]  # inclusive epoch seconds
+    upper: Optional[int]  # inclusive epoch seconds
+    relative_seconds: Optional[int]  # date >= now() - INTERVAL
+    bucket_seconds: Optional[int]  # GROUP BY toStartOfDay/Hour
+    order: tuple[tuple[str, bool], ...]  # (target, descending)
+    limit: Optional[int]
+
+
+def _parse_timestamp(literal: str) -> int:
+    """Parse a 'YYYY-MM-DD[ HH:MM:SS]' literal into UTC epoch seconds."""
+    try:
+        value = datetime.fromisoformat(literal)
+    except ValueError:
+        raise LocalQueryError(f"Cannot parse DateTime from string '{literal}'")
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def build_plan(query: SelectQuery) -> QueryPlan:
+    """
+    Compile a parsed query into an execution plan.
+
+    Args:
+        query: AST returned by parse_sql
+
+    Returns:
+        QueryPlan
+
+    Raises:
+        LocalQueryError: If a date literal can't be parsed
+    """
+    lower, upper, relative = None, None, None
+    for f in query.filters:
+        if f.is_relative:
+            seconds = f.amount * (SECONDS_PER_HOUR if f.unit == "HOUR" else SECONDS_PER_DAY)
+            relative = seconds if relative is None else min(relative, seconds)
+            continue
+        start, end = (_parse_timestamp(value) for value in f.bounds())
+        lower = start if lower is None else max(lower, start)
+        upper = end if upper is None else min(upper, end)
+
+    return QueryPlan(
+        outputs=tuple(OutputColumn(item.func, item.column, item.alias) for item in query.items),
+        lower=lower,
+        upper=upper,
+        relative_seconds=relative,
+        bucket_seconds=BUCKET_SECONDS.get(query.group_by),
+        order=tuple((item.target, item.descending) for item in query.order_by),
+        limit=query.limit,
+    )
+
+
+class PlanCompiler:
+    """
+    Parses and compiles SQL into plans, caching plans per canonical query.
+    """
+
+    def __init__(self, max_entries: int = PLAN_CACHE_MAX_ENTRIES):
+        """
+        Initialize the compiler.
+
+        Args:
+            max_entries: Maximum number of cached plans
+        """
+        self.cache = TTLCache(max_entries=max_entries)
+
+    def compile(self, sql: str) -> QueryPlan:
+        """
+        Parse and compile SQL into an execution plan, reusing cached plans.
+
+        Args:
+            sql: SQL query string
+
+        Returns:
+            Compiled plan
+
+        Raises:
+            ValueError: If SQL doesn't match the grammar
+        """
+        query = parse_sql(sql)
+        canonical = query.canonical
+        key = f"{canonical.key}\x00{canonical.aliases}"
+        plan = self.cache.get(key)
+        if plan is None:
+            plan = build_plan(query)
+            self.cache.set(key, plan)
+        return plan
+
+
+def resolve_bounds(plan: QueryPlan, dates: np.ndarray) -> tuple[int, int]:
+    """
+    Row range [start, stop) selected by a plan's date filters.
+
+    Args:
+        plan: Compiled plan
+        dates: Sorted int64 epoch-seconds date column
+
+    Returns:
+        (start, stop) row indices found by binary search
+    """
+    lower = plan.lower
+    if plan.relative_seconds is not None:
+        since = int(time.time()) - plan.relative_seconds
+        lower = since if lower is None else max(lower, since)
+
+    start = 0 if lower is None else int(np.searchsorted(dates, lower, side="left"))
+    stop = len(dates) if plan.upper is None else int(np.searchsorted(dates, plan.upper, side="right"))
+    return start, max(start, stop)
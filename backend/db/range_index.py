@@ -0,0 +1,223 @@
+"""
+Precomputed range aggregate index over the numeric columns.
+
+Most traffic is "AVG/SUM/MIN/MAX of <column> between date A and date B". With
+prefix sums and non-null prefix counts, SUM/AVG/COUNT over any row range are
+two lookups; sparse tables answer MIN/MAX with two overlapping power-of-two
+windows. The date bounds themselves are a binary search on the sorted date
+column, so no query scans the data.
+
+Appended rows extend the prefix arrays and add only the sparse-table windows
+that end in new rows, so ingestion costs O(k log n) for k new rows instead
+of a rebuild.
+"""
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+
+from db.query_plan import PlanCompiler, QueryPlan, resolve_bounds
+from security.schema import NUMERIC_COLUMNS, TABLE
+
+logger = logging.getLogger(__name__)
+
+
+def _sparse_table(values: np.ndarray, reduce, levels: tuple = ()) -> list[np.ndarray]:
+    """
+    Build a sparse table: level k holds reduce() over windows of length 2**k.
+
+    Args:
+        values: Column values (NaN is ignored by fmin/fmax)
+        reduce: np.fmin or np.fmax
+        levels: Existing table over earlier values; values are appended to
+            it and only windows ending in them are computed
+
+    Returns:
+        List of arrays, one per level
+    """
+    base = np.concatenate((levels[0], values)) if levels else values
+    table = [base]
+    width = 1
+    while width * 2 <= len(base):
+        previous = table[-1]
+        existing = levels[len(table)] if len(table) < len(levels) else previous[:0]
+        start, stop = len(existing), len(base) - 2 * width + 1
+        fresh = reduce(previous[start:stop], previous[start + width:stop + width])
+        table.append(np.concatenate((existing, fresh)) if len(existing) else fresh)
+        width *= 2
+    return table
+
+
+def _extend_prefix(prefix: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Prefix array continued over values (summed in the same order as a full cumsum)."""
+    return np.concatenate((prefix, np.cumsum(np.concatenate((prefix[-1:], values)))[1:]))
+
+
+class RangeAggregateIndex:
+    """
+    Answers aggregate-only date-range queries in constant time.
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray]):
+        """
+        Build the index.
+
+        Args:
+            columns: 'date' as sorted int64 epoch seconds plus float64 numeric columns
+        """
+        started = time.perf_counter()
+        self.dates = columns["date"]
+        self.row_count = len(self.dates)
+        self.prefix_sums: dict[str, np.ndarray] = {}
+        self.prefix_counts: dict[str, np.ndarray] = {}
+        self.min_tables: dict[str, list[np.ndarray]] = {}
+        self.max_tables: dict[str, list[np.ndarray]] = {}
+
+        for column in NUMERIC_COLUMNS:
+            values = columns[column].astype(np.float64)
+            present = ~np.isnan(values)
+            self.prefix_sums[column] = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+            self.prefix_counts[column] = np.concatenate(([0], np.cumsum(present, dtype=np.int64)))
+            self.min_tables[column] = _sparse_table(values, np.fmin)
+            self.max_tables[column] = _sparse_table(values, np.fmax)
+
+        self.compiler = PlanCompiler()
+        logger.info(
+            f"Built range aggregate index over {self.row_count} rows "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    @classmethod
+    def from_csv(cls, path: Optional[str] = None) -> "RangeAggregateIndex":
+        """
+        Build the index from the CSV export.
+
+        Args:
+            path: CSV path (defaults to the local backend's data path)
+
+        Returns:
+            RangeAggregateIndex instance
+        """
+        from db.local_client import DEFAULT_DATA_PATH, load_columns
+
+        return cls(load_columns(path or str(DEFAULT_DATA_PATH)))
+
+    @classmethod
+    def from_clickhouse(cls, client) -> "RangeAggregateIndex":
+        """
+        Build the index from a one-time dump of the ClickHouse table.
+
+        Args:
+            client: clickhouse_connect client (DatabaseClient.client)
+
+        Returns:
+            RangeAggregateIndex instance
+        """
+        columns = ", ".join(("date",) + NUMERIC_COLUMNS)
+        result = client.query(f"SELECT {columns} FROM {TABLE} ORDER BY date")
+        by_name = dict(zip(result.column_names, zip(*result.result_rows))) if result.result_rows else {}
+        dumped = {
+            "date": np.array(by_name.get("date", ()), dtype="datetime64[s]").astype(np.int64),
+        }
+        for column in NUMERIC_COLUMNS:
+            dumped[column] = np.array(
+                [np.nan if v is None else v for v in by_name.get(column, ())], dtype=np.float64
+            )
+        return cls(dumped)
+
+    def append(self, columns: dict[str, np.ndarray]) -> None:
+        """
+        Index rows dated after the last indexed row.
+
+        Existing entries keep their positions and the date column is swapped
+        in last, so a concurrent query resolves its bounds against dates whose
+        aggregates are already in place.
+
+        Args:
+            columns: 'date' as sorted int64 epoch seconds plus float64 numeric columns
+        """
+        started = time.perf_counter()
+        for column in NUMERIC_COLUMNS:
+            values = columns[column].astype(np.float64)
+            present = ~np.isnan(values)
+            self.prefix_sums[column] = _extend_prefix(
+                self.prefix_sums[column], np.where(present, values, 0.0)
+            )
+            self.prefix_counts[column] = _extend_prefix(
+                self.prefix_counts[column], present.astype(np.int64)
+            )
+            self.min_tables[column] = _sparse_table(values, np.fmin, tuple(self.min_tables[column]))
+            self.max_tables[column] = _sparse_table(values, np.fmax, tuple(self.max_tables[column]))
+        self.dates = np.concatenate((self.dates, columns["date"]))
+        self.row_count = len(self.dates)
+        logger.info(
+            f"Appended {len(columns['date'])} rows to range aggregate index "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def _aggregate(self, func: str, column: Optional[str], start: int, stop: int):
+        """Evaluate one aggregate over rows [start, stop) in O(1)."""
+        if func == "count":
+            if column is None or column == "date":
+                return stop - start
+            counts = self.prefix_counts[column]
+            return int(counts[stop] - counts[start])
+
+        if start == stop:
+            # ClickHouse results for aggregates over zero rows
+            return float("nan") if func == "avg" else 0.0
+
+        if func in ("sum", "avg"):
+            total = float(self.prefix_sums[column][stop] - self.prefix_sums[column][start])
+            if func == "sum":
+                return total
+            count = int(self.prefix_counts[column][stop] - self.prefix_counts[column][start])
+            return total / count if count else float("nan")
+
+        tables = self.min_tables if func == "min" else self.max_tables
+        reduce = np.fmin if func == "min" else np.fmax
+        level = (stop - start).bit_length() - 1
+        table = tables[column][level]
+        return float(reduce(table[start], table[stop - (1 << level)]))
+
+    def can_answer(self, plan: QueryPlan) -> bool:
+        """
+        Whether a plan is an ungrouped, aggregate-only query over indexed columns.
+
+        Args:
+            plan: Compiled plan
+
+        Returns:
+            True if try_answer will handle it
+        """
+        if plan.bucket_seconds is not None or plan.limit == 0:
+            return False
+        return all(
+            output.func is not None
+            and (output.column is None or output.column in self.prefix_sums
+                 or (output.func == "count" and output.column == "date"))
+            for output in plan.outputs
+        )
+
+    def try_answer(self, sql: str) -> Optional[dict]:
+        """
+        Answer a query from the index if possible.
+
+        Args:
+            sql: Validated SQL query string
+
+        Returns:
+            Dictionary with 'columns' and 'rows' keys, or None if the query
+            needs the database
+        """
+        try:
+            plan = self.compiler.compile(sql)
+        except Exception:
+            return None
+        if not self.can_answer(plan):
+            return None
+
+        start, stop = resolve_bounds(plan, self.dates)
+        row = tuple(self._aggregate(o.func, o.column, start, stop) for o in plan.outputs)
+        return {"columns": [o.name for o in plan.outputs], "rows": [row]}
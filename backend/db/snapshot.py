@@ -0,0 +1,222 @@
+"""
+Binary columnar snapshot of the CSV export, memory-mapped at startup.
+
+Parsing data/coin_Bitcoin.csv costs time proportional to its history on
+every process start, and leaves each worker with a private copy of the same
+columns. The snapshot holds the columns in load_columns() layout as
+fixed-width little-endian arrays (int64 epoch seconds, float64 values)
+behind a small header, so loading it is a constant-time mmap: the arrays are
+read-only views of the page cache, shared by every worker on the host.
+
+Layout (little-endian):
+
+    header     magic, format version, column count, row count,
+               bytes of the CSV covered, checksum of the CSV, CRC32 of the header
+    directory  per column: name, dtype, byte offset of its array
+    arrays     one per column, each aligned to 64 bytes
+
+A snapshot covers the CSV up to a byte offset. Rows ingested after it was
+built are parsed from the CSV tail (see CSVStore.load()). The checksum
+hashes the CSV's first and last COVERED_CHECK_BYTES before that offset, so a
+replaced or edited export is detected in constant time; a stale, corrupt
+or older-version snapshot is ignored and the CSV is parsed instead.
+
+Run from backend directory: python -m db.snapshot [csv]
+"""
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+
+from security.schema import NUMERIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DRIPCOLS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+ALIGNMENT = 64
+# CSV bytes hashed at each end of the covered range
+COVERED_CHECK_BYTES = 64 * 1024
+
+# magic, version, column count, rows, covered CSV bytes, CSV checksum
+_HEADER = struct.Struct("<8sIIQQ32s")
+_CRC = struct.Struct("<I")
+# column name, dtype, array offset
+_ENTRY = struct.Struct("<16s4sQ")
+
+SNAPSHOT_COLUMNS = ("date",) + NUMERIC_COLUMNS
+_DTYPES = {"date": "<i8", **{column: "<f8" for column in NUMERIC_COLUMNS}}
+
+
+class Snapshot(NamedTuple):
+    """A mapped snapshot."""
+    columns: dict[str, np.ndarray]  # read-only views of the mapped file
+    source_bytes: int  # CSV bytes the snapshot covers
+
+
+def snapshot_path(source_path: Union[str, Path]) -> Path:
+    """Snapshot path for a CSV export (same name, .snapshot suffix)."""
+    return Path(source_path).with_suffix(SNAPSHOT_SUFFIX)
+
+
+def source_checksum(source_path: Union[str, Path], source_bytes: int) -> bytes:
+    """
+    Checksum of the first source_bytes of a CSV, in constant time.
+
+    Args:
+        source_path: CSV export
+        source_bytes: Length of the covered prefix
+
+    Returns:
+        SHA-256 of the length and the first and last COVERED_CHECK_BYTES of the prefix
+    """
+    window = min(COVERED_CHECK_BYTES, source_bytes)
+    digest = hashlib.sha256(str(source_bytes).encode("ascii"))
+    with open(source_path, "rb") as f:
+        digest.update(f.read(window))
+        f.seek(source_bytes - window)
+        digest.update(f.read(window))
+    return digest.digest()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(
+    columns: dict[str, np.ndarray],
+    source_path: Union[str, Path],
+    source_bytes: int,
+    path: Optional[Union[str, Path]] = None,
+) -> Path:
+    """
+    Write a snapshot of columns loaded from the first source_bytes of a CSV.
+
+    The file is written next to its final path and renamed into place, so
+    processes that have the previous snapshot mapped keep reading it.
+
+    Args:
+        columns: Column arrays in the load_columns() layout
+        source_path: CSV the columns were loaded from
+        source_bytes: CSV bytes the columns cover
+        path: Snapshot path (defaults to snapshot_path(source_path))
+
+    Returns:
+        Path of the snapshot
+    """
+    path = Path(path or snapshot_path(source_path))
+    rows = len(columns["date"])
+    offset = _aligned(_HEADER.size + _CRC.size + _ENTRY.size * len(SNAPSHOT_COLUMNS))
+    directory = []
+    for name in SNAPSHOT_COLUMNS:
+        directory.append(_ENTRY.pack(name.encode("ascii"), _DTYPES[name].encode("ascii"), offset))
+        offset = _aligned(offset + rows * 8)
+
+    header = _HEADER.pack(
+        MAGIC, SNAPSHOT_VERSION, len(SNAPSHOT_COLUMNS), rows, source_bytes,
+        source_checksum(source_path, source_bytes),
+    )
+    directory_bytes = b"".join(directory)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as f:
+        f.write(header)
+        f.write(_CRC.pack(zlib.crc32(header + directory_bytes)))
+        f.write(directory_bytes)
+        for name, entry in zip(SNAPSHOT_COLUMNS, directory):
+            f.seek(_ENTRY.unpack(entry)[2])
+            f.write(np.ascontiguousarray(columns[name], dtype=_DTYPES[name]).tobytes())
+        f.truncate(offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return path
+
+
+def open_snapshot(path: Union[str, Path], source_path: Union[str, Path]) -> Optional[Snapshot]:
+    """
+    Map a snapshot if it is current for the CSV.
+
+    Args:
+        path: Snapshot path
+        source_path: CSV export the snapshot must match
+
+    Returns:
+        Snapshot, or None if there is none or it is stale, corrupt or from
+        another format version (the caller parses the CSV instead)
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return _validate(mapped, path, source_path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def _validate(mapped: mmap.mmap, path: Path, source_path: Union[str, Path]) -> Optional[Snapshot]:
+    """Check a mapped snapshot against its header and the CSV; build the column views."""
+    magic, version, column_count, rows, source_bytes, checksum = _HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        logger.warning(f"Ignoring {path}: not a snapshot")
+        return None
+    if version != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring {path}: format version {version}, expected {SNAPSHOT_VERSION}; rebuild it")
+        return None
+
+    directory_start = _HEADER.size + _CRC.size
+    directory_bytes = mapped[directory_start:directory_start + _ENTRY.size * column_count]
+    (crc,) = _CRC.unpack_from(mapped, _HEADER.size)
+    if crc != zlib.crc32(mapped[:_HEADER.size] + directory_bytes):
+        logger.warning(f"Ignoring {path}: header checksum mismatch")
+        return None
+
+    if not rows or os.path.getsize(source_path) < source_bytes or source_checksum(source_path, source_bytes) != checksum:
+        logger.warning(f"Ignoring stale snapshot {path}; rebuild it with python -m db.snapshot")
+        return None
+
+    columns = {}
+    for i in range(column_count):
+        name, dtype, offset = _ENTRY.unpack_from(directory_bytes, i * _ENTRY.size)
+        name = name.rstrip(b"\0").decode("ascii")
+        columns[name] = np.frombuffer(mapped, dtype=dtype.rstrip(b"\0").decode("ascii"), count=rows, offset=offset)
+    if tuple(columns) != SNAPSHOT_COLUMNS:
+        logger.warning(f"Ignoring {path}: columns don't match the schema")
+        return None
+    return Snapshot(columns, source_bytes)
+
+
+def main():
+    from db.ingest import CSVStore
+    from db.local_client import default_data_path
+
+    parser = argparse.ArgumentParser(description="Convert the CSV export to a memory-mapped columnar snapshot")
+    parser.add_argument("csv", nargs="?", help="CSV export (default: LOCAL_DATA_PATH or data/coin_Bitcoin.csv)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    store = CSVStore(args.csv or default_data_path())
+    started = time.perf_counter()
+    columns = store.read_new()
+    if columns is None:
+        parser.error(f"{store.path} has no rows")
+    path = write_snapshot(columns, store.path, store.offset)
+    print(
+        f"Wrote {len(columns['date'])} rows to {path} ({path.stat().st_size} bytes) "
+        f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
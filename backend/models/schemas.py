@@ -1,7 +1,7 @@
 """
 Pydantic models for API requests and responses.
 """
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import BaseModel, Field
 
@@ -11,11 +11,47 @@ class QueryRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=1000, description="Natural language query")
 
 
+class PageRequest(BaseModel):
+    """Request model for the next page of a paginated result."""
+    cursor: str = Field(..., min_length=1, max_length=4096, description="next_cursor of an earlier response")
+
+
 class QueryResponse(BaseModel):
     """Response model for query endpoint."""
     sql: str
     data: dict
     warning: Optional[str] = None
+    source: Optional[str] = None  # "range_index" or "database"
+    sql_source: Optional[str] = None  # "rules", "cache" or "llm"
+    timings: Optional[Dict[str, float]] = None  # milliseconds per pipeline stage
+    next_cursor: Optional[str] = None  # set when more rows are available from /query/page
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for the batch query endpoint."""
+    questions: list[str] = Field(..., min_items=1, max_items=500, description="Natural language queries")
+
+
+class BatchQueryItem(BaseModel):
+    """Result or error for one question of a batch."""
+    question: str
+    ok: bool
+    sql: Optional[str] = None
+    data: Optional[dict] = None
+    warning: Optional[str] = None
+    source: Optional[str] = None  # "range_index" or "database"
+    sql_source: Optional[str] = None  # "rules", "cache" or "llm"
+    next_cursor: Optional[str] = None
+    status_code: Optional[int] = None  # HTTP status /query would have returned
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for the batch query endpoint (results in input order)."""
+    total: int
+    succeeded: int
+    failed: int
+    results: list[BatchQueryItem]
 
 
 class EvalTestCase(BaseModel):
@@ -53,3 +89,12 @@ class EvalResponse(BaseModel):
     failed: int
     results: list[EvalResult]
 
+
+
+class IngestResponse(BaseModel):
+    """Response model for the ingestion endpoint."""
+    rows_added: int
+    rows_skipped: int
+    min_date: str  # date range of the data after ingestion
+    max_date: str
+    epoch: Optional[int] = None  # result cache epoch after invalidation
@@ -0,0 +1,203 @@
+"""
+Typed, immutable AST for queries accepted by the CFG grammar.
+
+sql_guard.parse_sql builds a SelectQuery from a single Lark parse. Date
+validation, date-filter normalization, cache keys, local execution plans and
+eval SQL comparison all work from this structure instead of re-scanning the
+SQL text, and render() turns it back into SQL the grammar accepts.
+"""
+import re
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import NamedTuple, Optional
+
+from .schema import TABLE
+
+AGGREGATES = ("sum", "avg", "min", "max", "count")
+
+GROUP_FUNCTIONS = {
+    "day": "toStartOfDay",
+    "hour": "toStartOfHour",
+}
+
+_DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class CanonicalSQL(NamedTuple):
+    """Canonical form of a validated query, used as a cache key."""
+    key: str
+    aliases: tuple[Optional[str], ...]
+    is_relative: bool
+
+
+@dataclass(frozen=True)
+class SelectItem:
+    """An aggregate (FUNC(column), COUNT(*)) or a plain column."""
+    func: Optional[str]  # one of AGGREGATES, or None for a plain column
+    column: Optional[str]  # lowercase column name; None for COUNT(*)
+    alias: Optional[str] = None
+
+    @property
+    def is_aggregate(self) -> bool:
+        return self.func is not None
+
+    @property
+    def expression(self) -> str:
+        """Expression without alias, e.g. AVG(close) or date."""
+        if self.func is None:
+            return self.column
+        return f"{self.func.upper()}({self.column or '*'})"
+
+    def render(self) -> str:
+        return f"{self.expression} AS {self.alias}" if self.alias else self.expression
+
+
+@dataclass(frozen=True)
+class DateFilter:
+    """One condition on the date column."""
+    kind: str  # "between", "equals" or "interval"
+    start: Optional[str] = None  # literal contents (no quotes)
+    end: Optional[str] = None
+    amount: Optional[int] = None  # interval filters: now() - INTERVAL amount unit
+    unit: Optional[str] = None  # "HOUR" or "DAY"
+
+    @property
+    def is_relative(self) -> bool:
+        return self.kind == "interval"
+
+    def bounds(self) -> tuple[Optional[str], Optional[str]]:
+        """Inclusive (start, end) literals; (None, None) for interval filters."""
+        if self.kind == "equals":
+            return self.start, self.start
+        return self.start, self.end
+
+    def full_day(self) -> "DateFilter":
+        """
+        Widen single-day filters on date-only literals to cover the whole day,
+        since the date column is a DateTime with a time component.
+        """
+        start, end = self.bounds()
+        if self.kind != "interval" and start == end and start and _DATE_ONLY.match(start):
+            return DateFilter("between", f"{start} 00:00:00", f"{end} 23:59:59")
+        return self
+
+    def render(self) -> str:
+        if self.kind == "between":
+            return f"date BETWEEN '{self.start}' AND '{self.end}'"
+        if self.kind == "equals":
+            return f"date = '{self.start}'"
+        return f"date >= now() - INTERVAL {self.amount} {self.unit}"
+
+
+@dataclass(frozen=True)
+class OrderItem:
+    """ORDER BY target: a column name or a select alias."""
+    target: str
+    direction: Optional[str] = None  # "ASC", "DESC" or None when omitted
+
+    @property
+    def descending(self) -> bool:
+        return self.direction == "DESC"
+
+    def render(self) -> str:
+        return f"{self.target} {self.direction}" if self.direction else self.target
+
+
+@dataclass(frozen=True)
+class SelectQuery:
+    """A parsed SELECT over the single allowed table."""
+    items: tuple[SelectItem, ...]
+    filters: tuple[DateFilter, ...]
+    group_by: Optional[str] = None  # "day" or "hour"
+    order_by: tuple[OrderItem, ...] = ()
+    limit: Optional[int] = None
+
+    @property
+    def aliases(self) -> tuple[Optional[str], ...]:
+        return tuple(item.alias for item in self.items)
+
+    @property
+    def is_relative(self) -> bool:
+        """Whether the query depends on now()."""
+        return any(f.is_relative for f in self.filters)
+
+    def date_bounds(self) -> tuple[Optional[str], Optional[str]]:
+        """
+        Effective (start, end) literals: the intersection of all absolute filters.
+
+        Returns:
+            (start, end); either is None when no absolute filter sets it
+        """
+        start, end = None, None
+        for f in self.filters:
+            lower, upper = f.bounds()
+            if lower is not None:
+                start = lower if start is None else max(start, lower)
+            if upper is not None:
+                end = upper if end is None else min(end, upper)
+        return start, end
+
+    def with_full_day_filters(self) -> "SelectQuery":
+        """Copy with single-day filters widened to the whole day (see DateFilter.full_day)."""
+        filters = tuple(f.full_day() for f in self.filters)
+        return self if filters == self.filters else replace(self, filters=filters)
+
+    def render(self) -> str:
+        """Render back to SQL accepted by the grammar."""
+        parts = [
+            f"SELECT {', '.join(item.render() for item in self.items)}",
+            f"FROM {TABLE}",
+            f"WHERE {' AND '.join(f.render() for f in self.filters)}",
+        ]
+        if self.group_by is not None:
+            parts.append(f"GROUP BY {GROUP_FUNCTIONS[self.group_by]}(date)")
+        if self.order_by:
+            parts.append(f"ORDER BY {', '.join(item.render() for item in self.order_by)}")
+        if self.limit is not None:
+            parts.append(f"LIMIT {self.limit}")
+        return " ".join(parts)
+
+    @cached_property
+    def canonical_form(self) -> "SelectQuery":
+        """
+        Alias-free form: ORDER BY aliases resolved to their expressions and
+        directions made explicit. Queries that differ only in formatting,
+        keyword case or aliases have equal canonical forms.
+        """
+        targets = {item.alias: item for item in self.items if item.alias}
+        order_by = []
+        for item in self.order_by:
+            target = targets[item.target].expression if item.target in targets else item.target
+            order_by.append(OrderItem(target, item.direction or "ASC"))
+        return replace(
+            self,
+            items=tuple(replace(item, alias=None) for item in self.items),
+            order_by=tuple(order_by),
+        )
+
+    @cached_property
+    def canonical(self) -> CanonicalSQL:
+        """Canonical key, per-item aliases and now()-dependence for caches."""
+        return CanonicalSQL(
+            key=self.canonical_form.render(),
+            aliases=self.aliases,
+            is_relative=self.is_relative,
+        )
+
+    def equivalent(self, other: "SelectQuery", ignore_limit: bool = True) -> bool:
+        """
+        Structural equality for eval comparison: ignores formatting, aliases,
+        single-day filter spelling and (by default) LIMIT.
+
+        Args:
+            other: Query to compare with
+            ignore_limit: Whether LIMIT differences are ignored
+
+        Returns:
+            True if both queries ask for the same thing
+        """
+        def comparable(query: SelectQuery) -> SelectQuery:
+            form = query.with_full_day_filters().canonical_form
+            return replace(form, limit=None) if ignore_limit else form
+
+        return comparable(self) == comparable(other)
@@ -2,12 +2,28 @@
 SQL validation using Context-Free Grammar (CFG) parser.
 This ensures generated SQL matches the exact grammar that GPT-5 will use.
 """
+import hashlib
+import logging
 import re
+from dataclasses import dataclass
 from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 
-from lark import Lark, UnexpectedInput, Token
+import lark
+from lark import Lark, UnexpectedInput, Token, Transformer
 
+from core.config import get_env
+from core.constants import BACKEND_DIR, PARSER_CACHE_DIR
 from .schema import COLUMNS, DATABASE, NUMERIC_COLUMNS, TABLE
+from .sql_ast import CanonicalSQL, DateFilter, OrderItem, SelectItem, SelectQuery
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+PARSER_CACHE_DIR_ENV = "SQL_PARSER_CACHE_DIR"
+
+PARSE_CACHE_MAX_ENTRIES = 1024
 
 
 # Grammar is generated from schema constants to keep the model constraint and server-side validation in sync.
@@ -163,8 +179,9 @@ DAY: /[Dd][Aa][Yy]/
 
 // Case-insensitive function names (ClickHouse/Tinybird may normalize case)
 // Use character classes for case-insensitive matching instead of (?i) flag
-TOSTARTOFDAY: /^[Tt][Oo][Ss][Tt][Aa][Rr][Tt][Oo][Ff][Dd][Aa][Yy]$/
-TOSTARTOFHOUR: /^[Tt][Oo][Ss][Tt][Aa][Rr][Tt][Oo][Ff][Hh][Oo][Uu][Rr]$/
+// (no ^/$ anchors: the lexer matches mid-string, so anchored patterns never match)
+TOSTARTOFDAY: /[Tt][Oo][Ss][Tt][Aa][Rr][Tt][Oo][Ff][Dd][Aa][Yy]/
+TOSTARTOFHOUR: /[Tt][Oo][Ss][Tt][Aa][Rr][Tt][Oo][Ff][Hh][Oo][Uu][Rr]/
 
 // General identifier (must come after specific column tokens)
 IDENTIFIER: /[A-Za-z_][A-Za-z0-9_]*/
@@ -181,40 +198,272 @@ def sql_grammar() -> str:
     return _SQL_GRAMMAR
 
 
+_PARSER_OPTIONS = {"start": "start", "parser": "lalr"}
+
+WARMUP_SQL = "SELECT close FROM coin_Bitcoin WHERE date = '2020-01-01'"
+
+
+def grammar_hash() -> str:
+    """Hash of everything the compiled parser tables depend on."""
+    key = f"{lark.__version__}\n{sorted(_PARSER_OPTIONS.items())}\n{_SQL_GRAMMAR}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def parser_cache_path() -> Optional[Path]:
+    """
+    Path of the Lark parser cache for the current grammar.
+
+    The file name contains the grammar hash, so a grammar change (or a Lark
+    upgrade) never collides with another version's file; Lark also checks
+    the grammar and options hash stored in the file before using it. The
+    cache is unpickled on load, so it lives under the backend directory
+    (a relative SQL_PARSER_CACHE_DIR is resolved against it too), never
+    wherever the server happens to be started.
+
+    Returns:
+        Cache file path, or None if SQL_PARSER_CACHE_DIR is set to ""
+    """
+    directory = get_env(PARSER_CACHE_DIR_ENV, PARSER_CACHE_DIR)
+    if not directory:
+        return None
+    return BACKEND_DIR / directory / f"sql_parser-{grammar_hash()[:16]}.lark"
+
+
+def _load_or_build_parser(path: Optional[Path]) -> Lark:
+    """
+    Build the LALR parser through Lark's cache: tables are loaded from the
+    cache file when it matches the grammar, else compiled and saved there.
+    An unreadable or unwritable cache only costs the compile.
+
+    Args:
+        path: Cache file, or None to always compile
+
+    Returns:
+        Lark parser
+    """
+    if path is None:
+        return Lark(_SQL_GRAMMAR, **_PARSER_OPTIONS)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError as exc:
+        logger.warning("Could not create parser cache directory %s: %s", path.parent, exc)
+    return Lark(_SQL_GRAMMAR, cache=str(path), **_PARSER_OPTIONS)
+
+
 @lru_cache(maxsize=1)
 def _parser() -> Lark:
-    """Cached Lark parser instance."""
-    return Lark(_SQL_GRAMMAR, start="start", parser="lalr")
+    """Cached Lark parser instance (loaded from the parser cache when possible)."""
+    return _load_or_build_parser(parser_cache_path())
 
 
-def validate_sql(sql: str) -> None:
+def warm_parser() -> None:
     """
-    Validate SQL query against the CFG grammar.
+    Load the parser and run one parse so the first request doesn't pay for
+    grammar compilation or lexer setup. Called from the app lifespan.
+    """
+    _parser().parse(WARMUP_SQL)
+
+
+_LINE_COMMENT = re.compile(r"--.*?$", re.MULTILINE)
+_BLOCK_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_FORBIDDEN = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|TRUNCATE|CREATE|GRANT|REVOKE|ATTACH|DETACH|OPTIMIZE|SYSTEM|KILL)\b",
+    re.IGNORECASE,
+)
+
+
+def _clean_sql(sql: str) -> str:
+    """
+    Strip whitespace, trailing semicolons and comments from SQL.
 
     Raises:
-        ValueError: If SQL is empty, doesn't match grammar, or violates constraints.
+        ValueError: If SQL is empty or contains a forbidden keyword.
     """
     # Normalize SQL: strip, remove semicolons, remove comments
     text = sql.strip().rstrip(";")
 
     # Remove SQL comments
-    text = re.sub(r"--.*?$", "", text, flags=re.MULTILINE)
-    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    text = _LINE_COMMENT.sub("", text)
+    text = _BLOCK_COMMENT.sub("", text)
     text = text.strip()
 
     if not text:
         raise ValueError("SQL is required")
 
     # Check for forbidden operations (defense in depth)
-    forbidden = re.compile(
-        r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|TRUNCATE|CREATE|GRANT|REVOKE|ATTACH|DETACH|OPTIMIZE|SYSTEM|KILL)\b",
-        re.IGNORECASE,
-    )
-    if forbidden.search(text):
+    if _FORBIDDEN.search(text):
         raise ValueError("Forbidden SQL keyword detected.")
 
+    return text
+
+
+class _ASTBuilder(Transformer):
+    """Turns the Lark parse tree into a SelectQuery."""
+
+    def column(self, children):
+        return str(children[0]).lower()
+
+    numeric_column = column
+
+    def alias(self, children):
+        return _Alias(str(children[1]))
+
+    def _aggregate(self, children: list) -> SelectItem:
+        func = str(children[0]).lower()
+        column = next((c for c in children[1:] if type(c) is str), None)
+        alias = next((c.name for c in children if isinstance(c, _Alias)), None)
+        return SelectItem(func=func, column=column, alias=alias)
+
+    sum_expr = avg_expr = min_expr = max_expr = count_expr = _aggregate
+
+    def agg_expr(self, children):
+        return children[0]
+
+    def select_item(self, children):
+        if isinstance(children[0], SelectItem):
+            return children[0]
+        alias = children[1].name if len(children) > 1 else None
+        return SelectItem(func=None, column=children[0], alias=alias)
+
+    def select_list(self, children):
+        return ("items", tuple(children))
+
+    def string_literal(self, children):
+        return _Literal(str(children[0])[1:-1])
+
+    def interval_unit(self, children):
+        return str(children[0]).upper()
+
+    def date_between_filter(self, children):
+        start, end = [c.value for c in children if isinstance(c, _Literal)]
+        return DateFilter("between", start, end)
+
+    def date_equals_filter(self, children):
+        value = next(c.value for c in children if isinstance(c, _Literal))
+        return DateFilter("equals", value)
+
+    def date_interval_filter(self, children):
+        amount = next(c for c in children if isinstance(c, Token) and c.type == "INT")
+        return DateFilter("interval", amount=int(amount), unit=children[-1])
+
+    def time_filter(self, children):
+        return children[0]
+
+    def condition(self, children):
+        return tuple(c for c in children if isinstance(c, DateFilter))
+
+    def where_clause(self, children):
+        return ("filters", children[-1])
+
+    def to_start_of_day(self, children):
+        return "day"
+
+    def to_start_of_hour(self, children):
+        return "hour"
+
+    def group_dimension(self, children):
+        return children[0]
+
+    def group_by_clause(self, children):
+        return ("group_by", children[-1])
+
+    def order_dir(self, children):
+        return str(children[0]).upper()
+
+    def order_item(self, children):
+        return OrderItem(str(children[0]), children[1] if len(children) > 1 else None)
+
+    def order_list(self, children):
+        return tuple(children)
+
+    def order_by_clause(self, children):
+        return ("order_by", children[-1])
+
+    def limit_clause(self, children):
+        return ("limit", int(children[1]))
+
+    def select_stmt(self, children):
+        clauses = dict(c for c in children if isinstance(c, tuple))
+        return SelectQuery(**clauses)
+
+    def start(self, children):
+        return children[0]
+
+
+@dataclass(frozen=True)
+class _Alias:
+    name: str
+
+
+@dataclass(frozen=True)
+class _Literal:
+    value: str
+
+
+@lru_cache(maxsize=PARSE_CACHE_MAX_ENTRIES)
+def _parse_text(text: str) -> SelectQuery:
+    """Parse cleaned SQL text; results are immutable, so they are shared."""
     try:
-        _parser().parse(text)
+        tree = _parser().parse(text)
     except UnexpectedInput as exc:
         raise ValueError(
             f"SQL does not match the allowed grammar: {exc}") from exc
+    return _ASTBuilder().transform(tree)
+
+
+def parse_sql(sql: str) -> SelectQuery:
+    """
+    Clean and parse SQL into a typed, immutable AST.
+
+    Repeated parses of the same text are served from a cache.
+
+    Raises:
+        ValueError: If SQL is empty, doesn't match grammar, or violates constraints.
+    """
+    return _parse_text(_clean_sql(sql))
+
+
+def validate_sql(sql: str) -> None:
+    """
+    Validate SQL query against the CFG grammar.
+
+    Raises:
+        ValueError: If SQL is empty, doesn't match grammar, or violates constraints.
+    """
+    parse_sql(sql)
+
+
+def canonicalize_sql(sql: str) -> CanonicalSQL:
+    """
+    Reduce a query to a canonical form so that whitespace, keyword case and
+    alias differences map to the same key.
+
+    Args:
+        sql: SQL query string
+
+    Returns:
+        CanonicalSQL with the alias-free key, the alias of each select item
+        and whether the query depends on now()
+
+    Raises:
+        ValueError: If SQL doesn't match the grammar
+    """
+    return parse_sql(sql).canonical
+
+
+def sql_equivalent(a: str, b: str) -> bool:
+    """
+    Whether two queries are structurally equal, ignoring formatting, aliases,
+    single-day filter spelling and LIMIT.
+
+    Args:
+        a: SQL query string
+        b: SQL query string
+
+    Returns:
+        True if both parse and ask for the same thing
+
+    Raises:
+        ValueError: If either query doesn't match the grammar
+    """
+    return parse_sql(a).equivalent(parse_sql(b))
@@ -1,35 +1,62 @@
 """
 Business logic for evaluation test cases.
 """
+import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+from core.config import get_env
+from core.constants import EVAL_CASE_TIMEOUT_SECONDS, EVAL_CONCURRENCY
 from db.client import DatabaseClient
 from models.schemas import EvalTestCase, EvalResult
+from security.sql_guard import sql_equivalent
 from services.sql_generator import SQLGenerator
+from utils.metrics import stage
+from utils.query_validation import validate_queries
 
 logger = logging.getLogger(__name__)
 
+# Environment variable names
+EVAL_CONCURRENCY_ENV = "EVAL_CONCURRENCY"
+EVAL_CASE_TIMEOUT_ENV = "EVAL_CASE_TIMEOUT_SECONDS"
+
 
 class EvalService:
     """
     Service for running evaluation test cases.
     """
     
-    def __init__(self, db_client: DatabaseClient, sql_generator: SQLGenerator):
+    def __init__(
+        self,
+        db_client: DatabaseClient,
+        sql_generator: SQLGenerator,
+        concurrency: Optional[int] = None,
+        case_timeout_seconds: Optional[float] = None,
+    ):
         """
         Initialize the eval service.
         
         Args:
             db_client: Database client instance
             sql_generator: SQL generator instance
+            concurrency: Maximum cases in flight for the async runners
+                (defaults to EVAL_CONCURRENCY env var)
+            case_timeout_seconds: Time budget per case for the async runners
+                (defaults to EVAL_CASE_TIMEOUT_SECONDS env var)
         """
         self.db_client = db_client
         self.sql_generator = sql_generator
+        if concurrency is None:
+            concurrency = int(get_env(EVAL_CONCURRENCY_ENV, str(EVAL_CONCURRENCY)))
+        if case_timeout_seconds is None:
+            case_timeout_seconds = float(get_env(EVAL_CASE_TIMEOUT_ENV, str(EVAL_CASE_TIMEOUT_SECONDS)))
+        self.concurrency = max(1, concurrency)
+        self.case_timeout_seconds = case_timeout_seconds
     
     def _normalize_sql(self, sql: str) -> str:
         """
-        Normalize SQL for comparison (case-insensitive, whitespace, remove aliases, remove LIMIT).
+        Normalize SQL text for comparison (case-insensitive, whitespace).
+        Only used for SQL outside the grammar, which can't be parsed.
         
         Args:
             sql: SQL query string
@@ -37,19 +64,25 @@ class EvalService:
         Returns:
             Normalized SQL string
         """
-        import re
-        
-        # Normalize case and whitespace
-        normalized = " ".join(sql.upper().split())
-        
-        # Remove aliases (AS alias_name)
-        # Pattern: AS followed by identifier at end of SELECT clause or after aggregation
-        normalized = re.sub(r'\s+AS\s+[A-Z_][A-Z0-9_]*', '', normalized)
-        
-        # Remove LIMIT clauses for comparison
-        normalized = re.sub(r'\s+LIMIT\s+\d+', '', normalized)
+        return " ".join(sql.upper().split())
+    
+    def _sql_matches(self, expected_sql: str, actual_sql: str) -> bool:
+        """
+        Compare SQL structurally (ignoring formatting, aliases, single-day
+        filter spelling and LIMIT), falling back to normalized text when
+        either side doesn't parse.
         
-        return normalized
+        Args:
+            expected_sql: Expected SQL query string
+            actual_sql: Generated SQL query string
+            
+        Returns:
+            True if the queries match
+        """
+        try:
+            return sql_equivalent(expected_sql, actual_sql)
+        except ValueError:
+            return self._normalize_sql(expected_sql) == self._normalize_sql(actual_sql)
     
     def _compare_results(self, actual: Dict[str, Any], expected: Dict[str, Any]) -> bool:
         """
@@ -64,6 +97,111 @@ class EvalService:
         """
         return actual == expected
     
+    def _new_result(self, test_case: EvalTestCase) -> EvalResult:
+        """Create an empty result for a test case."""
+        return EvalResult(
+            question=test_case.question,
+            name=getattr(test_case, 'name', None),
+            expected_sql=test_case.expected_sql,
+            status="pending",
+            actual_sql=None,
+            actual_result=None,
+            sql_match=None,
+            result_match=None,
+            error=None,
+        )
+    
+    def _record_sql(self, test_case: EvalTestCase, result: EvalResult, actual_sql: str) -> None:
+        """Record generated SQL and compare it with the expected SQL (if provided)."""
+        result.actual_sql = actual_sql
+        if test_case.expected_sql:
+            result.sql_match = self._sql_matches(test_case.expected_sql, actual_sql)
+            logger.info(f"SQL match: {result.sql_match}")
+    
+    def _score_success(self, test_case: EvalTestCase, result: EvalResult, query_result: Dict[str, Any]) -> None:
+        """Compare results and determine status after SQL was generated and executed."""
+        result.actual_result = query_result
+        
+        # Compare results with expected (if provided)
+        if test_case.expected_result is not None:
+            result.result_match = self._compare_results(
+                query_result,
+                test_case.expected_result
+            )
+        
+        # Determine overall status
+        # For negative test cases (should_pass=False), we expect an error
+        if not getattr(test_case, 'should_pass', True):
+            # This is a security test - it should have failed
+            result.status = "security_fail"  # Security test failed (bad - SQL was generated)
+            result.error = "Security test failed: SQL was generated when it should have been rejected"
+        elif result.error:
+            result.status = "error"
+        elif test_case.expected_sql and not result.sql_match:
+            # SQL doesn't match exactly, but if it executed successfully, 
+            # it's likely just formatting/alias differences - mark as pass
+            if result.actual_result is not None:
+                result.status = "pass"  # SQL executed successfully, CFG is working
+            else:
+                result.status = "sql_mismatch"
+        elif test_case.expected_result is not None and not result.result_match:
+            result.status = "result_mismatch"
+        else:
+            result.status = "pass"
+    
+    def _score_error(self, test_case: EvalTestCase, result: EvalResult, error: Exception, index: int) -> None:
+        """Determine status when generation or execution raised."""
+        error_msg = str(error)
+        result.error = error_msg
+        
+        # For negative test cases (should_pass=False), an error is expected
+        if not getattr(test_case, 'should_pass', True):
+            # Check if error contains expected keywords
+            expected_keywords = getattr(test_case, 'expected_error_contains', [])
+            if expected_keywords:
+                error_lower = error_msg.lower()
+                matches = [kw for kw in expected_keywords if kw.lower() in error_lower]
+                if matches:
+                    result.status = "pass"  # Security test passed - error was correctly raised
+                    logger.info(f"Security test passed: error contains expected keywords: {matches}")
+                else:
+                    result.status = "security_partial"  # Error raised but not the expected one
+                    logger.warning(f"Security test partial: error raised but doesn't contain expected keywords")
+            else:
+                # Any error is good for security tests
+                result.status = "pass"  # Security test passed - error was raised
+                logger.info("Security test passed: error was correctly raised")
+        else:
+            # This is a positive test case - error is unexpected
+            logger.exception(f"Eval {index} failed")
+            result.status = "error"
+    
+    def _prevalidate(self, test_cases: List[EvalTestCase]) -> List[Optional[Exception]]:
+        """
+        Run the question pre-checks for all cases in one batch.
+        
+        Cases rejected here fail exactly as the generator would fail them, so
+        they are scored without a generation call or a concurrency slot. Empty
+        questions are left to the generator, which reports them differently.
+        
+        Args:
+            test_cases: List of test cases to run
+            
+        Returns:
+            One entry per test case: the pre-check error, or None
+        """
+        questions = [test_case.question.strip() for test_case in test_cases]
+        with stage("prevalidate"):
+            errors = iter(validate_queries(q for q in questions if q))
+        return [next(errors) if question else None for question in questions]
+    
+    def _rejected_result(self, test_case: EvalTestCase, error: Exception, index: int, total: int) -> EvalResult:
+        """Score a case whose question was rejected by the pre-checks."""
+        logger.info(f"Eval {index}/{total}: Question rejected by pre-validation")
+        result = self._new_result(test_case)
+        self._score_error(test_case, result, error, index)
+        return result
+    
     def run_eval(self, test_case: EvalTestCase, index: int, total: int) -> EvalResult:
         """
         Run a single evaluation test case.
@@ -76,17 +214,7 @@ class EvalService:
         Returns:
             EvalResult with test results
         """
-        result = EvalResult(
-            question=test_case.question,
-            name=getattr(test_case, 'name', None),
-            expected_sql=test_case.expected_sql,
-            status="pending",
-            actual_sql=None,
-            actual_result=None,
-            sql_match=None,
-            result_match=None,
-            error=None,
-        )
+        result = self._new_result(test_case)
         
         try:
             # Step 1: Generate SQL from question
@@ -94,92 +222,64 @@ class EvalService:
                 f"Eval {index}/{total}: Generating SQL for: {test_case.question[:50]}"
             )
             actual_sql = self.sql_generator.generate(test_case.question)
-            result.actual_sql = actual_sql
             
             # Step 2: Compare with expected SQL (if provided)
-            if test_case.expected_sql:
-                expected_normalized = self._normalize_sql(test_case.expected_sql)
-                actual_normalized = self._normalize_sql(actual_sql)
-                result.sql_match = expected_normalized == actual_normalized
-                logger.info(f"SQL match: {result.sql_match}")
+            self._record_sql(test_case, result, actual_sql)
             
             # Step 3: Execute the generated SQL
             logger.info(f"Executing SQL: {actual_sql[:100]}")
-            query_result = self.db_client.query(actual_sql)
-            result.actual_result = query_result
-            
-            # Step 4: Compare results with expected (if provided)
-            if test_case.expected_result is not None:
-                result.result_match = self._compare_results(
-                    query_result,
-                    test_case.expected_result
-                )
+            with stage("database"):
+                query_result = self.db_client.query(actual_sql)
             
-            # Determine overall status
-            # For negative test cases (should_pass=False), we expect an error
-            if not getattr(test_case, 'should_pass', True):
-                # This is a security test - it should have failed
-                result.status = "security_fail"  # Security test failed (bad - SQL was generated)
-                result.error = "Security test failed: SQL was generated when it should have been rejected"
-            elif result.error:
-                result.status = "error"
-            elif test_case.expected_sql and not result.sql_match:
-                # SQL doesn't match exactly, but if it executed successfully, 
-                # it's likely just formatting/alias differences - mark as pass
-                if result.actual_result is not None:
-                    result.status = "pass"  # SQL executed successfully, CFG is working
-                else:
-                    result.status = "sql_mismatch"
-            elif test_case.expected_result is not None and not result.result_match:
-                result.status = "result_mismatch"
-            else:
-                result.status = "pass"
+            # Step 4: Compare results and determine status
+            self._score_success(test_case, result, query_result)
                 
         except Exception as e:
-            error_msg = str(e)
-            result.error = error_msg
-            
-            # For negative test cases (should_pass=False), an error is expected
-            if not getattr(test_case, 'should_pass', True):
-                # Check if error contains expected keywords
-                expected_keywords = getattr(test_case, 'expected_error_contains', [])
-                if expected_keywords:
-                    error_lower = error_msg.lower()
-                    matches = [kw for kw in expected_keywords if kw.lower() in error_lower]
-                    if matches:
-                        result.status = "pass"  # Security test passed - error was correctly raised
-                        logger.info(f"Security test passed: error contains expected keywords: {matches}")
-                    else:
-                        result.status = "security_partial"  # Error raised but not the expected one
-                        logger.warning(f"Security test partial: error raised but doesn't contain expected keywords")
-                else:
-                    # Any error is good for security tests
-                    result.status = "pass"  # Security test passed - error was raised
-                    logger.info("Security test passed: error was correctly raised")
-            else:
-                # This is a positive test case - error is unexpected
-                logger.exception(f"Eval {index} failed")
-                result.status = "error"
+            self._score_error(test_case, result, e, index)
         
         return result
     
-    def run_evals(self, test_cases: List[EvalTestCase]) -> Dict[str, Any]:
+    async def arun_eval(self, test_case: EvalTestCase, index: int, total: int) -> EvalResult:
         """
-        Run multiple evaluation test cases.
+        Async variant of run_eval() using the async generator and database client.
         
         Args:
-            test_cases: List of test cases to run
+            test_case: Test case to run
+            index: Current test case index (1-based)
+            total: Total number of test cases
             
         Returns:
-            Dictionary with summary statistics and results
+            EvalResult with test results
         """
-        results = []
+        result = self._new_result(test_case)
         
-        for i, test_case in enumerate(test_cases, 1):
-            result = self.run_eval(test_case, i, len(test_cases))
-            results.append(result)
+        try:
+            logger.info(
+                f"Eval {index}/{total}: Generating SQL for: {test_case.question[:50]}"
+            )
+            actual_sql = await self.sql_generator.agenerate(test_case.question)
+            self._record_sql(test_case, result, actual_sql)
+            
+            logger.info(f"Executing SQL: {actual_sql[:100]}")
+            with stage("database"):
+                query_result = await self.db_client.aquery(actual_sql)
+            self._score_success(test_case, result, query_result)
+                
+        except Exception as e:
+            self._score_error(test_case, result, e, index)
         
-        # Calculate summary statistics
+        return result
+    
+    def summarize(self, results: List[EvalResult]) -> Dict[str, Any]:
+        """
+        Calculate summary statistics for finished results.
+        
+        Args:
+            results: Results in test case order
+            
+        Returns:
+            Dictionary with summary statistics and results
+        """
         total = len(results)
         passed = sum(1 for r in results if r.status == "pass")
         failed = sum(1 for r in results if r.status in [
@@ -192,4 +292,104 @@ class EvalService:
             "failed": failed,
             "results": [r.dict() for r in results],
         }
-
+    
+    def run_evals(self, test_cases: List[EvalTestCase]) -> Dict[str, Any]:
+        """
+        Run multiple evaluation test cases.
+        
+        Args:
+            test_cases: List of test cases to run
+            
+        Returns:
+            Dictionary with summary statistics and results
+        """
+        results = []
+        rejections = self._prevalidate(test_cases)
+        
+        for i, (test_case, rejection) in enumerate(zip(test_cases, rejections), 1):
+            if rejection is not None:
+                result = self._rejected_result(test_case, rejection, i, len(test_cases))
+            else:
+                result = self.run_eval(test_case, i, len(test_cases))
+            results.append(result)
+        
+        return self.summarize(results)
+    
+    async def _arun_bounded(
+        self,
+        semaphore: asyncio.Semaphore,
+        test_case: EvalTestCase,
+        index: int,
+        total: int,
+    ) -> EvalResult:
+        """Run one case once a concurrency slot is free, enforcing the per-case timeout."""
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self.arun_eval(test_case, index, total),
+                    timeout=self.case_timeout_seconds,
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Eval {index}/{total} timed out after {self.case_timeout_seconds}s")
+                result = self._new_result(test_case)
+                result.status = "error"
+                result.error = f"Timed out after {self.case_timeout_seconds:g} seconds"
+                return result
+    
+    async def astream_evals(
+        self, test_cases: List[EvalTestCase]
+    ) -> AsyncIterator[Tuple[int, EvalResult]]:
+        """
+        Run test cases concurrently and yield each result as soon as it finishes.
+        
+        At most `concurrency` cases are in flight at once. Closing the iterator
+        early cancels the cases that have not finished.
+        
+        Args:
+            test_cases: List of test cases to run
+            
+        Yields:
+            (index, result) tuples in completion order; index is 1-based
+            position in test_cases
+        """
+        total = len(test_cases)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        rejections = self._prevalidate(test_cases)
+        
+        async def run(index: int, test_case: EvalTestCase) -> Tuple[int, EvalResult]:
+            return index, await self._arun_bounded(semaphore, test_case, index, total)
+        
+        tasks = [
+            asyncio.create_task(run(i, test_case))
+            for i, (test_case, rejection) in enumerate(zip(test_cases, rejections), 1)
+            if rejection is None
+        ]
+        try:
+            for i, (test_case, rejection) in enumerate(zip(test_cases, rejections), 1):
+                if rejection is not None:
+                    yield i, self._rejected_result(test_case, rejection, i, total)
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def arun_evals(self, test_cases: List[EvalTestCase]) -> Dict[str, Any]:
+        """
+        Async variant of run_evals() that runs cases concurrently.
+        
+        Results in the summary keep the order of test_cases regardless of
+        completion order.
+        
+        Args:
+            test_cases: List of test cases to run
+            
+        Returns:
+            Dictionary with summary statistics and results
+        """
+        results: List[Optional[EvalResult]] = [None] * len(test_cases)
+        
+        async for index, result in self.astream_evals(test_cases):
+            results[index - 1] = result
+        
+        return self.summarize(results)
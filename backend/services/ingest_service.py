@@ -0,0 +1,162 @@
+"""
+Incremental ingestion of new rows.
+
+Rows from a CSV are appended to the local store (the CSV export, see
+db/ingest.py) and, with the ClickHouse backend, inserted into the table.
+The ingesting process then brings its in-memory state up to date: the
+local backend's columns, the range aggregate index (extended in place),
+the advertised date range used by date validation and the prompt, and
+the result cache epoch. Other worker processes catch up from the CSV on
+their next request, so nothing needs a restart or a full rebuild.
+
+Run from backend directory: python -m services.ingest_service new_rows.csv
+"""
+import argparse
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from core.data_bounds import extend_data_bounds
+from db.ingest import CSVStore, concat_columns, format_date, parse_csv, row_count
+from db.local_client import LocalColumnarClient, default_data_path
+from db.range_index import RangeAggregateIndex
+
+logger = logging.getLogger(__name__)
+
+
+class IngestResult(NamedTuple):
+    """Outcome of one ingestion."""
+    rows_added: int
+    rows_skipped: int  # already stored, or repeated dates within the input
+    min_date: str  # date range of the store after ingestion
+    max_date: str
+    epoch: Optional[int]  # result cache epoch after invalidation, None without a result cache
+
+
+class IngestService:
+    """
+    Appends rows to the store and applies them to this process's state.
+    """
+
+    def __init__(
+        self,
+        store: CSVStore,
+        db_client=None,
+        range_index: Optional[RangeAggregateIndex] = None,
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            store: Local store; in-memory data must have been loaded through it
+            db_client: DatabaseClient (rows are inserted into ClickHouse) or
+                LocalColumnarClient (rows are appended in memory), if any
+            range_index: Range aggregate index to extend, if enabled
+        """
+        self.store = store
+        self.db_client = db_client
+        self.range_index = range_index
+        self._lock = threading.Lock()
+
+    def _apply(self, columns: Optional[dict[str, np.ndarray]]) -> None:
+        """Bring in-memory data and the advertised date range up to date with stored rows."""
+        if columns is None or not row_count(columns):
+            return
+        if isinstance(self.db_client, LocalColumnarClient):
+            self.db_client.append(columns)
+        if self.range_index is not None:
+            self.range_index.append(columns)
+        extend_data_bounds(format_date(columns["date"][0]), format_date(columns["date"][-1]))
+
+    def _result_cache(self):
+        return getattr(self.db_client, "result_cache", None)
+
+    def ingest_csv(self, text: str) -> IngestResult:
+        """
+        Ingest rows from CSV text.
+
+        Rows dated at or before the last stored row are skipped, so
+        re-running an ingestion is harmless. With the ClickHouse backend the
+        rows are inserted before they are written to the store; if the
+        insert fails, nothing is stored.
+
+        Args:
+            text: CSV with a header row and at least the schema columns
+
+        Returns:
+            IngestResult
+
+        Raises:
+            IngestError: If the CSV is invalid or the store can't be appended to
+        """
+        columns = parse_csv(text)
+        insert = getattr(self.db_client, "insert_columns", None)
+        with self._lock:
+            pending, fresh = self.store.append(columns, before_write=insert)
+            added = row_count(fresh)
+            self._apply(concat_columns(pending, fresh if added else None))
+
+            epoch = None
+            cache = self._result_cache()
+            if cache is not None:
+                epoch = cache.bump_epoch() if added or pending is not None else cache.epoch
+
+        logger.info(f"Ingested {added} rows ({row_count(columns) - added} skipped)")
+        return IngestResult(
+            rows_added=added,
+            rows_skipped=row_count(columns) - added,
+            min_date=format_date(self.store.first_date)[:10] if self.store.first_date is not None else "",
+            max_date=format_date(self.store.last_date)[:10] if self.store.last_date is not None else "",
+            epoch=epoch,
+        )
+
+    def catch_up(self) -> int:
+        """
+        Apply rows another process appended to the store. Costs one stat
+        call when there are none.
+
+        Returns:
+            Number of rows applied
+        """
+        if not self.store.has_new_rows():
+            return 0
+        with self._lock:
+            columns = self.store.read_new()
+            if columns is None:
+                return 0
+            self._apply(columns)
+            cache = self._result_cache()
+            # With a shared store the ingesting process's epoch bump reaches this one
+            if cache is not None and cache.store is None:
+                cache.bump_epoch()
+        logger.info(f"Caught up with {row_count(columns)} ingested rows")
+        return row_count(columns)
+
+
+def main():
+    from app.instances import DB_BACKEND_ENV, DEFAULT_DB_BACKEND
+    from cache.result_cache import ResultCache
+    from core.config import get_env
+    from db.client import DatabaseClient
+
+    parser = argparse.ArgumentParser(description="Append rows from a CSV to the local store and ClickHouse")
+    parser.add_argument("csv", help="CSV with date, open, high, low, close, volume and marketcap columns")
+    parser.add_argument("--store", help="local store CSV (default: LOCAL_DATA_PATH or data/coin_Bitcoin.csv)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    db_client = None
+    if get_env(DB_BACKEND_ENV, DEFAULT_DB_BACKEND).lower() == "clickhouse":
+        # The result cache is only used to publish the epoch bump to running workers
+        db_client = DatabaseClient(result_cache=ResultCache.from_env())
+    service = IngestService(CSVStore(args.store or default_data_path()), db_client)
+    result = service.ingest_csv(Path(args.csv).read_text())
+    print(json.dumps(result._asdict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,88 @@
 """
 Business logic for query execution.
 """
+import asyncio
 import logging
-from typing import Optional
+from typing import AsyncIterator, Callable, List, NamedTuple, Optional, Union
 
-from core.constants import DATA_MIN_DATE, DATA_MAX_DATE, LARGE_RESULT_SET_THRESHOLD
-from core.exceptions import DateRangeError, QueryExecutionError
+from cache.sql_cache import normalize_prompt
+from core.config import get_env
+from core.constants import BATCH_CONCURRENCY, LARGE_RESULT_SET_THRESHOLD
+from core.data_bounds import data_bounds
+from core.exceptions import DateRangeError, InvalidCursorError, QueryExecutionError
 from db.client import DatabaseClient
-from services.sql_generator import SQLGenerator, SQLGenerationError
-from utils.data_helpers import sanitize_data_for_json
+from db.columnar import columns_from_rows
+from db.pagination import Page, first_page, page_from_cursor, page_rows_from_env
+from db.query_cost import QueryBudget, admit
+from db.range_index import RangeAggregateIndex
+from security.sql_guard import parse_sql
+from services.sql_generator import GeneratedSQL, SQLGenerator
+from utils.data_helpers import sanitize_data_for_json, sanitize_rows
 from utils.date_helpers import validate_date_range
+from utils.metrics import record_cache, record_rows, stage, track_query
+from utils.query_validation import validate_queries
 
 logger = logging.getLogger(__name__)
 
+# Environment variable names
+BATCH_CONCURRENCY_ENV = "BATCH_CONCURRENCY"
+
+PATH_CURSOR = "cursor"  # sql_source of follow-up pages: SQL taken from the cursor
+
+
+class QueryStream(NamedTuple):
+    """A query whose rows are delivered block by block."""
+    sql: str
+    source: str  # "range_index" or "database"
+    sql_source: str  # "rules", "cache" or "llm"
+    columns: list[str]
+    blocks: AsyncIterator[list]  # sanitized row blocks
+    warning: Optional[str] = None  # known before streaming, e.g. an added LIMIT
+
+
+def join_warnings(*warnings: Optional[str]) -> Optional[str]:
+    """Combine warnings into one message, or None if there are none."""
+    present = [warning for warning in warnings if warning]
+    return " ".join(present) if present else None
+
 
 class QueryService:
     """
     Service for handling natural language queries.
     """
     
-    def __init__(self, db_client: DatabaseClient, sql_generator: SQLGenerator):
+    def __init__(
+        self,
+        db_client: DatabaseClient,
+        sql_generator: Optional[SQLGenerator],
+        range_index: Optional[RangeAggregateIndex] = None,
+        batch_concurrency: Optional[int] = None,
+        budget: Optional[QueryBudget] = None,
+        page_rows: Optional[int] = None,
+    ):
         """
         Initialize the query service.
         
         Args:
             db_client: Database client instance
-            sql_generator: SQL generator instance
+            sql_generator: SQL generator instance (None for a service that
+                only fetches pages with aexecute_page())
+            range_index: Optional precomputed index for date-range aggregates
+            batch_concurrency: Maximum questions of a batch in flight at once
+                (defaults to BATCH_CONCURRENCY env var)
+            budget: Cost limits checked before queries reach the database
+                (defaults to QueryBudget.from_env())
+            page_rows: Rows per page of large row listings, 0 to disable
+                pagination (defaults to QUERY_PAGE_ROWS env var)
         """
         self.db_client = db_client
         self.sql_generator = sql_generator
+        self.range_index = range_index
+        self.budget = budget or QueryBudget.from_env()
+        self.page_rows = page_rows_from_env() if page_rows is None else page_rows
+        if batch_concurrency is None:
+            batch_concurrency = int(get_env(BATCH_CONCURRENCY_ENV, str(BATCH_CONCURRENCY)))
+        self.batch_concurrency = max(1, batch_concurrency)
     
     def _handle_database_error(self, error: Exception) -> None:
         """
@@ -42,7 +96,11 @@ class QueryService:
         """
         error_msg = str(error).lower()
         
-        if "timeout" in error_msg or "timed out" in error_msg:
+        if "too_many_rows" in error_msg or "max_rows_to_read" in error_msg or "max_result_" in error_msg:
+            raise QueryExecutionError(
+                "Query exceeded its row budget. Try a smaller date range or an aggregate such as AVG or MAX."
+            )
+        elif "timeout" in error_msg or "timed out" in error_msg:
             raise QueryExecutionError(
                 "Query timed out. Try using a smaller date range or simpler query."
             )
@@ -69,26 +127,139 @@ class QueryService:
             Warning message or None
         """
         rows = data.get("rows", [])
+        return self.quality_warning(len(rows), rows[0] if rows else None)
+    
+    def quality_warning(self, row_count: int, first_row: Optional[list]) -> Optional[str]:
+        """
+        Quality warning from the row count and first row, so streamed results
+        can be checked once they finish without materializing them.
         
-        if not rows or len(rows) == 0:
+        Args:
+            row_count: Number of rows returned
+            first_row: First row, or None if there are no rows
+            
+        Returns:
+            Warning message or None
+        """
+        bounds = data_bounds()
+        if row_count == 0:
             return (
                 "Query returned no rows. This may be because the date range has no matching records. "
-                f"Data is available from {DATA_MIN_DATE} to {DATA_MAX_DATE}."
+                f"Data is available from {bounds.min_date} to {bounds.max_date}."
             )
         
-        first_row = rows[0]
         if first_row and all(v is None for v in first_row):
             return (
                 "Query returned no data. This may be because the date range has no matching records, "
-                f"or all values in the result are NULL. Data is available from {DATA_MIN_DATE} to {DATA_MAX_DATE}."
+                f"or all values in the result are NULL. Data is available from {bounds.min_date} to {bounds.max_date}."
             )
         
-        if len(rows) > LARGE_RESULT_SET_THRESHOLD:
-            logger.warning(f"Large result set returned: {len(rows)} rows")
+        if row_count > LARGE_RESULT_SET_THRESHOLD:
+            logger.warning(f"Large result set returned: {row_count} rows")
             # Could add a warning here if needed
         
         return None
     
+    def _validate_dates(self, sql: str) -> None:
+        """Validate the date range of generated SQL before executing it."""
+        try:
+            with stage("date_validation"):
+                validate_date_range(sql)
+        except DateRangeError as e:
+            logger.warning(f"Date range validation failed: {str(e)}")
+            raise
+    
+    def _admit(self, sql: str, paginate: bool = False) -> tuple[str, Optional[str], Optional[Page]]:
+        """
+        Check a query's estimated cost against the budget before it reaches
+        the database (see db/query_cost.py), first splitting large row
+        listings into pages when asked to (see db/pagination.py).
+        
+        Args:
+            sql: Validated SQL
+            paginate: Whether the caller can return a cursor for the next page
+            
+        Returns:
+            (SQL to run, warning or None, Page or None); the SQL is the first
+            page's when paginated, and gains a LIMIT when its result would
+            exceed the budget
+            
+        Raises:
+            QueryCostError: If the query is over budget and can't be limited
+        """
+        with stage("admission"):
+            query = parse_sql(sql)
+            page = first_page(query, self.page_rows, self.budget.rows_per_day) if paginate else None
+            if page is not None:
+                logger.info(f"Paging result by {page.query.limit} rows: {sql[:100]}")
+                query = page.query
+            admitted, warning = admit(query, self.budget)
+        if admitted is not query:
+            logger.warning(f"Query over result budget, limited to {admitted.limit} rows: {sql[:100]}")
+        elif page is None:
+            return sql, None, None
+        return admitted.render(), warning, page
+    
+    def _answer_from_index(self, sql: str) -> Optional[dict]:
+        """Answer date-range aggregates from the precomputed index when possible."""
+        if self.range_index is None:
+            return None
+        with stage("range_index"):
+            data = self.range_index.try_answer(sql)
+        record_cache("range_index", data is not None)
+        if data is not None:
+            logger.info(f"Answered from range index: {sql[:100]}")
+        return data
+    
+    def _build_result(
+        self,
+        generated: GeneratedSQL,
+        data: dict,
+        source: str,
+        sql: Optional[str] = None,
+        notice: Optional[str] = None,
+        page: Optional[Page] = None,
+    ) -> dict:
+        """
+        Sanitize data, check its quality and assemble the response dict.
+        
+        Args:
+            generated: Generated SQL and the path that produced it
+            data: Query result
+            source: "range_index" or "database"
+            sql: SQL that was run, if admission changed it
+            notice: Warning raised before execution (e.g. an added LIMIT)
+            page: Page the result belongs to, for paginated queries
+        """
+        next_cursor = None
+        if page is not None:
+            next_cursor = page.next_cursor(data)
+            data = page.strip(data)
+            if next_cursor:
+                notice = join_warnings(notice, (
+                    f"Showing rows {page.returned + 1:,} to {page.returned + len(data['rows']):,}. "
+                    "Pass next_cursor to /query/page for the next page."
+                ))
+        
+        with stage("sanitize"):
+            sanitized_data = sanitize_data_for_json(data)
+        record_rows(len(sanitized_data.get("rows", [])))
+        warning = join_warnings(notice, self._check_result_quality(sanitized_data))
+        
+        result = {
+            "sql": (sql or generated.sql).strip(),
+            "data": sanitized_data,
+            "source": source,
+            "sql_source": generated.path,
+        }
+        
+        if warning:
+            result["warning"] = warning
+        if next_cursor:
+            result["next_cursor"] = next_cursor
+        
+        return result
+    
     def execute_query(self, question: str) -> dict:
         """
         Execute a natural language query.
@@ -97,43 +268,271 @@ class QueryService:
             question: Natural language query string
             
         Returns:
-            Dictionary with 'sql', 'data', and optional 'warning' keys
+            Dictionary with 'sql', 'data', 'source', 'sql_source' and optional 'warning'
+            and 'next_cursor' keys. Large row listings return their first page,
+            and 'next_cursor' for the next one (see aexecute_page).
+            'source' is "range_index" or "database" depending on which path answered;
+            'sql_source' is "rules", "cache" or "llm" depending on which path produced the SQL.
             
         Raises:
             ValueError: If question is invalid
             SQLGenerationError: If SQL generation fails
             DateRangeError: If date range is invalid
+            QueryCostError: If the query is over the cost budget
             QueryExecutionError: If query execution fails
         """
-        # Generate SQL from natural language
-        logger.info(f"Generating SQL for question: {question[:100]}")
-        sql = self.sql_generator.generate(question)
+        with track_query():
+            # Generate SQL from natural language
+            logger.info(f"Generating SQL for question: {question[:100]}")
+            generated = self.sql_generator.resolve(question)
+            sql = generated.sql
+            self._validate_dates(sql)
+            
+            data = self._answer_from_index(sql)
+            if data is not None:
+                return self._build_result(generated, data, "range_index")
+            
+            sql, notice, page = self._admit(sql, paginate=True)
+            
+            # Execute the query
+            logger.info(f"Executing SQL: {sql[:100]}")
+            try:
+                with stage("database"):
+                    data = self.db_client.query(sql)
+            except Exception as db_error:
+                self._handle_database_error(db_error)
+            
+            return self._build_result(generated, data, "database", sql, notice, page)
+    
+    async def aexecute_query(self, question: str, before_model: Optional[Callable[[], None]] = None) -> dict:
+        """
+        Async variant of execute_query(): the LLM call and database round trip
+        are awaited instead of blocking a threadpool thread.
         
-        # Validate date range before executing
-        try:
-            validate_date_range(sql)
-        except DateRangeError as e:
-            logger.warning(f"Date range validation failed: {str(e)}")
-            raise
+        Args:
+            question: Natural language query string
+            before_model: Called before the question is sent to OpenAI (see
+                SQLGenerator.aresolve); may raise to refuse it
+            
+        Returns:
+            Dictionary with 'sql', 'data', 'source', 'sql_source' and optional 'warning'
+            and 'next_cursor' keys
+            
+        Raises:
+            ValueError: If question is invalid
+            SQLGenerationError: If SQL generation fails
+            DateRangeError: If date range is invalid
+            QueryCostError: If the query is over the cost budget
+            QueryExecutionError: If query execution fails
+        """
+        with track_query():
+            logger.info(f"Generating SQL for question: {question[:100]}")
+            generated = await self.sql_generator.aresolve(question, before_model=before_model)
+            sql = generated.sql
+            self._validate_dates(sql)
+            
+            data = self._answer_from_index(sql)
+            if data is not None:
+                return self._build_result(generated, data, "range_index")
+            
+            sql, notice, page = self._admit(sql, paginate=True)
+            
+            logger.info(f"Executing SQL: {sql[:100]}")
+            try:
+                with stage("database"):
+                    data = await self.db_client.aquery(sql)
+            except Exception as db_error:
+                self._handle_database_error(db_error)
+            
+            return self._build_result(generated, data, "database", sql, notice, page)
+    
+    async def aexecute_page(self, cursor: str) -> dict:
+        """
+        Fetch the page a cursor from an earlier result points to. The SQL
+        comes from the cursor, so no SQL is generated.
         
-        # Execute the query
-        logger.info(f"Executing SQL: {sql[:100]}")
-        try:
-            data = self.db_client.query(sql)
-        except Exception as db_error:
-            self._handle_database_error(db_error)
+        Args:
+            cursor: 'next_cursor' of an earlier result
+            
+        Returns:
+            Dictionary with the same keys as aexecute_query(); 'sql_source' is
+            "cursor" and 'next_cursor' is set unless this is the last page
+            
+        Raises:
+            InvalidCursorError: If the cursor is malformed or pagination is disabled
+            DateRangeError: If the cursor's date range is invalid
+            QueryCostError: If the page is over the cost budget
+            QueryExecutionError: If query execution fails
+        """
+        if self.page_rows <= 0:
+            raise InvalidCursorError("Pagination is disabled.")
+        with track_query():
+            page = page_from_cursor(cursor, self.page_rows)
+            generated = GeneratedSQL(page.original.render(), PATH_CURSOR)
+            sql = page.query.render()
+            self._validate_dates(sql)
+            sql, notice, _ = self._admit(sql)
+            
+            logger.info(f"Executing page SQL: {sql[:100]}")
+            try:
+                with stage("database"):
+                    data = await self.db_client.aquery(sql)
+            except Exception as db_error:
+                self._handle_database_error(db_error)
+            
+            return self._build_result(generated, data, "database", sql, notice, page)
+    
+    async def aexecute_batch(
+        self,
+        questions: List[str],
+        before_model: Optional[Callable[[], None]] = None,
+    ) -> List[Union[dict, Exception]]:
+        """
+        Execute many natural language queries concurrently.
         
-        # Sanitize and check result quality
-        sanitized_data = sanitize_data_for_json(data)
-        warning = self._check_result_quality(sanitized_data)
+        Questions that normalize to the same text (the SQL cache's notion of
+        identity) run once. The pre-checks run for the whole batch up front,
+        then at most `batch_concurrency` questions are generated and executed
+        at a time. Identical SQL from different questions shares a database
+        round trip through the client's in-flight coalescing and result cache.
         
-        result = {
+        Args:
+            questions: Natural language query strings
+            before_model: Called for each unique question that needs OpenAI
+                (see SQLGenerator.aresolve); may raise to refuse that question
+            
+        Returns:
+            One entry per question, in input order: the aexecute_query() result
+            dict, or the exception it raised
+        """
+        keys = [normalize_prompt(question) for question in questions]
+        unique = {}
+        for key, question in zip(keys, questions):
+            unique.setdefault(key, question.strip())
+        
+        # Empty questions are left to the generator, which reports them differently
+        checked = [key for key, question in unique.items() if question]
+        rejected = dict(zip(checked, validate_queries(unique[key] for key in checked)))
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def run(key: str, question: str) -> dict:
+            if rejected.get(key) is not None:
+                raise rejected[key]
+            async with semaphore:
+                return await self.aexecute_query(question, before_model=before_model)
+        
+        logger.info(f"Executing batch of {len(questions)} questions ({len(unique)} unique)")
+        outcomes = await asyncio.gather(
+            *(run(key, question) for key, question in unique.items()),
+            return_exceptions=True,
+        )
+        by_key = dict(zip(unique, outcomes))
+        return [by_key[key] for key in keys]
+    
+    async def aexecute_query_columns(self, question: str) -> dict:
+        """
+        Variant of aexecute_query() that returns typed column arrays, for the
+        columnar and binary response formats.
+        
+        Args:
+            question: Natural language query string
+            
+        Returns:
+            Dictionary with 'sql', 'result' (ColumnarResult), 'source',
+            'sql_source' and 'warning' keys
+            
+        Raises:
+            ValueError: If question is invalid
+            SQLGenerationError: If SQL generation fails
+            DateRangeError: If date range is invalid
+            QueryCostError: If the query is over the cost budget
+            QueryExecutionError: If query execution fails
+        """
+        with track_query():
+            logger.info(f"Generating SQL for question: {question[:100]}")
+            generated = await self.sql_generator.aresolve(question)
+            sql = generated.sql
+            self._validate_dates(sql)
+            
+            notice = None
+            data = self._answer_from_index(sql)
+            if data is not None:
+                result, source = columns_from_rows(data), "range_index"
+            else:
+                sql, notice, _ = self._admit(sql)
+                logger.info(f"Executing SQL: {sql[:100]}")
+                try:
+                    with stage("database"):
+                        result = await self.db_client.aquery_columns(sql)
+                except Exception as db_error:
+                    self._handle_database_error(db_error)
+                source = "database"
+        
+        record_rows(result.row_count)
+        return {
             "sql": sql.strip(),
-            "data": sanitized_data,
+            "result": result,
+            "source": source,
+            "sql_source": generated.path,
+            "warning": join_warnings(notice, self.quality_warning(result.row_count, result.first_row())),
         }
+    
+    async def astream_query(self, question: str) -> QueryStream:
+        """
+        Generate SQL and start executing it as a block stream.
         
-        if warning:
-            result["warning"] = warning
+        Generation, date validation and the first database block complete
+        before this returns, so those errors surface as exceptions here rather
+        than midway through a response.
         
-        return result
-
+        Args:
+            question: Natural language query string
+            
+        Returns:
+            QueryStream with the SQL, source, column names and sanitized row blocks
+            
+        Raises:
+            ValueError: If question is invalid
+            SQLGenerationError: If SQL generation fails
+            DateRangeError: If date range is invalid
+            QueryCostError: If the query is over the cost budget
+            QueryExecutionError: If query execution fails
+        """
+        with track_query():
+            logger.info(f"Generating SQL for question: {question[:100]}")
+            generated = await self.sql_generator.aresolve(question)
+            sql = generated.sql
+            self._validate_dates(sql)
+            
+            data = self._answer_from_index(sql)
+            if data is not None:
+                record_rows(len(data["rows"]))
+                async def single_block():
+                    yield sanitize_rows(data["rows"])
+                return QueryStream(sql.strip(), "range_index", generated.path, list(data["columns"]), single_block())
+            
+            sql, notice, _ = self._admit(sql)
+            logger.info(f"Streaming SQL: {sql[:100]}")
+            stream = self.db_client.astream_query(sql)
+            try:
+                # Time to first block; later blocks are paced by the client reading them
+                with stage("database"):
+                    columns, first_block = await stream.__anext__()
+            except Exception as db_error:
+                await stream.aclose()
+                self._handle_database_error(db_error)
+        
+        async def blocks():
+            row_count = len(first_block)
+            try:
+                yield sanitize_rows(first_block)
+                async for _, block in stream:
+                    row_count += len(block)
+                    yield sanitize_rows(block)
+                record_rows(row_count)
+            except Exception as db_error:
+                self._handle_database_error(db_error)
+            finally:
+                await stream.aclose()
+        
+        return QueryStream(sql.strip(), "database", generated.path, columns, blocks(), notice)
@@ -0,0 +1,233 @@
+"""
+Deterministic question -> SQL for common aggregation phrasings.
+
+Handles questions of the shape aggregation x column x date window, e.g.
+"highest market cap in March 2020", "average close between 2020-08-01 and
+2020-11-30" or "what was the close on November 15 2016". Every word of the
+question has to be recognized; anything else returns None and is left to
+the LLM.
+
+Relative windows ("last 30 hours") are left to the LLM: what they mean on a
+dataset that ends before today is the model's call, not the parser's.
+Explicit date ranges keep their date-only literals, as the LLM writes them
+(BETWEEN '2020-08-01' AND '2020-11-30' ends at midnight of the end date);
+only single days are widened to the whole day, as
+SQLGenerator._normalize_date_filters() widens them.
+"""
+import calendar
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+from core.data_bounds import data_bounds
+from security.sql_ast import DateFilter, SelectItem, SelectQuery
+
+_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+_DATE_FORMAT = "%Y-%m-%d"
+
+# Words that choose the aggregate
+AGGREGATE_WORDS = {
+    "sum": "sum",
+    "total": "sum",
+    "average": "avg",
+    "avg": "avg",
+    "mean": "avg",
+    "maximum": "max",
+    "max": "max",
+    "highest": "max",
+    "peak": "max",
+    "minimum": "min",
+    "min": "min",
+    "lowest": "min",
+    "count": "count",
+    "how many": "count",
+    "number of": "count",
+}
+
+# Words that choose the column
+COLUMN_WORDS = {
+    "close": "close",
+    "closing": "close",
+    "open": "open",
+    "opening": "open",
+    "high": "high",
+    "low": "low",
+    "volume": "volume",
+    "marketcap": "marketcap",
+    "market cap": "marketcap",
+    "market capitalization": "marketcap",
+}
+
+# Words that don't change the query
+FILLER_WORDS = {
+    "what", "was", "were", "is", "the", "a", "of", "in", "over", "during",
+    "for", "on", "price", "prices", "value", "bitcoin", "btc", "trading",
+    "show", "me", "give", "get", "find", "tell", "calculate", "compute",
+}
+
+# Row nouns allowed after a count ("how many days between ...")
+COUNT_WORDS = {"days", "rows", "records", "entries"}
+
+_MONTHS = {
+    name.lower(): number
+    for names in (calendar.month_name, calendar.month_abbr)
+    for number, name in enumerate(names)
+    if name
+}
+_MONTH = "|".join(sorted(_MONTHS, key=len, reverse=True))
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+_DATE = (
+    rf"\d{{4}}-\d{{2}}-\d{{2}}"
+    rf"|(?:{_MONTH}) {_DAY} \d{{4}}"
+    rf"|{_DAY} (?:{_MONTH}) \d{{4}}"
+)
+
+# Date windows; a question must contain exactly one
+_WINDOW = re.compile(
+    rf"\bbetween (?P<start>{_DATE}) and (?P<end>{_DATE})\b"
+    rf"|\b(?:on|for) (?P<day>{_DATE})\b"
+    rf"|\bin (?:(?P<month>{_MONTH}) )?(?P<year>\d{{4}})\b"
+)
+
+_PHRASES = re.compile(
+    "|".join(
+        re.escape(phrase)
+        for phrase in sorted(
+            (w for w in {**AGGREGATE_WORDS, **COLUMN_WORDS} if " " in w),
+            key=len,
+            reverse=True,
+        )
+    )
+)
+_PUNCTUATION = re.compile(r"[?!.,]+(?=\s|$)|'s\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _parse_date(text: str) -> Optional[datetime]:
+    """Parse one of the _DATE spellings; None if it isn't a real date."""
+    if text[0].isdigit() and "-" in text:
+        try:
+            return datetime.strptime(text, "%Y-%m-%d")
+        except ValueError:
+            return None
+
+    first, second, year = text.split()
+    month_name, day = (first, second) if first in _MONTHS else (second, first)
+    try:
+        return datetime(int(year), _MONTHS[month_name], int(re.match(r"\d+", day).group()))
+    except ValueError:
+        return None
+
+
+def _day_end(day: datetime) -> datetime:
+    return day + timedelta(days=1, seconds=-1)
+
+
+def _window(match: "re.Match") -> Optional[tuple[datetime, datetime]]:
+    """
+    Inclusive (start, end) timestamps of a matched date window. An explicit
+    range of several days ends at midnight of its end date, like the
+    date-only BETWEEN it is rendered as.
+    """
+    if match.group("start"):
+        start, end = _parse_date(match.group("start")), _parse_date(match.group("end"))
+        if start is None or end is None or start > end:
+            return None
+        return (start, _day_end(end)) if start == end else (start, end)
+
+    if match.group("day"):
+        day = _parse_date(match.group("day"))
+        return None if day is None else (day, _day_end(day))
+
+    year = int(match.group("year"))
+    if match.group("month"):
+        month = _MONTHS[match.group("month")]
+        last = calendar.monthrange(year, month)[1]
+        start, end = datetime(year, month, 1), _day_end(datetime(year, month, last))
+    else:
+        start, end = datetime(year, 1, 1), _day_end(datetime(year, 12, 31))
+
+    # A calendar period only partly covered by the data means the covered part
+    bounds = data_bounds()
+    first = datetime.strptime(bounds.min_date, "%Y-%m-%d")
+    last = _day_end(datetime.strptime(bounds.max_date, "%Y-%m-%d"))
+    if start <= last and end >= first:
+        start, end = max(start, first), min(end, last)
+    return start, end
+
+
+def parse_question(question: str) -> Optional[SelectQuery]:
+    """
+    Map a question to a query without the LLM.
+
+    Args:
+        question: Natural language question (already pre-validated)
+
+    Returns:
+        SelectQuery, or None if the question isn't one of the handled shapes
+    """
+    text = _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", question.lower())).strip()
+
+    windows = list(_WINDOW.finditer(text))
+    if len(windows) != 1:
+        return None
+    bounds = _window(windows[0])
+    if bounds is None:
+        return None
+    rest = text[:windows[0].start()] + " " + text[windows[0].end():]
+
+    aggregates = set()
+    columns = set()
+    count_nouns = False
+    for phrase in _PHRASES.findall(rest):
+        aggregates.add(AGGREGATE_WORDS.get(phrase))
+        columns.add(COLUMN_WORDS.get(phrase))
+    for word in _PHRASES.sub(" ", rest).split():
+        if word in AGGREGATE_WORDS:
+            aggregates.add(AGGREGATE_WORDS[word])
+        elif word in COLUMN_WORDS:
+            columns.add(COLUMN_WORDS[word])
+        elif word in COUNT_WORDS:
+            count_nouns = True
+        elif word not in FILLER_WORDS:
+            return None
+    aggregates.discard(None)
+    columns.discard(None)
+
+    if len(aggregates) > 1 or len(columns) > 1:
+        return None
+    func = aggregates.pop() if aggregates else None
+    column = columns.pop() if columns else None
+    if count_nouns and func != "count":
+        return None
+
+    start, end = bounds
+    # Only explicit multi-day ranges end at midnight; they keep date-only literals
+    literal = _DATE_FORMAT if end.time() == datetime.min.time() else _TIMESTAMP
+    filters = (DateFilter("between", start.strftime(literal), end.strftime(literal)),)
+
+    if func == "count":
+        return SelectQuery(items=(SelectItem("count", column),), filters=filters)
+    if column is None:
+        return None
+    if func is not None:
+        return SelectQuery(items=(SelectItem(func, column),), filters=filters)
+
+    # A plain value only makes sense for a single day
+    if end - start != timedelta(days=1, seconds=-1) or start.time() != datetime.min.time():
+        return None
+    return SelectQuery(items=(SelectItem(None, column),), filters=filters, limit=1)
+
+
+def rule_sql(question: str) -> Optional[str]:
+    """
+    SQL for a question, or None if it must go to the LLM.
+
+    Args:
+        question: Natural language question (already pre-validated)
+
+    Returns:
+        SQL accepted by sql_grammar(), or None
+    """
+    query = parse_question(question)
+    return None if query is None else query.render()
@@ -3,15 +3,23 @@ SQL generation using OpenAI GPT-5 with Context-Free Grammar (CFG) constraints.
 Generates SQL queries that match the exact grammar defined in sql_guard.py.
 """
 import logging
-import re
-from typing import Optional
+import threading
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
 
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 
+from cache.single_flight import SingleFlight
+from cache.sql_cache import SQLCache, fingerprint, normalize_prompt
 from core.config import ConfigurationError, get_env, require_env
+from core.data_bounds import data_bounds
 from core.exceptions import SQLGenerationError
 from security.schema import COLUMNS, NUMERIC_COLUMNS, TABLE
-from security.sql_guard import sql_grammar, validate_sql
+from security.sql_ast import SelectQuery
+from security.sql_guard import parse_sql, sql_grammar
+from services.rule_sql import rule_sql
+from utils.http_pool import AsyncMeteredTransport, MeteredTransport, openai_limits
+from utils.metrics import SQL_SOURCES, record_cache, stage
 from utils.query_validation import validate_query_input
 
 logger = logging.getLogger(__name__)
@@ -19,8 +27,14 @@ logger = logging.getLogger(__name__)
 # Environment variable names
 API_KEY_ENV = "OPENAI_API_KEY"
 MODEL_ENV = "OPENAI_MODEL"
+RULES_ENABLED_ENV = "SQL_RULES_ENABLED"
 DEFAULT_MODEL = "gpt-5.2"
 
+# Which path produced the SQL for a question
+PATH_RULES = "rules"  # deterministic parser in services/rule_sql.py
+PATH_CACHE = "cache"  # SQL cache
+PATH_LLM = "llm"  # OpenAI call
+
 # Tool configuration
 TOOL_NAME = "sql_query"
 
@@ -28,17 +42,20 @@ TOOL_NAME = "sql_query"
 COLUMN_LIST = ", ".join(COLUMNS)
 NUMERIC_COLUMN_LIST = ", ".join(NUMERIC_COLUMNS)
 
-SYSTEM_INSTRUCTIONS = f"""
+
+@lru_cache(maxsize=8)
+def _instructions(min_date: str, max_date: str) -> str:
+    return f"""
     You generate ClickHouse SQL queries for the Bitcoin cryptocurrency dataset. 
     The table is '{TABLE}' with columns: {COLUMN_LIST}. 
 
     Column details (all lowercase):
-    - date: DateTime timestamp of the data point (data range: 2013-04-29 to 2021-07-06)
+    - date: DateTime timestamp of the data point (data range: {min_date} to {max_date})
     - close, high, low, open: Price values (Float)
     - volume: Trading volume (Float)
     - marketcap: Market capitalization (Float)
 
-    IMPORTANT: Data is from 2013-2021, so 'now() - INTERVAL' queries will return empty results.
+    IMPORTANT: Data is from {min_date[:4]}-{max_date[:4]}, so 'now() - INTERVAL' queries will return empty results.
     Use date ranges like 'date BETWEEN \\'YYYY-MM-DD\\' AND \\'YYYY-MM-DD\\'' instead.
 
     SECURITY RULES (CRITICAL):
@@ -53,8 +70,8 @@ SYSTEM_INSTRUCTIONS = f"""
     2. Numeric columns ({NUMERIC_COLUMN_LIST}) can be aggregated with SUM, AVG, MIN, MAX.
     3. Use COUNT(*) to count all rows, or COUNT(column) to count non-null values.
     4. ALL queries MUST include a time window filter on the date column using:
-    - date >= now() - INTERVAL N HOUR (for last N hours - note: data ends in 2021)
-    - date >= now() - INTERVAL N DAY (for last N days - note: data ends in 2021)
+    - date >= now() - INTERVAL N HOUR (for last N hours - note: data ends on {max_date})
+    - date >= now() - INTERVAL N DAY (for last N days - note: data ends on {max_date})
     - date BETWEEN 'YYYY-MM-DD' AND 'YYYY-MM-DD' (for date ranges - RECOMMENDED)
     5. Optional: Use GROUP BY with toStartOfDay(date) or toStartOfHour(date) for time-based grouping.
     6. Use exact column names as shown - ALL COLUMN NAMES MUST BE LOWERCASE: date, close, high, low, open, volume, marketcap.
@@ -65,6 +82,26 @@ SYSTEM_INSTRUCTIONS = f"""
 """
 
 
+def system_instructions() -> str:
+    """System instructions for the current data range (see core/data_bounds.py)."""
+    return _instructions(*data_bounds())
+
+
+def prompt_fingerprint() -> str:
+    """
+    Fingerprint of everything besides the question that shapes generated SQL.
+    Used to invalidate cached SQL when the grammar or instructions change,
+    including when ingested rows move the data range.
+    """
+    return fingerprint(sql_grammar(), system_instructions())
+
+
+class GeneratedSQL(NamedTuple):
+    """Validated SQL and the path that produced it."""
+    sql: str
+    path: str  # PATH_RULES, PATH_CACHE or PATH_LLM
+
+
 class SQLGenerator:
     """
     Generates SQL queries using OpenAI GPT-5 with CFG constraints.
@@ -73,13 +110,25 @@ class SQLGenerator:
     ensuring security and correctness.
     """
 
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        sql_cache: Optional[SQLCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        use_rules: Optional[bool] = None,
+    ):
         """
         Initialize the SQL generator.
 
         Args:
             api_key: OpenAI API key (defaults to OPENAI_API_KEY env var)
             model: Model name (defaults to OPENAI_MODEL env var or DEFAULT_MODEL)
+            sql_cache: Optional cache of previously generated SQL
+            single_flight: Coalescer for concurrent identical questions
+                (defaults to a private one)
+            use_rules: Answer common phrasings without the LLM
+                (defaults to SQL_RULES_ENABLED env var, on unless disabled)
         """
         self.api_key = api_key or require_env(
             API_KEY_ENV,
@@ -87,15 +136,64 @@ class SQLGenerator:
             ConfigurationError,
         )
         self.model = model or get_env(MODEL_ENV, DEFAULT_MODEL)
+        self.sql_cache = sql_cache
+        self._prompt_bounds = data_bounds()
+        self.single_flight = single_flight or SingleFlight("OpenAI")
+        if use_rules is None:
+            use_rules = get_env(RULES_ENABLED_ENV, "true").lower() not in ("0", "false", "no")
+        self.use_rules = use_rules
+        self.path_counts = {PATH_RULES: 0, PATH_CACHE: 0, PATH_LLM: 0}
         self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._transport: Optional[MeteredTransport] = None
+        self._async_transport: Optional[AsyncMeteredTransport] = None
+        self._client_lock = threading.Lock()
 
     @property
     def client(self) -> OpenAI:
-        """Lazy initialization of OpenAI client."""
+        """Lazy, thread-safe initialization of the OpenAI client and its connection pool."""
         if self._client is None:
-            self._client = OpenAI(api_key=self.api_key)
+            with self._client_lock:
+                if self._client is None:
+                    self._transport = MeteredTransport(limits=openai_limits())
+                    self._client = OpenAI(
+                        api_key=self.api_key,
+                        http_client=DefaultHttpxClient(transport=self._transport),
+                    )
         return self._client
 
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Lazy, thread-safe initialization of the async OpenAI client and its connection pool."""
+        if self._async_client is None:
+            with self._client_lock:
+                if self._async_client is None:
+                    self._async_transport = AsyncMeteredTransport(limits=openai_limits())
+                    self._async_client = AsyncOpenAI(
+                        api_key=self.api_key,
+                        http_client=DefaultAsyncHttpxClient(transport=self._async_transport),
+                    )
+        return self._async_client
+
+    def _refresh_prompt(self) -> None:
+        """Re-key the SQL cache if the data range, and so the instructions, changed."""
+        bounds = data_bounds()
+        if bounds != self._prompt_bounds:
+            self._prompt_bounds = bounds
+            self.sql_cache.fingerprint = prompt_fingerprint()
+
+    def connection_stats(self) -> dict:
+        """
+        Connection pool counters for the OpenAI clients created so far.
+
+        Returns:
+            Dictionary with "sync" and "async" pool stats (None if not created)
+        """
+        return {
+            "sync": self._transport.metrics.stats() if self._transport else None,
+            "async": self._async_transport.metrics.stats() if self._async_transport else None,
+        }
+
     def _create_tool_definition(self) -> dict:
         """
         Create the CFG-constrained tool definition for GPT-5.
@@ -149,97 +247,111 @@ class SQLGenerator:
 
     
 
-    def _normalize_date_filters(self, sql: str) -> str:
+    def _normalize_date_filters(self, query: SelectQuery, sql: str) -> str:
         """
-        Normalize date filters in SQL query.
-        Converts 'date BETWEEN 'YYYY-MM-DD' AND 'YYYY-MM-DD'' to a BETWEEN clause
-        that covers the entire day with explicit time components, since the date
-        column is DateTime with time components.
+        Normalize date filters in a parsed query.
+        Single-day filters ('date = 'YYYY-MM-DD'' or a BETWEEN with the same
+        date on both sides) become a BETWEEN covering the entire day with
+        explicit time components, since the date column is DateTime with time
+        components.
 
         Args:
-            sql: SQL query string
+            query: Parsed SQL
+            sql: The SQL text it was parsed from
 
         Returns:
-            Normalized SQL query string
+            The original SQL if nothing changed, otherwise the re-rendered query
         """
-        # Pattern to match: date BETWEEN 'YYYY-MM-DD' AND 'YYYY-MM-DD'
-        # Case-insensitive matching for 'date' and 'BETWEEN'
-        pattern = r"date\s+BETWEEN\s+(['\"])(\d{4}-\d{2}-\d{2})\1\s+AND\s+\1(\d{4}-\d{2}-\d{2})\1"
-
-        def replace_between(match):
-            quote_char = match.group(1)
-            start_date = match.group(2)
-            end_date = match.group(3)
-
-            # If both dates are the same, convert to a BETWEEN clause that covers the entire day
-            # This handles DateTime columns that have time components (e.g., '2016-11-16 23:59:59')
-            if start_date == end_date:
-                return f"date BETWEEN {quote_char}{start_date} 00:00:00{quote_char} AND {quote_char}{end_date} 23:59:59{quote_char}"
-            # Otherwise, keep the BETWEEN clause as is
-            return match.group(0)
-
-        # Replace all occurrences
-        normalized_sql = re.sub(pattern, replace_between,
-                                sql, flags=re.IGNORECASE)
-
-        # Also handle date = 'YYYY-MM-DD' patterns (in case they appear directly)
-        # Convert to BETWEEN clause covering the full day
-        equals_pattern = r"date\s*=\s+(['\"])(\d{4}-\d{2}-\d{2})\1"
-
-        def replace_equals(match):
-            quote_char = match.group(1)
-            date_value = match.group(2)
-            return f"date BETWEEN {quote_char}{date_value} 00:00:00{quote_char} AND {quote_char}{date_value} 23:59:59{quote_char}"
-
-        normalized_sql = re.sub(equals_pattern, replace_equals,
-                                normalized_sql, flags=re.IGNORECASE)
+        normalized = query.with_full_day_filters()
+        return sql if normalized is query else normalized.render()
 
-        return normalized_sql
-
-    def generate(self, prompt: str) -> str:
+    def _prepare_prompt(self, prompt: str) -> tuple[str, Optional[GeneratedSQL]]:
         """
-        Generate SQL query from natural language prompt.
+        Validate a prompt and answer it without OpenAI if possible: from the
+        rule-based parser, then from the SQL cache.
 
         Args:
-            prompt: Natural language query (e.g., "sum the total volume in the last 30 hours")
+            prompt: Natural language query
 
         Returns:
-            Validated SQL query string
+            Tuple of (stripped prompt, answer or None if OpenAI is needed)
 
         Raises:
             ValueError: If prompt is empty
-            SQLGenerationError: If generation fails
-            ValueError: If generated SQL doesn't match grammar
+            SQLGenerationError: If the prompt contains suspicious patterns
         """
         prompt = prompt.strip()
         if not prompt:
             raise ValueError("Prompt cannot be empty")
 
         # Pre-validate query for suspicious patterns
-        validate_query_input(prompt)
+        with stage("prevalidate"):
+            validate_query_input(prompt)
+
+        # Common phrasings map to SQL deterministically
+        if self.use_rules:
+            with stage("rules"):
+                rule_answer = rule_sql(prompt)
+            if rule_answer is not None:
+                logger.info(
+                    "Serving SQL from rule-based parser",
+                    extra={"sql_length": len(rule_answer)}
+                )
+                return prompt, GeneratedSQL(rule_answer, PATH_RULES)
+
+        # Serve repeated questions without an OpenAI round trip
+        if self.sql_cache is not None:
+            self._refresh_prompt()
+            with stage("sql_cache"):
+                cached_sql = self.sql_cache.get(prompt, self.model)
+            record_cache("sql", cached_sql is not None)
+            if cached_sql is not None:
+                logger.info(
+                    "Serving SQL from cache",
+                    extra={"model": self.model, "sql_length": len(cached_sql)}
+                )
+                return prompt, GeneratedSQL(cached_sql, PATH_CACHE)
 
         logger.info(
             "Generating SQL from prompt",
             extra={"model": self.model, "prompt_length": len(prompt)}
         )
+        return prompt, None
 
-        try:
-            response = self.client.responses.create(
-                model=self.model,
-                input=prompt,
-                instructions=SYSTEM_INSTRUCTIONS,
-                tools=[self._create_tool_definition()],
-                # Force the tool call to ensure CFG-constrained output
-                tool_choice={"type": "custom", "name": TOOL_NAME},
-                temperature=0,  # Deterministic output
-                max_output_tokens=512,  # SQL queries should be concise
-            )
-        except Exception as e:
-            logger.exception("OpenAI API call failed",
-                             extra={"model": self.model})
-            raise SQLGenerationError(
-                f"Failed to generate SQL: {str(e)}") from e
+    def _request_params(self, prompt: str) -> dict:
+        """Arguments for the CFG-constrained responses.create call."""
+        return {
+            "model": self.model,
+            "input": prompt,
+            "instructions": system_instructions(),
+            "tools": [self._create_tool_definition()],
+            # Force the tool call to ensure CFG-constrained output
+            "tool_choice": {"type": "custom", "name": TOOL_NAME},
+            "temperature": 0,  # Deterministic output
+            "max_output_tokens": 512,  # SQL queries should be concise
+        }
+
+    def _api_error(self, error: Exception) -> SQLGenerationError:
+        """Log a failed OpenAI call and wrap it in SQLGenerationError."""
+        logger.exception("OpenAI API call failed",
+                         extra={"model": self.model})
+        return SQLGenerationError(f"Failed to generate SQL: {str(error)}")
+
+    def _finalize_sql(self, prompt: str, response) -> str:
+        """
+        Extract, normalize, validate and cache SQL from a model response.
 
+        Args:
+            prompt: Stripped natural language query
+            response: OpenAI response object
+
+        Returns:
+            Validated SQL query string
+
+        Raises:
+            SQLGenerationError: If no SQL is found in the response
+            ValueError: If generated SQL doesn't match grammar
+        """
         try:
             sql = self._extract_sql_from_response(response)
         except SQLGenerationError:
@@ -247,27 +359,161 @@ class SQLGenerator:
                          extra={"model": self.model})
             raise
 
-        # Normalize date filters (convert BETWEEN same_date to equality)
-        sql = self._normalize_date_filters(sql)
-
         # Validate the generated SQL against the grammar
-        try:
-            validate_sql(sql)
-        except ValueError as e:
-            logger.error(
-                "Generated SQL failed validation",
-                extra={"model": self.model, "sql": sql, "error": str(e)}
-            )
-            raise ValueError(
-                f"Generated SQL does not match grammar: {e}") from e
+        with stage("grammar"):
+            try:
+                query = parse_sql(sql)
+            except ValueError as e:
+                logger.error(
+                    "Generated SQL failed validation",
+                    extra={"model": self.model, "sql": sql, "error": str(e)}
+                )
+                raise ValueError(
+                    f"Generated SQL does not match grammar: {e}") from e
+
+            # Normalize date filters (single-day filters cover the whole day)
+            sql = self._normalize_date_filters(query, sql)
 
         logger.info(
             "Successfully generated and validated SQL",
             extra={"model": self.model, "sql_length": len(sql)}
         )
 
+        if self.sql_cache is not None:
+            self.sql_cache.set(prompt, self.model, sql)
+
         return sql
 
+    def _flight_key(self, prompt: str) -> tuple[str, str]:
+        """Questions that would share an SQL cache entry share an in-flight call."""
+        return self.model, normalize_prompt(prompt)
+
+    def _call_model(self, prompt: str) -> str:
+        """Generate SQL for a stripped, validated prompt with one OpenAI call."""
+        try:
+            with stage("llm"):
+                response = self.client.responses.create(**self._request_params(prompt))
+        except Exception as e:
+            raise self._api_error(e) from e
+
+        return self._finalize_sql(prompt, response)
+
+    async def _acall_model(self, prompt: str) -> str:
+        """Async variant of _call_model()."""
+        try:
+            with stage("llm"):
+                response = await self.async_client.responses.create(**self._request_params(prompt))
+        except Exception as e:
+            raise self._api_error(e) from e
+
+        return self._finalize_sql(prompt, response)
+
+    def _answered(self, answer: GeneratedSQL) -> GeneratedSQL:
+        """Count which path answered a question."""
+        self.path_counts[answer.path] += 1
+        SQL_SOURCES.inc(answer.path)
+        return answer
+
+    def resolve(self, prompt: str) -> GeneratedSQL:
+        """
+        Generate SQL from a natural language prompt and report which path
+        (rules, cache or LLM) produced it.
+
+        Args:
+            prompt: Natural language query
+
+        Returns:
+            GeneratedSQL with validated SQL and its path
+
+        Raises:
+            ValueError: If prompt is empty
+            SQLGenerationError: If generation fails
+            ValueError: If generated SQL doesn't match grammar
+        """
+        prompt, answer = self._prepare_prompt(prompt)
+        if answer is not None:
+            return self._answered(answer)
+
+        # Concurrent identical questions share one OpenAI call
+        sql = self.single_flight.do(self._flight_key(prompt), lambda: self._call_model(prompt))
+        return self._answered(GeneratedSQL(sql, PATH_LLM))
+
+    async def aresolve(self, prompt: str, before_model: Optional[Callable[[], None]] = None) -> GeneratedSQL:
+        """
+        Async variant of resolve() using AsyncOpenAI.
+
+        Args:
+            prompt: Natural language query
+            before_model: Called when the question needs a new OpenAI request,
+                before it is made (e.g. to charge a rate limit); not called when
+                the question joins an identical request already in flight.
+                May raise to refuse the question
+
+        Returns:
+            GeneratedSQL with validated SQL and its path
+
+        Raises:
+            ValueError: If prompt is empty
+            SQLGenerationError: If generation fails
+            ValueError: If generated SQL doesn't match grammar
+        """
+        prompt, answer = self._prepare_prompt(prompt)
+        if answer is not None:
+            return self._answered(answer)
+
+        sql = await self.single_flight.ado(
+            self._flight_key(prompt), lambda: self._acall_model(prompt), on_lead=before_model
+        )
+        return self._answered(GeneratedSQL(sql, PATH_LLM))
+
+    def generate(self, prompt: str) -> str:
+        """
+        Generate SQL query from natural language prompt.
+
+        Args:
+            prompt: Natural language query (e.g., "sum the total volume in the last 30 hours")
+
+        Returns:
+            Validated SQL query string
+
+        Raises:
+            ValueError: If prompt is empty
+            SQLGenerationError: If generation fails
+            ValueError: If generated SQL doesn't match grammar
+        """
+        return self.resolve(prompt).sql
+
+    async def agenerate(self, prompt: str) -> str:
+        """
+        Async variant of generate() using AsyncOpenAI, so the event loop can
+        hold many in-flight LLM calls without a thread per request.
+
+        Args:
+            prompt: Natural language query
+
+        Returns:
+            Validated SQL query string
+
+        Raises:
+            ValueError: If prompt is empty
+            SQLGenerationError: If generation fails
+            ValueError: If generated SQL doesn't match grammar
+        """
+        return (await self.aresolve(prompt)).sql
+
+    def stats(self) -> dict:
+        """
+        Snapshot of how questions were answered.
+
+        Returns:
+            Dictionary with a count per path and the rule-based hit rate
+        """
+        total = sum(self.path_counts.values())
+        return {
+            **self.path_counts,
+            "rule_hit_rate": self.path_counts[PATH_RULES] / total if total else 0.0,
+        }
+
 
 # Convenience function for simple usage
 def generate_sql(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None) -> str:
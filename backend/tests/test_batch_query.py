@@ -0,0 +1,177 @@
+"""
+Tests for batch query execution.
+Run from backend directory: python -m pytest tests/test_batch_query.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from starlette.requests import Request
+
+from app.rate_limiter import charge_generation, generation_limit
+from core.exceptions import GenerationRateLimitError, QueryExecutionError, SQLGenerationError
+from services.query_service import QueryService
+from services.sql_generator import GeneratedSQL, PATH_LLM, SQLGenerator
+
+SQL = "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-01-31'"
+FAILING_SQL = "SELECT MAX(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-01-31'"
+
+
+class StubGenerator:
+    """Maps questions to SQL, tracking calls and peak concurrency."""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def aresolve(self, question, before_model=None):
+        if not question.strip():
+            raise ValueError("Prompt cannot be empty")
+        if before_model is not None:
+            before_model()
+        self.calls.append(question)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if question.startswith("broken"):
+            raise SQLGenerationError("model unavailable")
+        return GeneratedSQL(FAILING_SQL if question.startswith("fail") else SQL, PATH_LLM)
+
+
+class StubDatabase:
+    def __init__(self):
+        self.queries = []
+
+    async def aquery(self, sql):
+        self.queries.append(sql)
+        if sql == FAILING_SQL:
+            raise RuntimeError("Code: 241. Memory limit exceeded")
+        return {"columns": ["AVG(close)"], "rows": [(7000.5,)]}
+
+
+def test_batch_dedupes_and_keeps_input_order():
+    generator = StubGenerator()
+    service = QueryService(StubDatabase(), generator, batch_concurrency=4)
+
+    outcomes = asyncio.run(service.aexecute_batch([
+        "average close in january 2020",
+        "Average close in January 2020?",
+        "broken question",
+        "average close in january 2020",
+    ]))
+
+    assert generator.calls == ["average close in january 2020", "broken question"]
+    assert outcomes[0] is outcomes[1] is outcomes[3]
+    assert outcomes[0]["data"]["rows"] == [(7000.5,)]
+    assert outcomes[0]["sql_source"] == PATH_LLM
+    assert isinstance(outcomes[2], SQLGenerationError)
+
+
+def test_item_failures_do_not_fail_the_batch():
+    service = QueryService(StubDatabase(), StubGenerator(), batch_concurrency=4)
+
+    outcomes = asyncio.run(service.aexecute_batch([
+        "fail please",
+        "drop table coin_Bitcoin",
+        "",
+        "average close",
+    ]))
+
+    assert isinstance(outcomes[0], QueryExecutionError)
+    assert isinstance(outcomes[1], SQLGenerationError)
+    assert "DROP TABLE" in str(outcomes[1])
+    assert isinstance(outcomes[2], ValueError)
+    assert outcomes[3]["sql"] == SQL
+
+
+def test_batch_concurrency_cap():
+    generator = StubGenerator()
+    service = QueryService(StubDatabase(), generator, batch_concurrency=3)
+
+    outcomes = asyncio.run(service.aexecute_batch([f"question {i}" for i in range(12)]))
+
+    assert len(generator.calls) == 12
+    assert generator.peak == 3
+    assert all(isinstance(o, dict) for o in outcomes)
+
+
+def test_generation_budget_is_charged_per_unique_question():
+    generator = StubGenerator()
+    service = QueryService(StubDatabase(), generator, batch_concurrency=4)
+    budget = [2]
+
+    def charge():
+        if budget[0] == 0:
+            raise GenerationRateLimitError("over budget")
+        budget[0] -= 1
+
+    questions = ["question 1", "Question 1?", "question 2", "question 3", "question 4"]
+    outcomes = asyncio.run(service.aexecute_batch(questions, before_model=charge))
+
+    assert len(generator.calls) == 2
+    assert sum(isinstance(o, dict) for o in outcomes) == 3  # the repeat shares its answer
+    assert sum(isinstance(o, GenerationRateLimitError) for o in outcomes) == 2
+
+
+def test_only_questions_that_need_openai_are_charged():
+    generator = SQLGenerator(api_key="test")
+    charges = []
+
+    def refuse():
+        charges.append(1)
+        raise GenerationRateLimitError("over budget")
+
+    # Answered by the rule-based parser: no charge
+    answer = asyncio.run(generator.aresolve("highest market cap in March 2020", before_model=refuse))
+    assert answer.sql.startswith("SELECT")
+    assert charges == []
+
+    # Needs the model: charged, and refused before any request is made
+    with pytest.raises(GenerationRateLimitError):
+        asyncio.run(generator.aresolve("which week had the most volatile prices", before_model=refuse))
+    assert charges == [1]
+    assert generator.connection_stats()["async"] is None
+
+
+def test_questions_joining_an_inflight_call_are_not_charged():
+    generator = SQLGenerator(api_key="test")
+    requests = []
+
+    async def slow_model(prompt):
+        requests.append(prompt)
+        await asyncio.sleep(0.01)
+        return "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-01-31'"
+
+    generator._acall_model = slow_model
+    charges = []
+
+    def charge(client):
+        def hook():
+            charges.append(client)
+        return hook
+
+    async def run():
+        question = "which week had the most volatile prices"
+        return await asyncio.gather(*[generator.aresolve(question, before_model=charge(c)) for c in "abc"])
+
+    answers = asyncio.run(run())
+    assert len({answer.sql for answer in answers}) == 1
+    assert len(requests) == 1
+    assert charges == ["a"]
+
+
+def test_charge_generation_enforces_the_per_client_budget():
+    request = Request({"type": "http", "client": ("203.0.113.7", 1234), "headers": []})
+    assert all(charge_generation(request) for _ in range(generation_limit.amount))
+    assert not charge_generation(request)
+    other = Request({"type": "http", "client": ("203.0.113.8", 1234), "headers": []})
+    assert charge_generation(other)
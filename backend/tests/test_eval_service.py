@@ -0,0 +1,110 @@
+"""
+Tests for the concurrent eval runner.
+Run from backend directory: python -m pytest tests/test_eval_service.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.schemas import EvalTestCase
+from services.eval_service import EvalService
+
+SQL = "SELECT count() FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-01-31'"
+
+
+class DelayedGenerator:
+    """Returns SQL after a per-question delay and tracks peak concurrency."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.in_flight = 0
+        self.peak = 0
+
+    async def agenerate(self, question):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[question])
+        finally:
+            self.in_flight -= 1
+        if question == "reject":
+            raise ValueError("Forbidden SQL operation detected")
+        return SQL
+
+
+class StubDatabase:
+    async def aquery(self, sql):
+        return {"columns": ["count()"], "rows": [(31,)]}
+
+
+def _cases(*questions):
+    return [
+        EvalTestCase(
+            question=q,
+            should_pass=q != "reject",
+            expected_error_contains=["forbidden"] if q == "reject" else None,
+        )
+        for q in questions
+    ]
+
+
+def test_summary_keeps_test_case_order():
+    generator = DelayedGenerator({"slow": 0.05, "medium": 0.02, "fast": 0.0})
+    service = EvalService(StubDatabase(), generator, concurrency=3, case_timeout_seconds=5)
+
+    summary = asyncio.run(service.arun_evals(_cases("slow", "medium", "fast")))
+
+    assert [r["question"] for r in summary["results"]] == ["slow", "medium", "fast"]
+    assert summary["passed"] == 3
+    assert generator.peak == 3
+
+
+def test_stream_yields_in_completion_order():
+    generator = DelayedGenerator({"slow": 0.05, "fast": 0.0})
+    service = EvalService(StubDatabase(), generator, concurrency=2, case_timeout_seconds=5)
+
+    async def collect():
+        return [index async for index, _ in service.astream_evals(_cases("slow", "fast"))]
+
+    assert asyncio.run(collect()) == [2, 1]
+
+
+def test_concurrency_limit_and_timeout():
+    delays = {f"q{i}": 0.01 for i in range(6)}
+    delays["stuck"] = 10
+    generator = DelayedGenerator(delays)
+    service = EvalService(StubDatabase(), generator, concurrency=2, case_timeout_seconds=0.2)
+
+    summary = asyncio.run(service.arun_evals(_cases("stuck", *[f"q{i}" for i in range(6)])))
+
+    assert generator.peak <= 2
+    assert summary["results"][0]["status"] == "error"
+    assert "Timed out" in summary["results"][0]["error"]
+    assert summary["passed"] == 6
+    assert summary["failed"] == 1
+
+
+def test_security_case_scored_when_run_concurrently():
+    generator = DelayedGenerator({"reject": 0.0, "ok": 0.0})
+    service = EvalService(StubDatabase(), generator, concurrency=4, case_timeout_seconds=5)
+
+    summary = asyncio.run(service.arun_evals(_cases("reject", "ok")))
+
+    assert [r["status"] for r in summary["results"]] == ["pass", "pass"]
+
+
+def test_prevalidated_questions_skip_generation():
+    generator = DelayedGenerator({"ok": 0.0})
+    service = EvalService(StubDatabase(), generator, concurrency=4, case_timeout_seconds=5)
+    cases = [
+        EvalTestCase(question="drop table users", should_pass=False, expected_error_contains=["DROP TABLE"]),
+        EvalTestCase(question="ok"),
+    ]
+
+    summary = asyncio.run(service.arun_evals(cases))
+
+    assert [r["status"] for r in summary["results"]] == ["pass", "pass"]
+    assert "DROP TABLE operation not allowed" in summary["results"][0]["error"]
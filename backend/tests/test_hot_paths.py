@@ -0,0 +1,57 @@
+"""
+Tests for the hot-path benchmark regression check.
+Run from backend directory: python -m pytest tests/test_hot_paths.py
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_hot_paths import (
+    BASELINE_PATH,
+    Case,
+    build_cases,
+    compare_results,
+    measure,
+)
+
+
+def _result(normalized, peak):
+    return {"ops_per_sec": normalized * 1000, "normalized": normalized, "peak_alloc_bytes": peak}
+
+
+def test_compare_flags_slowdowns_and_allocation_growth_beyond_threshold():
+    baseline = {"cases": {
+        "fast": _result(10.0, 1000),
+        "slower": _result(10.0, 1000),
+        "allocates": _result(10.0, 100_000),
+        "tiny growth": _result(10.0, 100),
+    }}
+    current = {"cases": {
+        "fast": _result(8.0, 1000),           # -20%: within 25%
+        "slower": _result(7.0, 1000),         # -30%
+        "allocates": _result(10.0, 150_000),  # +50%
+        "tiny growth": _result(10.0, 900),    # +800%, but under the slack
+        "new case": _result(1.0, 1),
+    }}
+    regressions = compare_results(baseline, current, threshold=0.25)
+    assert set(regressions) == {"slower", "allocates"}
+    assert "throughput -30%" in regressions["slower"]
+    assert "100000 -> 150000" in regressions["allocates"]
+
+
+def test_measure_reports_ops_and_allocations():
+    result = measure(Case("list", lambda: [0] * 10_000))
+    assert result["ops_per_sec"] > 0
+    assert result["normalized"] > 0
+    assert result["peak_alloc_bytes"] >= 10_000 * 8
+
+
+def test_baseline_covers_every_case():
+    """The committed baseline has an entry for each benchmark case"""
+    baseline = json.loads(BASELINE_PATH.read_text())
+    names = [case.name for case in build_cases()]
+    assert len(names) == len(set(names))
+    assert set(names) == set(baseline["cases"])
@@ -0,0 +1,93 @@
+"""
+Tests for the metered OpenAI and ClickHouse connection pools.
+Run from backend directory: python -m pytest tests/test_http_pool.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fakes import FakeClickHouse, parse_latency
+from utils.http_pool import MeteredTransport, PoolMetrics, openai_limits
+
+
+def test_pool_metrics_reuse_and_saturation():
+    """Requests beyond connections opened count as reuse; overflow counts as queued"""
+    metrics = PoolMetrics(max_connections=2)
+    metrics.started()
+    metrics.connected()
+    metrics.started()
+    metrics.connected()
+    metrics.started()  # both connections busy
+    stats = metrics.stats()
+    assert stats["in_flight"] == 3
+    assert stats["queued"] == 1
+    assert stats["saturation"] == 1.5
+
+    for _ in range(3):
+        metrics.finished()
+    metrics.started()
+    metrics.finished()
+    stats = metrics.stats()
+    assert stats["requests"] == 4
+    assert stats["connections_opened"] == 2
+    assert stats["reused"] == 2
+    assert stats["reuse_ratio"] == 0.5
+    assert stats["peak_in_flight"] == 3
+    assert stats["in_flight"] == 0
+
+
+def test_limits_from_env(monkeypatch):
+    """Pool limits are read from the environment"""
+    monkeypatch.setenv("OPENAI_MAX_CONNECTIONS", "5")
+    monkeypatch.setenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "3")
+    monkeypatch.setenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "12")
+    limits = openai_limits()
+    assert limits.max_connections == 5
+    assert limits.max_keepalive_connections == 3
+    assert limits.keepalive_expiry == 12.0
+    assert MeteredTransport(limits=limits).metrics.max_connections == 5
+
+
+def test_clickhouse_async_pool_is_sized_and_metered(monkeypatch):
+    """The async client serving requests gets the pool settings and reports its own counters"""
+    pytest.importorskip("clickhouse_connect")
+    from db.client import DatabaseClient
+
+    fake = FakeClickHouse(parse_latency("fixed:10"))
+    port = fake.start()
+    monkeypatch.setenv("TB_CLICKHOUSE_HOST", "127.0.0.1")
+    monkeypatch.setenv("TB_CLICKHOUSE_PORT", str(port))
+    monkeypatch.setenv("TB_CLICKHOUSE_SECURE", "false")
+    monkeypatch.setenv("TINYBIRD_TOKEN", "x")
+    monkeypatch.setenv("CLICKHOUSE_POOL_SIZE", "3")
+    monkeypatch.setenv("CLICKHOUSE_KEEPALIVE_IDLE_SECONDS", "12")
+    try:
+        # Built outside an event loop, as in a threadpool worker
+        db = DatabaseClient()
+        assert db.connection_stats()["async"] is None
+
+        async def run():
+            sqls = [
+                f"SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-{day:02d}'"
+                for day in range(1, 13)
+            ]
+            await asyncio.gather(*(db.aquery(sql) for sql in sqls))
+            connector = (await db.get_async_client())._session.connector
+            return connector.limit, connector.limit_per_host
+
+        assert asyncio.run(run()) == (3, 3)
+        stats = db.connection_stats()
+        assert stats["async"]["requests"] == 12
+        assert 1 <= stats["async"]["connections_opened"] <= 3
+        assert stats["async"]["queued"] >= 9
+        assert stats["async"]["in_flight"] == 0
+        assert stats["sync"]["pool_size"] == 3
+    finally:
+        fake.stop()
@@ -0,0 +1,217 @@
+"""
+Tests for incremental ingestion: the CSV store, in-place index extension,
+date bounds and cross-process catch-up.
+Run from backend directory: python -m pytest tests/test_ingest.py
+"""
+import asyncio
+import math
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.admin import _read_body
+from cache.result_cache import ResultCache
+from core.constants import DATA_MAX_DATE, DATA_MIN_DATE
+from core.data_bounds import data_bounds, set_data_bounds
+from core.exceptions import DateRangeError, IngestError
+from db.ingest import CSVStore, parse_csv
+from db.local_client import DEFAULT_DATA_PATH, LocalColumnarClient
+from db.range_index import RangeAggregateIndex
+from services.ingest_service import IngestService
+from utils.date_helpers import validate_date_range
+
+HEADER = "Date,Open,High,Low,Close,Volume,Marketcap\n"
+AGGREGATES = "SELECT SUM(volume), AVG(close), MIN(low), MAX(high), COUNT(*) FROM coin_Bitcoin"
+
+
+def _rows(start_day: int, days: int) -> str:
+    """CSV rows for July 2021 days start_day .. start_day + days - 1."""
+    lines = []
+    for day in range(start_day, start_day + days):
+        price = 30000.0 + day * 100
+        lines.append(f"2021-07-{day:02d} 23:59:59,{price},{price + 500},{price - 500},{price + 50},{1e9 + day},{5.6e11 + day}\n")
+    return "".join(lines)
+
+
+@pytest.fixture(autouse=True)
+def reset_bounds():
+    yield
+    set_data_bounds(DATA_MIN_DATE, DATA_MAX_DATE)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = tmp_path / "coin_Bitcoin.csv"
+    shutil.copy(DEFAULT_DATA_PATH, path)
+    return path
+
+
+class RecordingDatabase:
+    """ClickHouse backend stand-in that records inserted rows."""
+
+    def __init__(self):
+        self.result_cache = ResultCache()
+        self.inserted = []
+
+    def insert_columns(self, columns):
+        self.inserted.append(len(columns["date"]))
+
+
+def _service(path):
+    store = CSVStore(path)
+    local = LocalColumnarClient(columns=store.read_new())
+    return IngestService(store, local, RangeAggregateIndex(local.columns))
+
+
+def _assert_same(actual, expected):
+    for a, e in zip(actual, expected):
+        assert (math.isnan(a) and math.isnan(e)) or math.isclose(a, e, rel_tol=1e-9)
+
+
+def test_append_writes_rows_in_the_file_layout(store_path):
+    store = CSVStore(store_path)
+    store.read_new()
+    pending, fresh = store.append(parse_csv(HEADER + _rows(7, 2)))
+    assert pending is None
+    assert len(fresh["date"]) == 2
+
+    last_lines = store_path.read_text().splitlines()[-3:]
+    assert last_lines[0].startswith("2991,Bitcoin,BTC,2021-07-06 23:59:59,")
+    assert last_lines[1].startswith("2992,Bitcoin,BTC,2021-07-07 23:59:59,")
+    assert last_lines[2].startswith("2993,Bitcoin,BTC,2021-07-08 23:59:59,")
+
+    # The appended file loads like the original
+    reloaded = CSVStore(store_path).read_new()
+    assert len(reloaded["date"]) == 2993
+    assert reloaded["close"][-1] == 30000.0 + 8 * 100 + 50
+
+
+def test_append_skips_stored_and_repeated_dates(store_path):
+    store = CSVStore(store_path)
+    store.read_new()
+    # 2021-07-06 is already stored; 2021-07-07 is repeated in the input
+    text = HEADER + _rows(6, 2) + _rows(7, 1)
+    _, fresh = store.append(parse_csv(text))
+    assert [str(np.datetime64(int(d), "s"))[:10] for d in fresh["date"]] == ["2021-07-07"]
+    _, again = store.append(parse_csv(text))
+    assert len(again["date"]) == 0
+
+
+def test_invalid_csv_is_rejected():
+    with pytest.raises(IngestError):
+        parse_csv("Date,Close\n2021-07-07 23:59:59,1.0\n")
+    with pytest.raises(IngestError):
+        parse_csv(HEADER + "2021-07-07 23:59:59,x,1,1,1,1,1\n")
+
+
+def test_failed_insert_stores_nothing(store_path):
+    store = CSVStore(store_path)
+    store.read_new()
+    size = store_path.stat().st_size
+
+    def failing_insert(columns):
+        raise RuntimeError("insert failed")
+
+    with pytest.raises(RuntimeError):
+        store.append(parse_csv(HEADER + _rows(7, 2)), before_write=failing_insert)
+    assert store_path.stat().st_size == size
+
+
+def test_index_append_matches_a_full_rebuild(store_path):
+    service = _service(store_path)
+    result = service.ingest_csv(HEADER + _rows(7, 10))
+    assert (result.rows_added, result.rows_skipped) == (10, 0)
+    assert result.max_date == "2021-07-16"
+
+    rebuilt = RangeAggregateIndex(CSVStore(store_path).read_new())
+    for start, end in [("2021-07-01", "2021-07-16"), ("2021-01-01", "2021-07-10"), ("2013-04-29", "2021-07-16")]:
+        sql = f"{AGGREGATES} WHERE date BETWEEN '{start}' AND '{end}'"
+        expected = service.db_client.query(sql)["rows"][0]
+        _assert_same(service.range_index.try_answer(sql)["rows"][0], expected)
+        _assert_same(rebuilt.try_answer(sql)["rows"][0], expected)
+
+
+def test_ingestion_extends_the_date_bounds(store_path):
+    sql = "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2021-07-08' AND '2021-07-09'"
+    with pytest.raises(DateRangeError):
+        validate_date_range(sql)
+
+    _service(store_path).ingest_csv(HEADER + _rows(7, 3))
+    assert data_bounds() == (DATA_MIN_DATE, "2021-07-09")
+    validate_date_range(sql)
+
+
+def test_clickhouse_ingestion_inserts_and_invalidates_cached_results(store_path):
+    database = RecordingDatabase()
+    store = CSVStore(store_path)
+    store.read_new()
+    service = IngestService(store, database)
+    epoch = database.result_cache.epoch
+
+    assert service.ingest_csv(HEADER + _rows(6, 3)).epoch == epoch + 1
+    assert database.inserted == [2]
+    # Nothing new: no insert, and the epoch stays
+    assert service.ingest_csv(HEADER + _rows(7, 1)).epoch == epoch + 1
+    assert database.inserted == [2]
+
+
+def test_other_processes_catch_up_from_the_store(store_path):
+    writer = _service(store_path)
+    reader = _service(store_path)
+    assert reader.catch_up() == 0
+
+    writer.ingest_csv(HEADER + _rows(7, 5))
+    assert reader.store.has_new_rows()
+    assert reader.catch_up() == 5
+    assert reader.catch_up() == 0
+
+    sql = f"{AGGREGATES} WHERE date BETWEEN '2021-07-01' AND '2021-07-11'"
+    _assert_same(reader.range_index.try_answer(sql)["rows"][0], writer.db_client.query(sql)["rows"][0])
+
+    # A process that appends after falling behind applies both sets of rows
+    writer.ingest_csv(HEADER + _rows(12, 1))
+    result = reader.ingest_csv(HEADER + _rows(13, 1))
+    assert result.rows_added == 1
+    assert len(reader.db_client.columns["date"]) == 2991 + 7
+    assert np.all(np.diff(reader.db_client.columns["date"]) > 0)
+
+
+def _upload(chunks, content_length=None):
+    """A request streaming chunks, and the list of chunks the app has received."""
+    received = []
+    pending = list(chunks)
+
+    async def receive():
+        chunk = pending.pop(0)
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive), received
+
+
+def test_ingest_body_is_capped_while_streaming():
+    request, _ = _upload([b"a" * 4, b"b" * 4])
+    assert asyncio.run(_read_body(request, 8)) == b"aaaabbbb"
+
+    # Declared too large: refused before reading
+    request, received = _upload([b"a" * 4] * 3, content_length=12)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_read_body(request, 8))
+    assert error.value.status_code == 413
+    assert received == []
+
+    # Undeclared (chunked): reading stops at the chunk that passes the limit
+    request, received = _upload([b"a" * 4] * 5)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_read_body(request, 8))
+    assert error.value.status_code == 413
+    assert len(received) == 3
@@ -0,0 +1,93 @@
+"""
+Tests for the load-test fakes and report helpers.
+Run from backend directory: python -m pytest tests/test_load_fakes.py
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_load import parse_server_timing, summarize
+from benchmarks.fakes import (
+    DEFAULT_SQL,
+    WORKLOAD,
+    FakeClickHouse,
+    FakeOpenAI,
+    parse_latency,
+    sql_for_question,
+)
+from db.local_client import LocalColumnarClient
+from security.sql_guard import validate_sql
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return LocalColumnarClient()
+
+
+def test_workload_sql_is_valid():
+    for sql in list(WORKLOAD.values()) + [DEFAULT_SQL]:
+        validate_sql(sql)
+
+
+def test_sql_for_question_ignores_run_suffix():
+    question = "top 10 closing prices in 2020"
+    assert sql_for_question(f"{question} (run 12)") == WORKLOAD[question]
+    assert sql_for_question("something else") == DEFAULT_SQL
+
+
+def test_parse_latency():
+    assert parse_latency("fixed:250")() == 0.25
+    assert 0.01 <= parse_latency("uniform:10,20")() <= 0.02
+    assert parse_latency("lognormal:100,0.5")() > 0
+    with pytest.raises(ValueError):
+        parse_latency("normal:100")
+
+
+def test_fake_clickhouse_answers_like_the_local_engine(engine):
+    """clickhouse_connect parses the fake's Native blocks into the engine's rows"""
+    clickhouse_connect = pytest.importorskip("clickhouse_connect")
+    fake = FakeClickHouse(parse_latency("fixed:0"), engine)
+    port = fake.start()
+    try:
+        client = clickhouse_connect.get_client(
+            host="127.0.0.1", port=port, username="default", password="x",
+            compress=False, autogenerate_session_id=False,
+        )
+        for sql in (WORKLOAD["top 10 closing prices in 2020"], DEFAULT_SQL):
+            result = client.query(sql)
+            expected = engine.query(sql)
+            assert result.column_names == tuple(expected["columns"])
+            assert result.result_rows == [tuple(row) for row in expected["rows"]]
+    finally:
+        fake.stop()
+
+
+def test_fake_openai_returns_tool_call_sql(monkeypatch):
+    """SQLGenerator resolves questions through the fake Responses API"""
+    fake = FakeOpenAI(parse_latency("fixed:0"))
+    port = fake.start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    from services.sql_generator import SQLGenerator
+
+    try:
+        question = "daily average close in june 2021"
+        generated = SQLGenerator(api_key="load-test", use_rules=False).resolve(f"{question} (run 1)")
+        assert generated.sql == WORKLOAD[question]
+        assert generated.path == "llm"
+        assert fake.requests == 1
+    finally:
+        fake.stop()
+
+
+def test_parse_server_timing_and_summarize():
+    timings = parse_server_timing("llm;dur=812.4, cache;desc=\"x\", database;dur=35.1, total;dur=851.0")
+    assert timings == {"llm": 812.4, "database": 35.1, "total": 851.0}
+
+    summary = summarize([float(ms) for ms in range(1, 101)])
+    assert summary["count"] == 100
+    assert (summary["p50"], summary["p95"], summary["p99"], summary["max"]) == (50.0, 95.0, 99.0, 100.0)
+    assert summarize([]) == {"count": 0}
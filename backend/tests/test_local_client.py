@@ -0,0 +1,112 @@
+"""
+Tests for the in-process NumPy query engine.
+Run from backend directory: python -m pytest tests/test_local_client.py
+"""
+import csv
+import math
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.local_client import DEFAULT_DATA_PATH, LocalColumnarClient, LocalQueryError
+
+WHERE = "WHERE date BETWEEN '2020-01-01' AND '2020-12-31'"
+
+
+@pytest.fixture(scope="module")
+def client():
+    return LocalColumnarClient()
+
+
+@pytest.fixture(scope="module")
+def rows_2020():
+    """Brute-force reference: CSV rows inside the WHERE range above"""
+    with open(DEFAULT_DATA_PATH, newline="") as f:
+        rows = [
+            {"date": datetime.fromisoformat(r["Date"]), "close": float(r["Close"]), "high": float(r["High"])}
+            for r in csv.DictReader(f)
+        ]
+    return [r for r in rows if datetime(2020, 1, 1) <= r["date"] <= datetime(2020, 12, 31)]
+
+
+def test_aggregates_match_reference(client, rows_2020):
+    """SUM/AVG/MIN/MAX/COUNT agree with a row-by-row computation"""
+    result = client.query(
+        f"SELECT AVG(close) AS avg_close, SUM(close), MIN(close), MAX(high), COUNT(*) FROM coin_Bitcoin {WHERE}"
+    )
+    closes = [r["close"] for r in rows_2020]
+    avg_close, total, low, high, count = result["rows"][0]
+
+    assert result["columns"] == ["avg_close", "sum(close)", "min(close)", "max(high)", "count()"]
+    assert math.isclose(avg_close, sum(closes) / len(closes))
+    assert math.isclose(total, sum(closes))
+    assert low == min(closes)
+    assert high == max(r["high"] for r in rows_2020)
+    assert count == len(rows_2020)
+
+
+def test_order_by_limit(client, rows_2020):
+    """ORDER BY ... DESC LIMIT returns the top rows in order"""
+    result = client.query(f"SELECT date, close FROM coin_Bitcoin {WHERE} ORDER BY close DESC LIMIT 3")
+    expected = sorted(rows_2020, key=lambda r: r["close"], reverse=True)[:3]
+    assert result["rows"] == [(r["date"], r["close"]) for r in expected]
+
+
+def test_group_by_day(client, rows_2020):
+    """toStartOfDay grouping yields one row per day"""
+    result = client.query(f"SELECT COUNT(*) AS n FROM coin_Bitcoin {WHERE} GROUP BY toStartOfDay(date)")
+    assert len(result["rows"]) == len(rows_2020)
+    assert all(row == (1,) for row in result["rows"])
+
+
+def test_single_day_between(client):
+    """A full-day BETWEEN matches the 23:59:59 timestamp of that day"""
+    result = client.query(
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-11-15 00:00:00' AND '2016-11-15 23:59:59' LIMIT 1"
+    )
+    assert len(result["rows"]) == 1
+
+
+def test_empty_range_defaults(client):
+    """Aggregates over no rows follow ClickHouse defaults"""
+    result = client.query(
+        "SELECT SUM(volume), AVG(close), COUNT(*) FROM coin_Bitcoin WHERE date BETWEEN '2030-01-01' AND '2030-02-01'"
+    )
+    total, average, count = result["rows"][0]
+    assert total == 0.0 and math.isnan(average) and count == 0
+
+
+def test_mixed_aggregate_and_column_rejected(client):
+    """Plain columns can't be mixed with aggregates without GROUP BY"""
+    with pytest.raises(LocalQueryError):
+        client.query(f"SELECT date, AVG(close) FROM coin_Bitcoin {WHERE}")
+
+
+def test_plans_are_cached_per_canonical_query(client):
+    """Formatting variants of a query share one compiled plan"""
+    client.compiler.cache.clear()
+    client.query(f"SELECT MAX(high) FROM coin_Bitcoin {WHERE}")
+    client.query(f"select  max(high)  from coin_Bitcoin {WHERE.lower()}")
+    assert len(client.compiler.cache) == 1
+
+
+def test_stream_blocks_match_query(client):
+    """Streaming yields the same rows as query(), in bounded blocks"""
+    sql = f"SELECT date, close FROM coin_Bitcoin {WHERE} ORDER BY close DESC"
+    blocks = list(client.stream_query(sql, block_rows=100))
+    assert all(len(rows) <= 100 for _, rows in blocks)
+    assert blocks[0][0] == ["date", "close"]
+    assert [row for _, rows in blocks for row in rows] == client.query(sql)["rows"]
+
+
+def test_stream_empty_result_keeps_columns(client):
+    """An empty streamed result still yields one block with the column names"""
+    blocks = list(client.stream_query(
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2030-01-01' AND '2030-02-01'"
+    ))
+    assert blocks == [(["close"], [])]
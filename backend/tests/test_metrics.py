@@ -0,0 +1,122 @@
+"""
+Tests for query pipeline metrics and their Prometheus rendering.
+Run from backend directory: python -m pytest tests/test_metrics.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.exceptions import QueryExecutionError
+from services.query_service import QueryService
+from services.sql_generator import GeneratedSQL, PATH_CACHE, PATH_RULES, SQLGenerator
+from utils.metrics import (
+    CACHE_LOOKUPS,
+    QUERIES_IN_FLIGHT,
+    QUERY_ERRORS,
+    REGISTRY,
+    RESULT_ROWS,
+    SQL_SOURCES,
+    STAGE_SECONDS,
+    Counter,
+    Histogram,
+    Registry,
+    stage,
+)
+
+SQL = "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-01-31'"
+
+
+class StubGenerator:
+    async def aresolve(self, question, before_model=None):
+        return GeneratedSQL(SQL, PATH_CACHE)
+
+
+class StubDatabase:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def aquery(self, sql):
+        if self.error:
+            raise self.error
+        return {"columns": ["AVG(close)"], "rows": [(7000.5,)]}
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Buckets are cumulative and le-labelled, with _sum and _count"""
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1)))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, "llm")
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{stage="llm",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{stage="llm",le="1"} 3' in text
+    assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{stage="llm"} 3.65' in text
+    assert 'latency_seconds_count{stage="llm"} 4' in text
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    counter = registry.register(Counter("errors_total", "Errors.", ("error",)))
+    counter.inc('say "hi"\n')
+    assert 'errors_total{error="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def test_stage_is_timed_even_when_it_fails():
+    before = STAGE_SECONDS.count("test_stage")
+    with pytest.raises(RuntimeError):
+        with stage("test_stage"):
+            raise RuntimeError("boom")
+    assert STAGE_SECONDS.count("test_stage") == before + 1
+
+
+def test_query_pipeline_records_stages_rows_and_errors():
+    """A query records its stages and row count; a failure counts its exception class"""
+    database_before = STAGE_SECONDS.count("database")
+    rows_before = RESULT_ROWS.count()
+    errors_before = QUERY_ERRORS.value("QueryExecutionError")
+
+    service = QueryService(StubDatabase(), StubGenerator())
+    asyncio.run(service.aexecute_query("average close in january 2020"))
+
+    assert STAGE_SECONDS.count("database") == database_before + 1
+    assert STAGE_SECONDS.count("date_validation") >= 1
+    assert RESULT_ROWS.count() == rows_before + 1
+
+    failing = QueryService(StubDatabase(RuntimeError("Code: 159. Timeout exceeded")), StubGenerator())
+    with pytest.raises(QueryExecutionError):
+        asyncio.run(failing.aexecute_query("average close in january 2020"))
+
+    assert QUERY_ERRORS.value("QueryExecutionError") == errors_before + 1
+    assert QUERIES_IN_FLIGHT.value() == 0
+    assert "dripdrop_query_errors_total" in REGISTRY.render()
+
+
+def test_cache_lookups_are_counted():
+    before = CACHE_LOOKUPS.value("range_index", "miss")
+
+    class NoAnswer:
+        def try_answer(self, sql):
+            return None
+
+    service = QueryService(StubDatabase(), StubGenerator(), range_index=NoAnswer())
+    asyncio.run(service.aexecute_query("average close in january 2020"))
+    assert CACHE_LOOKUPS.value("range_index", "miss") == before + 1
+
+
+def test_rule_answers_are_exported():
+    """Questions answered by the rule-based parser show up in /metrics"""
+    before = SQL_SOURCES.value(PATH_RULES)
+    generator = SQLGenerator(api_key="test")
+    asyncio.run(generator.aresolve("highest market cap in March 2020"))
+
+    assert SQL_SOURCES.value(PATH_RULES) == before + 1
+    assert generator.stats()["rule_hit_rate"] == 1.0
+    assert f'dripdrop_sql_source_total{{path="{PATH_RULES}"}} {before + 1}' in REGISTRY.render()
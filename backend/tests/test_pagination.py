@@ -0,0 +1,150 @@
+"""
+Tests for keyset pagination of large row listings.
+Run from backend directory: python -m pytest tests/test_pagination.py
+"""
+import asyncio
+import base64
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.exceptions import InvalidCursorError
+from db.local_client import LocalColumnarClient
+from db.pagination import decode_cursor, encode_cursor, first_page, page_from_cursor
+from security.sql_guard import parse_sql
+from services.query_service import PATH_CURSOR, QueryService
+from services.sql_generator import GeneratedSQL, PATH_LLM
+from utils.data_helpers import sanitize_data_for_json
+
+YEAR = "WHERE date BETWEEN '2020-01-01' AND '2020-12-31'"
+ALL_ROWS = f"SELECT date, close FROM coin_Bitcoin {YEAR}"
+
+
+class StubGenerator:
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+
+    async def aresolve(self, question, before_model=None):
+        self.calls += 1
+        return GeneratedSQL(self.sql, PATH_LLM)
+
+
+class RecordingDatabase:
+    """Local engine that records the SQL it runs."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.queries = []
+
+    async def aquery(self, sql):
+        self.queries.append(sql)
+        return self.engine.query(sql)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return LocalColumnarClient()
+
+
+def _read_all(service, question):
+    """Run a question and follow its cursors, returning every page."""
+    pages = [asyncio.run(service.aexecute_query(question))]
+    # Later pages need no generator, as in /query/page
+    pager = QueryService(service.db_client, None, page_rows=service.page_rows)
+    while pages[-1].get("next_cursor"):
+        pages.append(asyncio.run(pager.aexecute_page(pages[-1]["next_cursor"])))
+    return pages
+
+
+@pytest.mark.parametrize("sql", [
+    # Aggregates and groups are small; relative filters have no keyset bounds
+    f"SELECT AVG(close) FROM coin_Bitcoin {YEAR}",
+    f"SELECT MAX(close) FROM coin_Bitcoin {YEAR} GROUP BY toStartOfDay(date)",
+    "SELECT close FROM coin_Bitcoin WHERE date >= now() - INTERVAL 3000 DAY",
+    # Keyset order must be the date
+    f"{ALL_ROWS} ORDER BY close DESC",
+    f"{ALL_ROWS} LIMIT 50",
+])
+def test_first_page_skips_queries_that_need_no_paging(sql):
+    assert first_page(parse_sql(sql), page_rows=100) is None
+
+
+def test_first_page_orders_by_date_and_limits_to_a_page():
+    page = first_page(parse_sql(ALL_ROWS), page_rows=100)
+    assert page.query.render() == f"{ALL_ROWS} ORDER BY date LIMIT 100"
+    assert (page.returned, page.date_index, page.added_date) == (0, 0, False)
+
+    # Without a date column, one is appended for the cursor
+    page = first_page(parse_sql(f"SELECT close FROM coin_Bitcoin {YEAR}"), page_rows=100)
+    assert page.query.render() == f"SELECT close, date FROM coin_Bitcoin {YEAR} ORDER BY date LIMIT 100"
+    assert page.added_date
+
+
+def test_cursor_pages_past_the_last_date():
+    cursor = encode_cursor(parse_sql(f"{ALL_ROWS} ORDER BY date DESC"), "2020-06-30 23:59:59", 100)
+    page = page_from_cursor(cursor, page_rows=100)
+    assert page.query.render() == (
+        f"{ALL_ROWS} AND date BETWEEN '2020-01-01' AND '2020-06-30 23:59:58' ORDER BY date DESC LIMIT 100"
+    )
+    assert page.returned == 100
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "eyJ2IjoxfQ"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_cursor_sql_is_validated_by_the_grammar():
+    cursor = encode_cursor(parse_sql(ALL_ROWS), "2020-06-30 23:59:59", 1)
+    assert decode_cursor(cursor) == (parse_sql(ALL_ROWS), "2020-06-30 23:59:59", 1)
+
+    payload = {"v": 1, "sql": "DROP TABLE coin_Bitcoin", "after": "2020-06-30 23:59:59", "returned": 1}
+    forged = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(forged)
+
+
+@pytest.mark.parametrize("sql, unpaged_sql", [
+    (ALL_ROWS, f"{ALL_ROWS} ORDER BY date"),
+    (f"{ALL_ROWS} ORDER BY date DESC", f"{ALL_ROWS} ORDER BY date DESC"),
+    (f"SELECT close AS c, volume FROM coin_Bitcoin {YEAR}",
+     f"SELECT close AS c, volume FROM coin_Bitcoin {YEAR} ORDER BY date"),
+    (f"{ALL_ROWS} LIMIT 250", f"{ALL_ROWS} ORDER BY date LIMIT 250"),
+])
+def test_pages_concatenate_to_the_full_result(engine, sql, unpaged_sql):
+    database = RecordingDatabase(engine)
+    generator = StubGenerator(sql)
+    service = QueryService(database, generator, page_rows=100)
+    pages = _read_all(service, "every close in 2020")
+
+    expected = engine.query(unpaged_sql)
+    rows = [row for page in pages for row in page["data"]["rows"]]
+    assert [tuple(row) for row in rows] == [tuple(row) for row in sanitize_data_for_json(expected)["rows"]]
+    assert all(page["data"]["columns"] == list(expected["columns"]) for page in pages)
+
+    assert generator.calls == 1
+    assert [page["sql_source"] for page in pages[1:]] == [PATH_CURSOR] * (len(pages) - 1)
+    assert all(len(page["data"]["rows"]) <= 100 for page in pages)
+    assert "next_cursor" not in pages[-1]
+    assert "Pass next_cursor" in pages[0]["warning"]
+
+
+def test_small_results_have_no_cursor(engine):
+    service = QueryService(RecordingDatabase(engine), StubGenerator(ALL_ROWS), page_rows=1000)
+    result = asyncio.run(service.aexecute_query("every close in 2020"))
+    assert "next_cursor" not in result
+    assert len(result["data"]["rows"]) == 365  # the end date's rows are at 23:59:59
+
+
+def test_pages_are_disabled_with_zero_page_rows(engine):
+    service = QueryService(RecordingDatabase(engine), StubGenerator(ALL_ROWS), page_rows=0)
+    assert "next_cursor" not in asyncio.run(service.aexecute_query("every close in 2020"))
+    with pytest.raises(InvalidCursorError):
+        asyncio.run(service.aexecute_page(encode_cursor(parse_sql(ALL_ROWS), "2020-06-30 23:59:59", 1)))
@@ -0,0 +1,53 @@
+"""
+Tests for the serialized sql_guard parser cache.
+Run from backend directory: python -m pytest tests/test_parser_cache.py
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from security import sql_guard
+
+SQL = "SELECT AVG(close) AS a FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01' ORDER BY a DESC"
+
+
+def test_cache_file_is_keyed_by_grammar_hash(tmp_path, monkeypatch):
+    monkeypatch.setenv(sql_guard.PARSER_CACHE_DIR_ENV, str(tmp_path))
+    path = sql_guard.parser_cache_path()
+    assert path.parent == tmp_path
+    assert sql_guard.grammar_hash()[:16] in path.name
+
+    monkeypatch.setenv(sql_guard.PARSER_CACHE_DIR_ENV, "")
+    assert sql_guard.parser_cache_path() is None
+
+
+def test_cache_dir_does_not_follow_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = Path(sql_guard.__file__).parent.parent
+    monkeypatch.delenv(sql_guard.PARSER_CACHE_DIR_ENV, raising=False)
+    assert sql_guard.parser_cache_path().parent == backend / ".cache"
+    monkeypatch.setenv(sql_guard.PARSER_CACHE_DIR_ENV, "parsers")
+    assert sql_guard.parser_cache_path().parent == backend / "parsers"
+
+
+def test_loaded_parser_matches_compiled_parser(tmp_path):
+    path = tmp_path / "parser.lark"
+    compiled = sql_guard._load_or_build_parser(path)
+    assert path.exists()
+
+    loaded = sql_guard._load_or_build_parser(path)
+    assert loaded is not compiled
+    assert loaded.parse(SQL) == compiled.parse(SQL)
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_unreadable_cache_is_rebuilt(tmp_path):
+    path = tmp_path / "parser.lark"
+    path.write_bytes(b"not a parser")
+
+    parser = sql_guard._load_or_build_parser(path)
+
+    assert parser.parse(SQL)
+    assert sql_guard._load_or_build_parser(path).parse(SQL) == parser.parse(SQL)
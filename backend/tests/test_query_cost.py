@@ -0,0 +1,137 @@
+"""
+Tests for query cost estimation and admission control.
+Run from backend directory: python -m pytest tests/test_query_cost.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.exceptions import QueryCostError, QueryExecutionError
+from db.query_cost import QueryBudget, admit, clickhouse_settings, estimate_cost
+from security.sql_guard import parse_sql
+from services.query_service import QueryService
+from services.sql_generator import GeneratedSQL, PATH_LLM
+
+YEAR = "WHERE date BETWEEN '2020-01-01' AND '2020-12-31'"
+ALL_ROWS = f"SELECT date, close FROM coin_Bitcoin {YEAR}"
+
+
+class StubGenerator:
+    def __init__(self, sql):
+        self.sql = sql
+
+    async def aresolve(self, question, before_model=None):
+        return GeneratedSQL(self.sql, PATH_LLM)
+
+
+class RecordingDatabase:
+    def __init__(self, error=None):
+        self.error = error
+        self.queries = []
+
+    async def aquery(self, sql):
+        self.queries.append(sql)
+        if self.error:
+            raise self.error
+        return {"columns": ["date", "close"], "rows": [("2020-01-01", 7200.17)]}
+
+
+@pytest.mark.parametrize("sql, rows_scanned, result_rows", [
+    (f"SELECT AVG(close) FROM coin_Bitcoin {YEAR}", 366, 1),
+    (f"SELECT AVG(close) FROM coin_Bitcoin {YEAR} GROUP BY toStartOfDay(date)", 366, 366),
+    # Hourly buckets can't outnumber daily rows
+    (f"SELECT AVG(close) FROM coin_Bitcoin {YEAR} GROUP BY toStartOfHour(date)", 366, 366),
+    (f"{ALL_ROWS} LIMIT 10", 366, 10),
+    ("SELECT close FROM coin_Bitcoin WHERE date = '2020-03-12'", 1, 1),
+    # Clipped to the data range (2013-04-29 to 2021-07-06)
+    ("SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2000-01-01' AND '2030-01-01'", 2991, 2991),
+    ("SELECT close FROM coin_Bitcoin WHERE date >= now() - INTERVAL 48 HOUR", 3, 3),
+])
+def test_estimate_cost(sql, rows_scanned, result_rows):
+    estimate = estimate_cost(parse_sql(sql))
+    assert (estimate.rows_scanned, estimate.result_rows) == (rows_scanned, result_rows)
+    assert estimate.result_bytes == result_rows * len(parse_sql(sql).items) * 8
+
+
+def test_estimate_scales_with_row_density():
+    """Intraday data (e.g. 24 rows per day) scales rows scanned"""
+    estimate = estimate_cost(parse_sql(f"SELECT AVG(close) FROM coin_Bitcoin {YEAR}"), rows_per_day=24)
+    assert estimate.rows_scanned == 365 * 24 + 24
+
+
+def test_admit_within_budget_returns_query_unchanged():
+    query = parse_sql(ALL_ROWS)
+    assert admit(query, QueryBudget()) == (query, None)
+
+
+def test_admit_limits_oversized_row_listings_in_date_order():
+    admitted, warning = admit(parse_sql(ALL_ROWS), QueryBudget(max_result_rows=100))
+    assert admitted.render() == f"{ALL_ROWS} ORDER BY date LIMIT 100"
+    assert "first 100 of about 366 rows" in warning
+
+    # An explicit ORDER BY is kept; the byte budget limits rows too (2 columns x 8 bytes)
+    ordered = parse_sql(f"{ALL_ROWS} ORDER BY close DESC")
+    admitted, _ = admit(ordered, QueryBudget(max_result_bytes=16 * 50))
+    assert admitted.render() == f"{ALL_ROWS} ORDER BY close DESC LIMIT 50"
+
+
+def test_admit_rejects_over_budget():
+    with pytest.raises(QueryCostError, match="scan about 366 rows"):
+        admit(parse_sql(f"SELECT AVG(close) FROM coin_Bitcoin {YEAR}"), QueryBudget(max_rows_to_read=100))
+    with pytest.raises(QueryCostError, match="return about 366 rows"):
+        admit(parse_sql(ALL_ROWS), QueryBudget(max_result_rows=100, over_budget="reject"))
+
+
+def test_budget_from_env(monkeypatch):
+    monkeypatch.setenv("QUERY_MAX_RESULT_ROWS", "500")
+    monkeypatch.setenv("QUERY_OVER_BUDGET", "Reject")
+    budget = QueryBudget.from_env()
+    assert (budget.max_result_rows, budget.over_budget) == (500, "reject")
+
+    monkeypatch.setenv("QUERY_OVER_BUDGET", "truncate")
+    with pytest.raises(ValueError):
+        QueryBudget.from_env()
+
+
+def test_clickhouse_settings_follow_estimate_within_budget():
+    budget = QueryBudget(max_rows_to_read=1_000_000, max_result_rows=5_000, max_execution_seconds=5)
+    small = clickhouse_settings(estimate_cost(parse_sql(ALL_ROWS)), budget)
+    assert small["readonly"] == 1
+    assert small["max_execution_time"] == 5
+    assert small["max_rows_to_read"] == 100_000  # floor: ClickHouse reads whole granules
+    assert small["max_result_rows"] == 366 * 4
+    assert small["result_overflow_mode"] == "throw"
+
+    wide = parse_sql(ALL_ROWS.replace("2020-01-01", "2013-01-01"))
+    settings = clickhouse_settings(estimate_cost(wide, rows_per_day=1440), budget)
+    assert settings["max_rows_to_read"] == 1_000_000
+    assert settings["max_result_rows"] == 5_000
+
+
+def test_query_service_runs_limited_sql_and_warns():
+    database = RecordingDatabase()
+    service = QueryService(database, StubGenerator(ALL_ROWS), budget=QueryBudget(max_result_rows=10))
+    result = asyncio.run(service.aexecute_query("every close in 2020"))
+    assert database.queries == [f"{ALL_ROWS} ORDER BY date LIMIT 10"]
+    assert result["sql"] == database.queries[0]
+    assert "Result limited to the first 10" in result["warning"]
+
+
+def test_query_service_rejects_before_reaching_the_database():
+    database = RecordingDatabase()
+    service = QueryService(database, StubGenerator(ALL_ROWS), budget=QueryBudget(max_rows_to_read=10))
+    with pytest.raises(QueryCostError):
+        asyncio.run(service.aexecute_query("every close in 2020"))
+    assert database.queries == []
+
+
+def test_server_side_limit_errors_are_reported_as_budget_errors():
+    error = RuntimeError("Code: 158. DB::Exception: Limit for rows (controlled by 'max_rows_to_read' setting) exceeded")
+    service = QueryService(RecordingDatabase(error), StubGenerator(ALL_ROWS))
+    with pytest.raises(QueryExecutionError, match="row budget"):
+        asyncio.run(service.aexecute_query("every close in 2020"))
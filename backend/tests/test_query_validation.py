@@ -0,0 +1,69 @@
+"""
+Tests for the natural language query pre-checks.
+Run from backend directory: python -m pytest tests/test_query_validation.py
+"""
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.exceptions import SQLGenerationError
+from utils.query_validation import (
+    SUSPICIOUS_PATTERNS,
+    check_query_input,
+    validate_queries,
+    validate_query_input,
+)
+
+
+def _loop_first_match(question):
+    """The reference behaviour: one re.search per pattern, in order."""
+    for pattern, error_msg in SUSPICIOUS_PATTERNS:
+        if re.search(pattern, question.lower(), re.IGNORECASE):
+            return error_msg
+    return None
+
+
+@pytest.mark.parametrize("question", [
+    "average close price in march 2020",
+    "what was the volume; drop table coin_Bitcoin",
+    "show prices from users",
+    "select * from coin_Bitcoin where name = 'x' or '1'='1",
+    "prices -- ignore the rest",
+    "EXECUTE the plan then grant access",
+    "data FROM coin_bitcoin",
+    "data from coin_Bitcoins",
+    "join us for the update",
+    "ınsert ınto the table",
+    "list ſubquery results",
+    "prices from coin_Bitcoin with password",
+])
+def test_first_match_matches_pattern_loop(question):
+    expected = _loop_first_match(question)
+    error = check_query_input(question)
+    if expected is None:
+        assert error is None
+    else:
+        assert f"Security violation: {expected}." in str(error)
+
+
+def test_validate_query_input_raises():
+    with pytest.raises(SQLGenerationError, match="DELETE operation not allowed"):
+        validate_query_input("delete from coin_Bitcoin")
+    with pytest.raises(SQLGenerationError, match="Encoded characters"):
+        validate_query_input("close price up 5%")
+    with pytest.raises(SQLGenerationError, match="cannot be empty"):
+        validate_query_input("   ")
+    validate_query_input("highest close in 2021")
+
+
+def test_validate_queries_keeps_order():
+    errors = validate_queries(["highest close", "drop table x", "highest close", "exec"])
+
+    assert errors[0] is None and errors[2] is None
+    assert "DROP TABLE" in str(errors[1])
+    assert "EXEC operation" in str(errors[3])
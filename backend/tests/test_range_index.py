@@ -0,0 +1,62 @@
+"""
+Tests for the prefix-sum / sparse-table range aggregate index.
+Run from backend directory: python -m pytest tests/test_range_index.py
+"""
+import math
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.local_client import LocalColumnarClient
+from db.range_index import RangeAggregateIndex
+
+
+@pytest.fixture(scope="module")
+def local():
+    return LocalColumnarClient()
+
+
+@pytest.fixture(scope="module")
+def index(local):
+    return RangeAggregateIndex(local.columns)
+
+
+def test_matches_full_scan_on_random_ranges(local, index):
+    """Index answers agree with the scanning engine for random BETWEEN ranges"""
+    rng = random.Random(7)
+    for _ in range(200):
+        year = rng.randint(2013, 2021)
+        start = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        end = f"{min(year + rng.randint(0, 3), 2021)}-{rng.randint(1, 12):02d}-28"
+        sql = (
+            "SELECT SUM(volume), AVG(close), MIN(low), MAX(high), COUNT(*) "
+            f"FROM coin_Bitcoin WHERE date BETWEEN '{start}' AND '{end}'"
+        )
+        expected = local.query(sql)["rows"][0]
+        actual = index.try_answer(sql)["rows"][0]
+        for a, e in zip(actual, expected):
+            assert (math.isnan(a) and math.isnan(e)) or math.isclose(a, e, rel_tol=1e-9)
+
+
+def test_single_row_range(index):
+    """A one-row range returns that row for MIN and MAX"""
+    result = index.try_answer(
+        "SELECT MIN(close) AS lo, MAX(close) AS hi FROM coin_Bitcoin "
+        "WHERE date BETWEEN '2016-11-15 00:00:00' AND '2016-11-15 23:59:59'"
+    )
+    assert result["columns"] == ["lo", "hi"]
+    lo, hi = result["rows"][0]
+    assert lo == hi
+
+
+def test_declines_non_aggregate_and_grouped_queries(index):
+    """Row-level and grouped queries fall through to the database"""
+    where = "WHERE date BETWEEN '2020-01-01' AND '2020-02-01'"
+    assert index.try_answer(f"SELECT close FROM coin_Bitcoin {where}") is None
+    assert index.try_answer(f"SELECT AVG(close) FROM coin_Bitcoin {where} GROUP BY toStartOfDay(date)") is None
+    assert index.try_answer(f"SELECT AVG(close) FROM coin_Bitcoin {where} LIMIT 0") is None
@@ -0,0 +1,117 @@
+"""
+Tests for SQL canonicalization and the query result cache.
+Run from backend directory: python -m pytest tests/test_result_cache.py
+"""
+import math
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache import result_cache as result_cache_module
+from cache.result_cache import ResultCache, decode_result, encode_result
+from cache.store import SQLiteStore
+from security.sql_guard import canonicalize_sql
+
+SQL = "SELECT AVG(close) AS avg_close FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01'"
+RESULT = {"columns": ["avg_close"], "rows": [(8523.5,)]}
+
+
+def test_canonicalize_ignores_whitespace_case_and_aliases():
+    """Formatting and alias differences produce the same key"""
+    variant = "select   avg(close)  from coin_Bitcoin   where date between '2020-01-01' and '2020-02-01';"
+    assert canonicalize_sql(SQL).key == canonicalize_sql(variant).key
+    assert canonicalize_sql(SQL).aliases == ("avg_close",)
+    assert canonicalize_sql(variant).aliases == (None,)
+
+
+def test_canonicalize_resolves_order_by_alias():
+    """ORDER BY an alias is keyed on the aliased expression"""
+    a = canonicalize_sql(
+        "SELECT MAX(high) AS m FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01' ORDER BY m DESC"
+    )
+    b = canonicalize_sql(
+        "SELECT MAX(high) AS top FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01' ORDER BY top DESC"
+    )
+    assert a.key == b.key
+
+
+def test_blob_round_trip():
+    """Columnar blobs preserve floats, ints, datetimes, strings and NULLs"""
+    result = {
+        "columns": ["date", "close", "n", "label"],
+        "rows": [
+            (datetime(2020, 1, 1, 23, 59, 59), 7200.25, 3, "a"),
+            (datetime(2020, 1, 2, 23, 59, 59), None, 4, None),
+            (None, float("nan"), None, "c"),
+        ],
+    }
+    decoded = decode_result(encode_result(result))
+    assert decoded["columns"] == result["columns"]
+    assert decoded["rows"][0] == result["rows"][0]
+    assert decoded["rows"][1] == result["rows"][1]
+    assert decoded["rows"][2][0] is None
+    assert math.isnan(decoded["rows"][2][1])
+
+
+def test_cache_hit_relabels_columns_with_aliases():
+    """A hit for an alias-free variant is returned with its own column names"""
+    cache = ResultCache()
+    cache.set(SQL, RESULT)
+
+    renamed = SQL.replace("avg_close", "mean")
+    assert cache.get(renamed) == {"columns": ["mean"], "rows": [(8523.5,)]}
+
+    # The natural column name of an unaliased select item is unknown here
+    unaliased = SQL.replace(" AS avg_close", "")
+    assert cache.get(unaliased) is None
+    # and that lookup is a miss, decoded or not
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_unusable_aliases_are_not_decoded(tmp_path, monkeypatch):
+    """An entry stored under an alias this query lacks is a miss in both tiers, without decoding it"""
+    decoded = []
+    monkeypatch.setattr(result_cache_module, "decode_result", lambda blob: decoded.append(blob) or decode_result(blob))
+    store = SQLiteStore(str(tmp_path / "shared.sqlite3"))
+    ResultCache(store=store).set(SQL, RESULT)
+
+    cache = ResultCache(store=store)
+    assert cache.get(SQL.replace(" AS avg_close", "")) is None
+    assert cache.get(SQL.replace(" AS avg_close", "")) is None
+    stats = cache.stats()
+    # The second lookup is refused by the memory tier without asking the store
+    assert (stats["hits"], stats["misses"], stats["store_hits"], stats["store_misses"]) == (0, 2, 0, 1)
+    assert decoded == []
+
+
+def test_relative_queries_bypass_when_ttl_disabled():
+    """now() - INTERVAL queries are not cached when their TTL is 0"""
+    cache = ResultCache(relative_ttl_seconds=0)
+    sql = "SELECT SUM(volume) FROM coin_Bitcoin WHERE date >= now() - INTERVAL 30 HOUR"
+    cache.set(sql, {"columns": ["sum(volume)"], "rows": [(0.0,)]})
+    assert cache.get(sql) is None
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_epoch_bump_invalidates_everything():
+    """Bumping the data version drops every cached result"""
+    cache = ResultCache()
+    cache.set(SQL, RESULT)
+    assert cache.get(SQL) is not None
+
+    cache.bump_epoch()
+    assert cache.get(SQL) is None
+    assert cache.stats()["epoch"] == 1
+
+
+def test_byte_budget_is_enforced():
+    """Entries are evicted once the compressed byte budget is exceeded"""
+    cache = ResultCache(max_bytes=2000)
+    for day in range(1, 20):
+        sql = f"SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-{day:02d}' AND '2020-02-01'"
+        cache.set(sql, {"columns": ["avg(close)"], "rows": [(float(day),)]})
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.stats()["evictions"] > 0
@@ -0,0 +1,87 @@
+"""
+Tests for columnar results and response format negotiation.
+Run from backend directory: python -m pytest tests/test_result_formats.py
+"""
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.columnar import columns_from_numpy_blocks, columns_from_rows
+from utils.result_formats import (
+    FORMAT_ARROW,
+    FORMAT_COLUMNAR,
+    FORMAT_JSON,
+    FORMAT_MSGPACK,
+    UnsupportedFormatError,
+    encode_columnar,
+    negotiate_format,
+)
+
+ROWS = {
+    "columns": ["date", "close", "n"],
+    "rows": [(datetime(2020, 1, 1), 1.5, 3), (datetime(2020, 1, 2), float("nan"), 4)],
+}
+
+
+def test_negotiation_prefers_parameter_then_accept():
+    assert negotiate_format(None, None) == FORMAT_JSON
+    assert negotiate_format(None, "text/html, application/vnd.dripdrop.columnar+json") == FORMAT_COLUMNAR
+    assert negotiate_format("columnar", "application/json") == FORMAT_COLUMNAR
+    assert negotiate_format(None, "*/*") == FORMAT_JSON
+    with pytest.raises(UnsupportedFormatError):
+        negotiate_format("xml", None)
+
+
+def test_columns_from_rows_are_typed():
+    result = columns_from_rows(ROWS)
+    assert [a.dtype.kind for a in result.arrays] == ["M", "f", "i"]
+    assert result.row_count == 2
+    assert result.first_row() == [datetime(2020, 1, 1), 1.5, 3]
+
+
+def test_numpy_blocks_both_layouts():
+    """2-D blocks (uniform dtype) and structured blocks give the same columns"""
+    uniform = columns_from_numpy_blocks(["a", "b"], [np.array([[1.0, 2.0]]), np.array([[3.0, 4.0]])])
+    assert [a.tolist() for a in uniform.arrays] == [[1.0, 3.0], [2.0, 4.0]]
+
+    structured_type = np.dtype([("a", "f8"), ("b", "i8")])
+    block = np.array([(1.0, 2), (3.0, 4)], dtype=structured_type)
+    structured = columns_from_numpy_blocks(["a", "b"], [block])
+    assert [a.tolist() for a in structured.arrays] == [[1.0, 3.0], [2, 4]]
+
+
+def test_columnar_json_nulls_non_finite():
+    body = json.loads(encode_columnar(columns_from_rows(ROWS), "SELECT 1", "database", None))
+    assert body["data"]["columns"] == ["date", "close", "n"]
+    assert body["data"]["values"][1] == [1.5, None]
+    assert body["data"]["values"][0] == ["2020-01-01T00:00:00", "2020-01-02T00:00:00"]
+
+
+def test_arrow_round_trip():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    from utils.result_formats import encode_arrow
+
+    body = encode_arrow(columns_from_rows(ROWS), "SELECT 1", "database", None)
+    table = pyarrow.ipc.open_stream(body).read_all()
+    assert table.column_names == ["date", "close", "n"]
+    assert table.column("close").to_pylist() == [1.5, None]
+    assert table.schema.metadata[b"source"] == b"database"
+
+
+def test_msgpack_typed_buffers():
+    msgpack = pytest.importorskip("msgpack")
+    from utils.result_formats import encode_msgpack
+
+    body = msgpack.unpackb(encode_msgpack(columns_from_rows(ROWS), "SELECT 1", "database", None))
+    n = body["columns"][2]
+    assert np.frombuffer(n["data"], dtype=n["dtype"]).tolist() == [3, 4]
+    assert negotiate_format(None, "application/x-msgpack") == FORMAT_MSGPACK
+    assert negotiate_format("ARROW", None) == FORMAT_ARROW
@@ -0,0 +1,72 @@
+"""
+Tests for the rule-based question -> SQL fast path.
+Run from backend directory: python -m pytest tests/test_rule_sql.py
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from security.sql_guard import parse_sql, sql_equivalent
+from services.rule_sql import rule_sql
+
+EVALS = json.loads((Path(__file__).parent / "cfg_evals.json").read_text())["test_cases"]
+
+
+@pytest.mark.parametrize("question, sql", [
+    (
+        "average close between 2020-08-01 and 2020-11-30",
+        "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-08-01' AND '2020-11-30'",
+    ),
+    (
+        "average close between 2020-08-01 and 2020-08-01",
+        "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-08-01 00:00:00' AND '2020-08-01 23:59:59'",
+    ),
+    (
+        "What was the close on November 15 2016?",
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-11-15 00:00:00' AND '2016-11-15 23:59:59' LIMIT 1",
+    ),
+    (
+        "highest market cap in March 2020",
+        "SELECT MAX(marketcap) FROM coin_Bitcoin WHERE date BETWEEN '2020-03-01 00:00:00' AND '2020-03-31 23:59:59'",
+    ),
+    (
+        "how many days in 2013",
+        "SELECT COUNT(*) FROM coin_Bitcoin WHERE date BETWEEN '2013-04-29 00:00:00' AND '2013-12-31 23:59:59'",
+    ),
+])
+def test_common_phrasings(question, sql):
+    assert rule_sql(question) == sql
+    parse_sql(sql)
+
+
+@pytest.mark.parametrize("question", [
+    "average closing price over the last 7 days",  # relative window
+    "sum the total marketcap in the last 30 hours",  # relative window
+    "average price in 2020",  # which price?
+    "close between 2020-01-01 and 2020-02-01",  # plain values over a range
+    "average close in the last 7 days of 2020",  # two windows
+    "average close between 2020-02-01 and 2020-01-01",  # reversed range
+    "average close on February 30 2020",  # not a date
+    "daily average close in 2020",  # grouping
+    "average close and volume in 2020",  # two columns
+])
+def test_uncertain_questions_fall_through(question):
+    assert rule_sql(question) is None
+
+
+def test_eval_corpus_answers_are_correct():
+    """Every functional eval answered locally matches its expected SQL; no security eval is answered"""
+    answered = 0
+    for case in EVALS:
+        sql = rule_sql(case["question"])
+        if not case.get("should_pass", True):
+            assert sql is None, case["question"]
+        elif sql is not None:
+            answered += 1
+            assert sql_equivalent(sql, case["expected_sql"]), case["question"]
+    assert answered >= 2
@@ -0,0 +1,68 @@
+"""
+Tests for the result sanitizer and the fast JSON response path.
+Run from backend directory: python -m pytest tests/test_serialization.py
+"""
+import gzip
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from starlette.requests import Request
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.data_helpers import sanitize_data_for_json
+from utils.serialization import dumps, json_response
+
+
+def _request(accept_encoding: str) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    })
+
+
+def test_sanitize_replaces_non_finite_floats():
+    """NaN and Infinity become None; other columns are untouched"""
+    data = {
+        "columns": ["date", "close", "count"],
+        "rows": [
+            (datetime(2020, 1, 1), 1.5, 3),
+            (datetime(2020, 1, 2), float("nan"), 4),
+            (datetime(2020, 1, 3), float("-inf"), None),
+        ],
+    }
+    result = sanitize_data_for_json(data)
+    assert [row[1] for row in result["rows"]] == [1.5, None, None]
+    assert [row[2] for row in result["rows"]] == [3, 4, None]
+    assert result["rows"][0][0] == datetime(2020, 1, 1)
+
+
+def test_sanitize_passes_clean_rows_through():
+    """Clean results are not copied"""
+    rows = [(1.0, "a"), (2.0, "b")]
+    assert sanitize_data_for_json({"columns": ["x", "y"], "rows": rows})["rows"] is rows
+
+
+def test_dumps_matches_default_encoding():
+    """Datetimes and tuples encode the way FastAPI's default path does"""
+    content = {"rows": [(datetime(2020, 1, 1, 23, 59, 59), 1.5, None)]}
+    assert json.loads(dumps(content)) == {"rows": [["2020-01-01T23:59:59", 1.5, None]]}
+
+
+def test_large_responses_are_compressed():
+    """Bodies over the threshold are gzipped when the client accepts it"""
+    content = {"rows": [[i, float(i)] for i in range(1000)]}
+    response = json_response(content, _request("gzip"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.body)) == json.loads(dumps(content))
+
+    plain = json_response(content, _request("identity"))
+    assert "content-encoding" not in plain.headers
+
+
+def test_small_responses_are_not_compressed():
+    response = json_response({"ok": True}, _request("gzip, br"))
+    assert "content-encoding" not in response.headers
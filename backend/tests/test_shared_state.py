@@ -0,0 +1,210 @@
+"""
+Tests for cache and rate-limit state shared by several workers through one store.
+Run from backend directory: python -m pytest tests/test_shared_state.py
+"""
+import fnmatch
+import multiprocessing
+import sys
+from pathlib import Path
+
+import pytest
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.rate_limiter import SQLiteLimitStorage, storage_uri, warn_if_unshared
+from cache import result_cache as result_cache_module
+from cache.result_cache import ResultCache
+from cache.sql_cache import SQLCache
+from cache.store import RedisStore, SQLiteStore, StoreUnavailable
+
+SQL = "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01'"
+RESULT = {"columns": ["avg_close"], "rows": [(8523.5,)]}
+WORKERS = 4
+# Rate-limited requests each worker makes for the same client
+HITS = 3
+
+
+class FakeRedis:
+    """Local stand-in for a Redis server: the redis-py calls RedisStore makes, over a dict."""
+
+    def __init__(self, data=None):
+        self.data = {} if data is None else data
+        self.down = False
+        self.calls = 0
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("connection refused")
+
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self._check()
+        self.data[key] = value
+
+    def delete(self, *keys):
+        self._check()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match, count=None):
+        self._check()
+        return [key for key in list(self.data.keys()) if fnmatch.fnmatch(key, match)]
+
+
+def _query(index: int) -> str:
+    return SQL.replace("2020-01-01", f"2020-01-0{index + 1}")
+
+
+def _worker(make_store, make_limit_storage, index, barrier, results):
+    """One worker process: publish its own entries and hits, then read everyone's."""
+    store = make_store()
+    sql_cache = SQLCache(fingerprint="v1", store=store)
+    result_cache = ResultCache(store=store)
+    limit = parse(f"{WORKERS * HITS}/minute")
+    rate_limiter = FixedWindowRateLimiter(make_limit_storage()) if make_limit_storage else None
+
+    sql_cache.set(f"question {index}", "gpt-a", SQL)
+    result_cache.set(_query(index), RESULT)
+    allowed = sum(rate_limiter.hit(limit, "client") for _ in range(HITS)) if rate_limiter else None
+    barrier.wait(10)
+
+    sql_hits = sum(sql_cache.get(f"question {i}", "gpt-a") == SQL for i in range(WORKERS))
+    result_hits = sum(result_cache.get(_query(i)) is not None for i in range(WORKERS))
+    # Every worker's hits count against the one budget, which is now used up
+    counted = (allowed, rate_limiter.get_window_stats(limit, "client").remaining) if rate_limiter else None
+    results.put((index, sql_hits, result_hits, counted))
+
+
+def _run_workers(make_store, make_limit_storage=None):
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(make_store, make_limit_storage, i, barrier, results))
+        for i in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = sorted(results.get(timeout=20) for _ in processes)
+    for process in processes:
+        process.join(10)
+        assert process.exitcode == 0
+    return outcomes
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_workers_share_one_store(tmp_path, backend):
+    """Entries written by any worker are hits in every other worker"""
+    if backend == "sqlite":
+        path = str(tmp_path / "shared.sqlite3")
+
+        def make_store():
+            return SQLiteStore(path)
+
+        def make_limit_storage():
+            return SQLiteLimitStorage(f"sqlite://{path}")
+
+        outcomes = _run_workers(make_store, make_limit_storage)
+        assert [counted for *_, counted in outcomes] == [(HITS, 0)] * WORKERS
+    else:
+        with multiprocessing.get_context("fork").Manager() as manager:
+            data = manager.dict()
+
+            def make_store():
+                return RedisStore(client=FakeRedis(data))
+
+            outcomes = _run_workers(make_store)
+
+    assert [outcome[:3] for outcome in outcomes] == [(i, WORKERS, WORKERS) for i in range(WORKERS)]
+
+
+def test_sqlite_rate_limits_expire_and_reset(tmp_path):
+    """Counters restart after their window and can be cleared"""
+    storage = SQLiteLimitStorage(f"sqlite://{tmp_path / 'shared.sqlite3'}")
+    assert storage.incr("k", expiry=60) == 1
+    assert storage.incr("k", expiry=60, amount=2) == 3
+    assert storage.get("k") == 3
+    assert storage.get_expiry("k") > 0
+
+    assert storage.incr("short", expiry=0) == 1
+    assert storage.get("short") == 0
+    assert storage.incr("short", expiry=60) == 1
+
+    storage.clear("k")
+    assert storage.get("k") == 0
+    assert storage.reset() == 1
+    assert storage.check()
+
+
+def test_rate_limit_storage_follows_shared_state(monkeypatch, caplog):
+    """SHARED_STATE_URL selects the rate-limit storage; unshared limits with several workers warn"""
+    monkeypatch.delenv("RATE_LIMIT_STORAGE_URI", raising=False)
+    monkeypatch.setenv("SHARED_STATE_URL", "/dev/shm/dripdrop.sqlite3")
+    assert storage_uri() == "sqlite:///dev/shm/dripdrop.sqlite3"
+    monkeypatch.setenv("SHARED_STATE_URL", "redis://localhost:6379/0")
+    assert storage_uri() == "redis://localhost:6379/0"
+    monkeypatch.delenv("SHARED_STATE_URL")
+    assert storage_uri() == "memory://"
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert warn_if_unshared("memory://")
+    assert "4 workers with in-memory rate limits" in caplog.text
+    assert not warn_if_unshared("sqlite:///dev/shm/dripdrop.sqlite3")
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert not warn_if_unshared("memory://")
+
+
+def test_epoch_bump_reaches_other_workers(tmp_path, monkeypatch):
+    """An epoch bump in one worker invalidates results cached by another"""
+    monkeypatch.setattr(result_cache_module, "EPOCH_CHECK_SECONDS", 0)
+    path = str(tmp_path / "shared.sqlite3")
+    writer = ResultCache(store=SQLiteStore(path))
+    reader = ResultCache(store=SQLiteStore(path))
+
+    writer.set(SQL, RESULT)
+    assert reader.get(SQL) is not None
+
+    assert writer.bump_epoch() == 1
+    assert reader.get(SQL) is None
+    assert reader.stats()["epoch"] == 1
+
+
+def test_store_outage_falls_back_to_process_state():
+    """An unreachable store degrades to the in-process tier and is retried later"""
+    client = FakeRedis()
+    store = RedisStore(client=client, retry_seconds=60)
+    cache = SQLCache(fingerprint="v1", store=store)
+
+    client.down = True
+    cache.set("q", "m", SQL)
+    assert cache.get("q", "m") == SQL
+    assert cache.get("other", "m") is None
+    assert cache.stats()["store_errors"] == 2
+
+    # Marked down after the first failure, so later calls skip the server
+    assert client.calls == 1
+    with pytest.raises(StoreUnavailable):
+        store.get("q")
+
+
+def test_redis_store_clear_only_touches_prefix():
+    """clear() leaves keys outside the store's namespace alone"""
+    client = FakeRedis({"other:key": b"keep"})
+    store = RedisStore(client=client, prefix="dripdrop:")
+    store.set("a", b"1", ttl_seconds=5)
+    store.set("b", b"2")
+    assert store.get("a") == b"1"
+
+    store.clear()
+    assert store.get("a") is None
+    assert client.data == {"other:key": b"keep"}
@@ -0,0 +1,122 @@
+"""
+Tests for single-flight coalescing of identical in-flight calls.
+Run from backend directory: python -m pytest tests/test_single_flight.py
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    """Threads asking for the same key while a call is in flight wait for it"""
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "SELECT 1"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("q", upstream)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.coalesced < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["SELECT 1"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "errors": 0, "in_flight": 0}
+
+
+def test_async_waiters_share_result_and_error():
+    """Coroutines share one call; its exception reaches every waiter"""
+    flight = SingleFlight("test")
+    calls = []
+
+    async def upstream(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise ValueError("upstream failed")
+        return value
+
+    async def run():
+        ok = await asyncio.gather(*[flight.ado("a", lambda: upstream("ok")) for _ in range(3)])
+        bad = await asyncio.gather(
+            *[flight.ado("b", lambda: upstream("bad")) for _ in range(3)],
+            return_exceptions=True,
+        )
+        return ok, bad
+
+    ok, bad = asyncio.run(run())
+
+    assert ok == ["ok"] * 3
+    assert all(isinstance(e, ValueError) and "upstream failed" in str(e) for e in bad)
+    assert calls == ["ok", "bad"]
+    assert flight.stats() == {"calls": 2, "coalesced": 4, "errors": 1, "in_flight": 0}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    """A disconnecting client leaves the call running for the other waiters"""
+    flight = SingleFlight("test")
+
+    async def upstream():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def run():
+        first = asyncio.ensure_future(flight.ado("k", upstream))
+        second = asyncio.ensure_future(flight.ado("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 42
+
+
+def test_only_the_leader_runs_on_lead():
+    """on_lead runs for the caller that starts the call; refusing it starts nothing"""
+    flight = SingleFlight("test")
+    leads = []
+
+    def refuse():
+        raise PermissionError("refused")
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run():
+        with pytest.raises(PermissionError):
+            await flight.ado("k", upstream, on_lead=refuse)
+        return await asyncio.gather(*[flight.ado("k", upstream, on_lead=lambda: leads.append(1)) for _ in range(3)])
+
+    assert asyncio.run(run()) == [42] * 3
+    assert leads == [1]
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "errors": 0, "in_flight": 0}
+
+
+def test_sequential_calls_are_not_coalesced():
+    """Nothing is kept once a call finishes"""
+    flight = SingleFlight("test")
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.stats()["calls"] == 2
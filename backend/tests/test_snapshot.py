@@ -0,0 +1,107 @@
+"""
+Tests for the memory-mapped columnar snapshot of the CSV export.
+Run from backend directory: python -m pytest tests/test_snapshot.py
+"""
+import shutil
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.ingest import CSVStore, parse_csv
+from db.local_client import DEFAULT_DATA_PATH, LocalColumnarClient, load_columns
+from db.snapshot import open_snapshot, snapshot_path, write_snapshot
+
+NEW_ROWS = "Date,Open,High,Low,Close,Volume,Marketcap\n2021-07-07 23:59:59,1,2,0.5,1.5,10,20\n"
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "coin_Bitcoin.csv"
+    shutil.copy(DEFAULT_DATA_PATH, path)
+    return path
+
+
+@pytest.fixture
+def snapshot(csv_path):
+    store = CSVStore(csv_path)
+    return write_snapshot(store.read_new(), csv_path, store.offset)
+
+
+def _assert_columns_equal(actual, expected):
+    assert list(actual) == list(expected)
+    for name, values in expected.items():
+        assert actual[name].dtype == values.dtype
+        assert np.array_equal(actual[name], values, equal_nan=True)
+
+
+def test_snapshot_maps_the_csv_columns(csv_path, snapshot):
+    assert snapshot == snapshot_path(csv_path)
+    mapped = open_snapshot(snapshot, csv_path)
+    _assert_columns_equal(mapped.columns, load_columns(csv_path))
+    assert mapped.source_bytes == csv_path.stat().st_size
+    # Views of the shared mapping, never private copies
+    assert not any(values.flags.writeable for values in mapped.columns.values())
+
+
+def test_store_resumes_after_the_snapshot(csv_path, snapshot):
+    store = CSVStore(csv_path)
+    _assert_columns_equal(store.load(), load_columns(csv_path))
+    assert store.offset == csv_path.stat().st_size
+    assert store.last_row[:4] == ["2991", "Bitcoin", "BTC", "2021-07-06 23:59:59"]
+    assert not store.has_new_rows()
+
+    # Appending continues the file as if it had been parsed
+    store.append(parse_csv(NEW_ROWS))
+    assert csv_path.read_text().splitlines()[-1].startswith("2992,Bitcoin,BTC,2021-07-07 23:59:59,")
+
+
+def test_rows_after_the_snapshot_are_parsed_from_the_csv(csv_path, snapshot):
+    CSVStore(csv_path).append(parse_csv(NEW_ROWS))
+    # The snapshot still matches the prefix it covers
+    assert open_snapshot(snapshot, csv_path) is not None
+
+    columns = CSVStore(csv_path).load()
+    _assert_columns_equal(columns, load_columns(csv_path))
+    assert len(columns["date"]) == 2992
+
+
+def test_stale_snapshot_is_ignored(csv_path, snapshot):
+    text = csv_path.read_text()
+    # Same size, different last row
+    csv_path.write_text(text[:-3] + "10\n")
+    assert open_snapshot(snapshot, csv_path) is None
+    _assert_columns_equal(CSVStore(csv_path).load(), load_columns(csv_path))
+
+    # Shorter file
+    csv_path.write_text(text[:len(text) // 2].rsplit("\n", 1)[0] + "\n")
+    assert open_snapshot(snapshot, csv_path) is None
+
+
+@pytest.mark.parametrize("offset, value", [
+    (0, b"NOTASNAP"),  # magic
+    (8, struct.pack("<I", 99)),  # format version
+    (16, struct.pack("<Q", 5)),  # row count (header checksum)
+])
+def test_corrupt_or_other_version_snapshot_is_ignored(csv_path, snapshot, offset, value):
+    data = bytearray(snapshot.read_bytes())
+    data[offset:offset + len(value)] = value
+    snapshot.write_bytes(bytes(data))
+    assert open_snapshot(snapshot, csv_path) is None
+
+
+def test_truncated_snapshot_is_ignored(csv_path, snapshot):
+    snapshot.write_bytes(snapshot.read_bytes()[:-1000])
+    assert open_snapshot(snapshot, csv_path) is None
+
+
+def test_local_client_loads_from_the_snapshot(csv_path, snapshot):
+    client = LocalColumnarClient(str(csv_path))
+    assert not client.columns["date"].flags.writeable
+    sql = "SELECT AVG(close), COUNT(*) FROM coin_Bitcoin WHERE date BETWEEN '2021-01-01' AND '2021-07-06'"
+    assert client.query(sql) == LocalColumnarClient(columns=load_columns(csv_path)).query(sql)
@@ -0,0 +1,82 @@
+"""
+Tests for the typed SQL AST produced by sql_guard.parse_sql.
+Run from backend directory: python -m pytest tests/test_sql_ast.py
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from security.sql_ast import DateFilter, OrderItem, SelectItem
+from security.sql_guard import parse_sql, sql_equivalent
+from utils.date_helpers import extract_dates_from_sql
+
+GROUPED = (
+    "select avg(close) as a, count(*) from coin_Bitcoin "
+    "where date between '2020-01-01' and '2020-02-01' and date >= now() - interval 3 day "
+    "group by toStartOfDay(date) order by a desc, close limit 5"
+)
+
+
+def test_parse_builds_typed_nodes():
+    query = parse_sql(GROUPED)
+    assert query.items == (SelectItem("avg", "close", "a"), SelectItem("count", None))
+    assert query.filters == (
+        DateFilter("between", "2020-01-01", "2020-02-01"),
+        DateFilter("interval", amount=3, unit="DAY"),
+    )
+    assert query.group_by == "day"
+    assert query.order_by == (OrderItem("a", "DESC"), OrderItem("close"))
+    assert query.limit == 5
+    assert query.is_relative
+
+
+def test_render_round_trips():
+    query = parse_sql(GROUPED)
+    assert parse_sql(query.render()) == query
+
+
+def test_repeated_parses_share_one_ast():
+    assert parse_sql(GROUPED) is parse_sql(GROUPED)
+
+
+def test_full_day_filters():
+    query = parse_sql("SELECT close FROM coin_Bitcoin WHERE date = '2016-11-15'")
+    assert query.with_full_day_filters().render() == (
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-11-15 00:00:00' AND '2016-11-15 23:59:59'"
+    )
+    multi_day = parse_sql("SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-11-15' AND '2016-11-16'")
+    assert multi_day.with_full_day_filters() is multi_day
+
+
+def test_date_bounds_intersect_filters():
+    sql = (
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-01-01' AND '2016-12-31' "
+        "AND date BETWEEN '2016-06-01 00:00:00' AND '2017-01-31 23:59:59'"
+    )
+    assert extract_dates_from_sql(sql) == ("2016-06-01", "2016-12-31")
+    assert extract_dates_from_sql("not sql") == (None, None)
+
+
+@pytest.mark.parametrize("a, b, equal", [
+    (
+        "SELECT close FROM coin_Bitcoin WHERE date BETWEEN '2016-11-15 00:00:00' AND '2016-11-15 23:59:59' LIMIT 1",
+        "select close as c from coin_Bitcoin where date = '2016-11-15'",
+        True,
+    ),
+    (
+        "SELECT MAX(high) AS m FROM coin_Bitcoin WHERE date = '2020-01-01' ORDER BY m DESC",
+        "SELECT max(high) FROM coin_Bitcoin WHERE date = '2020-01-01' ORDER BY max_high DESC",
+        False,
+    ),
+    (
+        "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2021-06-30' AND '2021-07-06'",
+        "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2021-06-30' AND '2021-07-05'",
+        False,
+    ),
+])
+def test_structural_equivalence(a, b, equal):
+    assert sql_equivalent(a, b) is equal
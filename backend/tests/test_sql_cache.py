@@ -0,0 +1,72 @@
+"""
+Tests for the tiered question -> SQL cache.
+Run from backend directory: python -m pytest tests/test_sql_cache.py
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache.lru import TTLCache
+from cache.sql_cache import SQLCache, normalize_prompt
+from cache.store import SQLiteStore
+
+SQL = "SELECT AVG(close) FROM coin_Bitcoin WHERE date BETWEEN '2020-01-01' AND '2020-02-01'"
+
+
+def test_normalize_prompt():
+    """Whitespace, case and trailing punctuation do not change the key"""
+    assert normalize_prompt("  Average   CLOSE in 2020? ") == "average close in 2020"
+
+
+def test_lru_eviction_and_counters():
+    """Least recently used entry is evicted once the size bound is reached"""
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_ttl_expiry():
+    """Entries are dropped once their TTL has passed"""
+    cache = TTLCache(max_entries=10, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sql_cache_keys_include_model_and_fingerprint():
+    """Different models or grammar fingerprints never share entries"""
+    cache = SQLCache(fingerprint="v1")
+    cache.set("average close in 2020", "gpt-a", SQL)
+
+    assert cache.get("Average close in 2020?", "gpt-a") == SQL
+    assert cache.get("average close in 2020", "gpt-b") is None
+    assert SQLCache(fingerprint="v2").key("q", "m") != cache.key("q", "m")
+
+
+def test_sql_cache_store_tier_survives_restart(tmp_path):
+    """A new process-local cache is warmed from the shared SQLite tier"""
+    path = str(tmp_path / "sql_cache.sqlite3")
+    SQLCache(fingerprint="v1", store=SQLiteStore(path)).set("q", "m", SQL)
+
+    restarted = SQLCache(fingerprint="v1", store=SQLiteStore(path))
+    assert restarted.get("q", "m") == SQL
+    assert restarted.stats()["store_hits"] == 1
+
+    # Promoted to the in-process tier on the first hit
+    assert restarted.get("q", "m") == SQL
+    assert restarted.stats()["memory_hits"] == 1
+
+    # A grammar change invalidates what is on disk
+    assert SQLCache(fingerprint="v2", store=SQLiteStore(path)).get("q", "m") is None
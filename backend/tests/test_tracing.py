@@ -0,0 +1,109 @@
+"""
+Tests for per-request tracing, Server-Timing headers and span export.
+Run from backend directory: python -m pytest tests/test_tracing.py
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import from backend modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.middleware import TracingMiddleware
+from utils.metrics import stage
+from utils.tracing import BackgroundExporter, JsonLinesExporter, OTLPExporter, Trace, current_trace
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, traces):
+        self.traces.extend(traces)
+
+
+def _call(app, path="/query", headers=()):
+    """Drive an ASGI app with one request; return the response start message."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]
+
+
+async def pipeline_app(scope, receive, send):
+    """Stands in for the API: runs two stages, one in a gathered task, then responds."""
+    async def llm():
+        with stage("llm"):
+            await asyncio.sleep(0.01)
+
+    with stage("prevalidate"):
+        pass
+    await asyncio.gather(llm())
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def test_server_timing_header_and_export():
+    """Stages become spans, summarized in Server-Timing and exported when done"""
+    sink = ListExporter()
+    exporter = BackgroundExporter([sink])
+    start = _call(TracingMiddleware(pipeline_app, exporter=exporter))
+
+    header = dict(start["headers"])[b"server-timing"].decode()
+    names = [metric.split(";")[0] for metric in header.split(", ")]
+    assert names == ["prevalidate", "llm", "total"]
+
+    exporter.flush()
+    (trace,) = sink.traces
+    assert trace.name == "POST /query"
+    assert trace.status_code == 200
+    assert trace.timings()["llm"] >= 10
+    assert current_trace() is None
+
+
+def test_page_requests_are_traced():
+    start = _call(TracingMiddleware(pipeline_app, exporter=BackgroundExporter([ListExporter()])), path="/query/page")
+    assert b"server-timing" in dict(start["headers"])
+
+
+def test_untraced_paths_pass_through():
+    exporter = BackgroundExporter([ListExporter()])
+    start = _call(TracingMiddleware(pipeline_app, exporter=exporter), path="/health")
+    assert b"server-timing" not in dict(start["headers"])
+
+
+def test_traceparent_joins_caller_trace():
+    trace = Trace("POST /query", "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    assert trace.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert trace.parent_span_id == "b7ad6b7169203331"
+
+
+def test_json_lines_and_otlp_payload(tmp_path):
+    """Both exporters describe the root span and one child per stage"""
+    trace = Trace("POST /query")
+    trace.add_span("database", trace.start + 0.001, trace.start + 0.004, "QueryExecutionError")
+    trace.finish(400)
+
+    path = tmp_path / "traces.jsonl"
+    JsonLinesExporter(str(path)).export([trace])
+    record = json.loads(path.read_text())
+    assert record["status_code"] == 400
+    assert record["spans"][0]["name"] == "database"
+    assert record["spans"][0]["error"] == "QueryExecutionError"
+    assert abs(record["spans"][0]["duration_ms"] - 3) < 0.01
+
+    payload = OTLPExporter("http://localhost:4318/v1/traces")._payload([trace])
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["POST /query", "database"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"] == trace.span_id
+    assert spans[1]["status"] == {"code": 2}
+    duration_ns = int(spans[1]["endTimeUnixNano"]) - int(spans[1]["startTimeUnixNano"])
+    assert abs(duration_ns - 3_000_000) < 1000
@@ -4,32 +4,89 @@ Data sanitization and transformation utilities.
 import math
 from typing import Any
 
+import numpy as np
+
+
+def _sanitize_value(value: Any) -> Any:
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if math.isinf(value):
+            return None
+    elif isinstance(value, (list, tuple)):
+        return [_sanitize_value(v) for v in value]
+    elif isinstance(value, dict):
+        return {k: _sanitize_value(v) for k, v in value.items()}
+    return value
+
+
+def sanitize_rows(rows: list) -> list:
+    """
+    Convert NaN, Infinity values to None in a list of rows (or one streamed block).
+    
+    Args:
+        rows: Row tuples or lists
+        
+    Returns:
+        List of sanitized rows (each row as a list)
+    """
+    return [_sanitize_value(row) for row in rows]
+
+
+def _sanitize_column(values: tuple) -> Any:
+    """
+    Sanitize one result column.
+    
+    Float columns are checked with a single vectorized isfinite pass. Columns
+    that need no changes are returned unchanged (the caller can then skip
+    rebuilding the rows).
+    
+    Returns:
+        The original values, or a sanitized list
+    """
+    first = next((v for v in values if v is not None), None)
+    if isinstance(first, float):
+        try:
+            array = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return [_sanitize_value(v) for v in values]
+        bad = ~np.isfinite(array)
+        if not bad.any():
+            return values
+        sanitized = list(values)
+        for i in np.flatnonzero(bad):
+            sanitized[i] = None
+        return sanitized
+    if isinstance(first, (list, tuple, dict)):
+        return [_sanitize_value(v) for v in values]
+    if first is None or any(isinstance(v, float) for v in values):
+        # Mixed columns: fall back to the per-value walk
+        return [_sanitize_value(v) for v in values]
+    return values
+
 
 def sanitize_data_for_json(data: dict) -> dict:
     """
     Convert NaN, Infinity values to None for JSON serialization.
     ClickHouse may return NaN/Infinity which aren't JSON compliant.
     
+    Works column by column: each float column is checked in one vectorized
+    pass, and when no column needs changes the rows are passed through
+    without being copied.
+    
     Args:
         data: Dictionary with 'columns' and 'rows' keys
         
     Returns:
         Sanitized dictionary with NaN/Infinity converted to None
     """
-    def sanitize_value(value: Any) -> Any:
-        if isinstance(value, float):
-            if math.isnan(value):
-                return None
-            if math.isinf(value):
-                return None
-        elif isinstance(value, (list, tuple)):
-            return [sanitize_value(v) for v in value]
-        elif isinstance(value, dict):
-            return {k: sanitize_value(v) for k, v in value.items()}
-        return value
-
+    rows = data.get("rows", [])
+    columns = list(zip(*rows)) if rows else []
+    sanitized = [_sanitize_column(values) for values in columns]
+    if all(new is old for new, old in zip(sanitized, columns)):
+        return {"columns": data.get("columns", []), "rows": rows}
     return {
         "columns": data.get("columns", []),
-        "rows": [sanitize_value(row) for row in data.get("rows", [])]
+        "rows": [list(row) for row in zip(*sanitized)],
     }
 
@@ -1,12 +1,14 @@
 """
 Date extraction and validation utilities.
 """
-import re
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 
-from core.constants import DATA_MIN_DATE, DATA_MAX_DATE, MAX_DATE_RANGE_DAYS
+from core.constants import MAX_DATE_RANGE_DAYS
+from core.data_bounds import data_bounds
 from core.exceptions import DateRangeError
+from security.sql_ast import SelectQuery
+from security.sql_guard import parse_sql
 
 
 def extract_dates_from_sql(sql: str) -> Tuple[Optional[str], Optional[str]]:
@@ -17,67 +19,63 @@ def extract_dates_from_sql(sql: str) -> Tuple[Optional[str], Optional[str]]:
         sql: SQL query string
         
     Returns:
-        Tuple of (min_date, max_date) or (None, None) if not found
+        Tuple of (min_date, max_date) as YYYY-MM-DD, or (None, None) if not
+        found or the SQL doesn't parse
     """
-    # Pattern for date = 'YYYY-MM-DD' (equality)
-    equals_pattern = r"date\s*=\s+['\"](\d{4}-\d{2}-\d{2})['\"]"
-    equals_match = re.search(equals_pattern, sql, re.IGNORECASE)
-    if equals_match:
-        date_value = equals_match.group(1)
-        return date_value, date_value
+    try:
+        query = parse_sql(sql)
+    except ValueError:
+        return None, None
+    return extract_query_dates(query)
 
-    # Pattern for BETWEEN 'YYYY-MM-DD' AND 'YYYY-MM-DD' or BETWEEN 'YYYY-MM-DD HH:MM:SS' AND 'YYYY-MM-DD HH:MM:SS'
-    # Extract just the date part (YYYY-MM-DD) from DateTime strings
-    between_pattern = r"date\s+BETWEEN\s+['\"](\d{4}-\d{2}-\d{2})(?:\s+\d{2}:\d{2}:\d{2})?['\"]\s+AND\s+['\"](\d{4}-\d{2}-\d{2})(?:\s+\d{2}:\d{2}:\d{2})?['\"]"
-    match = re.search(between_pattern, sql, re.IGNORECASE)
-    if match:
-        return match.group(1), match.group(2)
 
-    # Pattern for date >= 'YYYY-MM-DD' or date <= 'YYYY-MM-DD'
-    gte_pattern = r"date\s*>=\s+['\"](\d{4}-\d{2}-\d{2})['\"]"
-    lte_pattern = r"date\s*<=\s+['\"](\d{4}-\d{2}-\d{2})['\"]"
-
-    min_date = None
-    max_date = None
-
-    gte_match = re.search(gte_pattern, sql, re.IGNORECASE)
-    if gte_match:
-        min_date = gte_match.group(1)
-
-    lte_match = re.search(lte_pattern, sql, re.IGNORECASE)
-    if lte_match:
-        max_date = lte_match.group(1)
-
-    return min_date, max_date
+def extract_query_dates(query: SelectQuery) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Effective date bounds of a parsed query (date part only).
+    
+    Args:
+        query: AST returned by parse_sql
+        
+    Returns:
+        Tuple of (min_date, max_date); either is None when not constrained by
+        an explicit date (e.g. now() - INTERVAL filters)
+    """
+    start, end = query.date_bounds()
+    return (start[:10] if start else None), (end[:10] if end else None)
 
 
-def validate_date_range(sql: str) -> None:
+def validate_date_range(sql: Union[str, SelectQuery]) -> None:
     """
-    Validate that dates in SQL query are within the data range.
+    Validate that dates in SQL query are within the data range (the current
+    bounds, which move as rows are ingested).
     
     Args:
-        sql: SQL query string
+        sql: SQL query string, or an already parsed query
         
     Raises:
         DateRangeError: If dates are out of range or invalid
     """
-    min_date, max_date = extract_dates_from_sql(sql)
+    if isinstance(sql, SelectQuery):
+        min_date, max_date = extract_query_dates(sql)
+    else:
+        min_date, max_date = extract_dates_from_sql(sql)
 
     if min_date is None and max_date is None:
         # No explicit dates found, might be using now() - INTERVAL
-        # We'll let it pass but note that data ends in 2021
+        # We'll let it pass but note that the data ends before now()
         return
 
-    if min_date and min_date < DATA_MIN_DATE:
+    bounds = data_bounds()
+    if min_date and min_date < bounds.min_date:
         raise DateRangeError(
             f"Query date '{min_date}' is before the earliest data available. "
-            f"Data is available from {DATA_MIN_DATE} to {DATA_MAX_DATE}."
+            f"Data is available from {bounds.min_date} to {bounds.max_date}."
         )
 
-    if max_date and max_date > DATA_MAX_DATE:
+    if max_date and max_date > bounds.max_date:
         raise DateRangeError(
             f"Query date '{max_date}' is after the latest data available. "
-            f"Data is available from {DATA_MIN_DATE} to {DATA_MAX_DATE}."
+            f"Data is available from {bounds.min_date} to {bounds.max_date}."
         )
 
     if min_date and max_date and min_date > max_date:
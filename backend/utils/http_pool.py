@@ -0,0 +1,164 @@
+"""
+Metered, configurable HTTP connection pools for outbound API clients.
+
+The OpenAI SDK talks HTTP through httpx. These transports size its
+connection pool from the environment and count what the pool does: how
+many requests reused a kept-alive connection versus opening a new one
+(via httpcore's "trace" request extension), and how often requests found
+every connection busy and had to queue.
+
+Each worker process builds its own pools (nothing here survives a fork).
+"""
+import threading
+from typing import Optional
+
+try:
+    # openai>=3 is built on the httpx2 fork; transports must come from the
+    # same package as the SDK's client
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+from core.config import get_env
+from core.constants import (
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+)
+
+# Environment variable names
+OPENAI_MAX_CONNECTIONS_ENV = "OPENAI_MAX_CONNECTIONS"
+OPENAI_MAX_KEEPALIVE_ENV = "OPENAI_MAX_KEEPALIVE_CONNECTIONS"
+OPENAI_KEEPALIVE_EXPIRY_ENV = "OPENAI_KEEPALIVE_EXPIRY_SECONDS"
+
+# httpcore trace event emitted once per newly opened TCP connection
+_CONNECT_EVENT = "connection.connect_tcp.complete"
+
+
+def openai_limits() -> httpx.Limits:
+    """
+    Connection pool limits for the OpenAI client from environment configuration.
+
+    Returns:
+        httpx.Limits
+    """
+    return httpx.Limits(
+        max_connections=int(get_env(OPENAI_MAX_CONNECTIONS_ENV, str(OPENAI_MAX_CONNECTIONS))),
+        max_keepalive_connections=int(
+            get_env(OPENAI_MAX_KEEPALIVE_ENV, str(OPENAI_MAX_KEEPALIVE_CONNECTIONS))
+        ),
+        keepalive_expiry=float(
+            get_env(OPENAI_KEEPALIVE_EXPIRY_ENV, str(OPENAI_KEEPALIVE_EXPIRY_SECONDS))
+        ),
+    )
+
+
+class PoolMetrics:
+    """
+    Counters for one connection pool.
+
+    A request is counted as in flight until its response headers arrive.
+    """
+
+    def __init__(self, max_connections: Optional[int]):
+        """
+        Initialize the counters.
+
+        Args:
+            max_connections: Pool size (None means unbounded)
+        """
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queued = 0  # requests that started while every connection was busy
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            if self.max_connections is not None and self.in_flight >= self.max_connections:
+                self.queued += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def stats(self) -> dict:
+        """
+        Snapshot of pool counters.
+
+        Returns:
+            Dictionary of counters, with reuse and saturation ratios
+        """
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "max_connections": self.max_connections,
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "reused": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "saturation": (
+                    self.in_flight / self.max_connections if self.max_connections else 0.0
+                ),
+                "queued": self.queued,
+            }
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """httpx transport that records PoolMetrics for its connection pool."""
+
+    def __init__(self, limits: httpx.Limits, **kwargs):
+        super().__init__(limits=limits, **kwargs)
+        self.metrics = PoolMetrics(limits.max_connections)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        previous = request.extensions.get("trace")
+
+        def trace(event_name: str, info: dict) -> None:
+            if event_name == _CONNECT_EVENT:
+                self.metrics.connected()
+            if previous is not None:
+                previous(event_name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        self.metrics.started()
+        try:
+            return super().handle_request(request)
+        finally:
+            self.metrics.finished()
+
+
+class AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    """Async variant of MeteredTransport."""
+
+    def __init__(self, limits: httpx.Limits, **kwargs):
+        super().__init__(limits=limits, **kwargs)
+        self.metrics = PoolMetrics(limits.max_connections)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        previous = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict) -> None:
+            if event_name == _CONNECT_EVENT:
+                self.metrics.connected()
+            if previous is not None:
+                await previous(event_name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        self.metrics.started()
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.metrics.finished()
+
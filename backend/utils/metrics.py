@@ -0,0 +1,271 @@
+"""
+In-process metrics for the query pipeline, rendered in Prometheus text format.
+
+Counters, gauges and histograms are plain objects updated under a lock, so
+recording a sample costs about a microsecond and the metrics can stay on in
+production. Each worker process keeps its own registry; scrape every worker
+(or run one worker per scrape target) when running several.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.tracing import current_trace
+
+# Latency buckets in seconds: sub-millisecond cache hits up to slow LLM calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Result row-count buckets
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for a metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = self._header()
+        for label_values, value in sorted(values):
+            lines.append(f"{self.name}{_labels(self.labelnames, label_values)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination."""
+
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. requests in flight), per label combination."""
+
+    kind = "gauge"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) - amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # Per-bucket (non-cumulative) counts plus a +Inf slot, sum, count
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        state = self._values.get(label_values)
+        return state[2] if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = self._header()
+        for label_values, (counts, total, count) in sorted(values):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, label_values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels(self.labelnames, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metric families rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every registered metric.
+
+        Returns:
+            Prometheus text exposition format
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Query pipeline metrics
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "dripdrop_stage_duration_seconds",
+    "Time spent in each query pipeline stage.",
+    ("stage",),
+))
+STAGES_IN_FLIGHT = REGISTRY.register(Gauge(
+    "dripdrop_stage_in_flight",
+    "Pipeline stages currently running.",
+    ("stage",),
+))
+QUERY_SECONDS = REGISTRY.register(Histogram(
+    "dripdrop_query_duration_seconds",
+    "End-to-end time to answer a question, by outcome.",
+    ("outcome",),
+))
+QUERIES_IN_FLIGHT = REGISTRY.register(Gauge(
+    "dripdrop_queries_in_flight",
+    "Questions currently being answered.",
+))
+QUERY_ERRORS = REGISTRY.register(Counter(
+    "dripdrop_query_errors_total",
+    "Failed questions by exception class.",
+    ("error",),
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "dripdrop_cache_lookups_total",
+    "Cache lookups by cache and outcome (hit or miss).",
+    ("cache", "outcome"),
+))
+SQL_SOURCES = REGISTRY.register(Counter(
+    "dripdrop_sql_source_total",
+    "Questions answered by each SQL path (rules, cache or llm).",
+    ("path",),
+))
+RESULT_ROWS = REGISTRY.register(Histogram(
+    "dripdrop_result_rows",
+    "Rows returned per answered question.",
+    buckets=ROW_BUCKETS,
+))
+
+
+class stage:
+    """
+    Context manager timing one pipeline stage into STAGE_SECONDS and tracking
+    it in STAGES_IN_FLIGHT. Failed stages are timed too. Inside a traced
+    request the stage is also recorded as a span (see utils/tracing.py).
+
+    Usage:
+        with stage("llm"):
+            response = client.responses.create(...)
+    """
+
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        STAGES_IN_FLIGHT.inc(self.name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end = time.perf_counter()
+        STAGE_SECONDS.observe(end - self._start, self.name)
+        STAGES_IN_FLIGHT.dec(self.name)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_span(self.name, self._start, end, exc_type.__name__ if exc_type else None)
+
+
+class track_query:
+    """
+    Context manager around answering one question: in-flight gauge,
+    end-to-end latency and error counts by exception class.
+    """
+
+    __slots__ = ("_start",)
+
+    def __enter__(self) -> "track_query":
+        QUERIES_IN_FLIGHT.inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        outcome = "ok" if exc_type is None else "error"
+        QUERY_SECONDS.observe(time.perf_counter() - self._start, outcome)
+        QUERIES_IN_FLIGHT.dec()
+        if exc_type is not None:
+            QUERY_ERRORS.inc(exc_type.__name__)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count one cache lookup."""
+    CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss")
+
+
+def record_rows(row_count: Optional[int]) -> None:
+    """Record the row count of an answered question."""
+    if row_count is not None:
+        RESULT_ROWS.observe(row_count)
@@ -0,0 +1,185 @@
+"""
+Query result formats selected by content negotiation.
+
+- json (default): {"sql", "data": {"columns", "rows"}, "warning", "source",
+  "sql_source"}, the shape the frontend's types/api.ts expects
+- columnar: the same envelope, but data is {"columns": [...], "values": [...]}
+  with one array per column
+- arrow: an Arrow IPC stream; sql/source/sql_source/warning are schema metadata
+- msgpack: {"sql", "source", "sql_source", "warning", "columns": [{"name", "dtype", "data"}]}
+  where numeric and date columns are raw little-endian buffers described by
+  a NumPy dtype string (e.g. "<f8", "<M8[s]") and other columns are arrays
+
+Columnar, Arrow and MessagePack bodies are built straight from the typed
+column arrays without creating a Python object per value.
+"""
+from typing import Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+from db.columnar import ColumnarResult
+from utils.serialization import dumps, encoded_response
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+FORMAT_JSON = "json"
+FORMAT_COLUMNAR = "columnar"
+FORMAT_ARROW = "arrow"
+FORMAT_MSGPACK = "msgpack"
+
+MEDIA_TYPES = {
+    FORMAT_JSON: "application/json",
+    FORMAT_COLUMNAR: "application/vnd.dripdrop.columnar+json",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+    FORMAT_MSGPACK: "application/msgpack",
+}
+
+_ACCEPT_FORMATS = {
+    **{media_type: name for name, media_type in MEDIA_TYPES.items()},
+    "application/x-msgpack": FORMAT_MSGPACK,
+    "application/vnd.msgpack": FORMAT_MSGPACK,
+}
+
+
+class UnsupportedFormatError(Exception):
+    """Raised when the requested result format is unknown or unavailable."""
+    pass
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """
+    Pick the response format from a `format` parameter or the Accept header.
+
+    The parameter wins; otherwise the first recognised media type in Accept
+    is used, falling back to the default JSON shape.
+
+    Args:
+        requested: Value of the `format` query parameter
+        accept: Accept header value
+
+    Returns:
+        One of the FORMAT_* names
+
+    Raises:
+        UnsupportedFormatError: If the format is unknown or its package isn't installed
+    """
+    if requested:
+        fmt = requested.strip().lower()
+        if fmt not in MEDIA_TYPES:
+            raise UnsupportedFormatError(
+                f"Unknown format '{requested}'. Supported formats: {', '.join(MEDIA_TYPES)}"
+            )
+    else:
+        fmt = FORMAT_JSON
+        for part in (accept or "").split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in _ACCEPT_FORMATS:
+                fmt = _ACCEPT_FORMATS[media_type]
+                break
+
+    if fmt == FORMAT_ARROW and pyarrow is None:
+        raise UnsupportedFormatError("Arrow output requires the pyarrow package")
+    if fmt == FORMAT_MSGPACK and msgpack is None:
+        raise UnsupportedFormatError("MessagePack output requires the msgpack package")
+    return fmt
+
+
+def _envelope(sql: str, source: str, warning: Optional[str], sql_source: Optional[str]) -> dict:
+    return {"sql": sql, "warning": warning, "source": source, "sql_source": sql_source}
+
+
+def encode_columnar(
+    result: ColumnarResult,
+    sql: str,
+    source: str,
+    warning: Optional[str],
+    sql_source: Optional[str] = None,
+) -> bytes:
+    """Encode a result as columnar JSON (NaN/Infinity become null)."""
+    data = {"columns": result.columns, "values": result.arrays}
+    return dumps({"sql": sql, "data": data, "warning": warning, "source": source, "sql_source": sql_source})
+
+
+def encode_arrow(
+    result: ColumnarResult,
+    sql: str,
+    source: str,
+    warning: Optional[str],
+    sql_source: Optional[str] = None,
+) -> bytes:
+    """Encode a result as an Arrow IPC stream (NaN becomes null)."""
+    arrays = [pyarrow.array(values, from_pandas=True) for values in result.arrays]
+    table = pyarrow.Table.from_arrays(arrays, names=result.columns)
+    metadata = {k: v for k, v in _envelope(sql, source, warning, sql_source).items() if v is not None}
+    table = table.replace_schema_metadata(metadata)
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _msgpack_column(name: str, values: np.ndarray) -> dict:
+    if values.dtype.kind in "biufM":
+        little_endian = values.astype(values.dtype.newbyteorder("<"), copy=False)
+        return {"name": name, "dtype": little_endian.dtype.str, "data": np.ascontiguousarray(little_endian).tobytes()}
+    return {"name": name, "dtype": None, "data": values.tolist()}
+
+
+def encode_msgpack(
+    result: ColumnarResult,
+    sql: str,
+    source: str,
+    warning: Optional[str],
+    sql_source: Optional[str] = None,
+) -> bytes:
+    """Encode a result as MessagePack with raw typed column buffers."""
+    content = _envelope(sql, source, warning, sql_source)
+    content["columns"] = [_msgpack_column(n, v) for n, v in zip(result.columns, result.arrays)]
+    return msgpack.packb(content, default=lambda value: value.isoformat())
+
+
+_ENCODERS = {
+    FORMAT_COLUMNAR: encode_columnar,
+    FORMAT_ARROW: encode_arrow,
+    FORMAT_MSGPACK: encode_msgpack,
+}
+
+
+def format_response(
+    fmt: str,
+    result: ColumnarResult,
+    sql: str,
+    source: str,
+    warning: Optional[str],
+    request: Optional[Request] = None,
+    sql_source: Optional[str] = None,
+) -> Response:
+    """
+    Encode a columnar result in a non-default format.
+
+    Args:
+        fmt: FORMAT_COLUMNAR, FORMAT_ARROW or FORMAT_MSGPACK
+        result: Column arrays
+        sql: Executed SQL
+        source: "range_index" or "database"
+        warning: Result quality warning, if any
+        request: Incoming request (used for Accept-Encoding)
+        sql_source: "rules", "cache" or "llm"
+
+    Returns:
+        Encoded response
+    """
+    body = _ENCODERS[fmt](result, sql, source, warning, sql_source)
+    return encoded_response(body, MEDIA_TYPES[fmt], request)
@@ -0,0 +1,131 @@
+"""
+Fast JSON responses for trusted payloads.
+
+FastAPI's default path validates the returned object against the response
+model, converts it with jsonable_encoder and then encodes it with the stdlib
+json module. For query results that is three passes over every row of data
+we produced ourselves. These helpers encode the payload directly (orjson when
+installed, stdlib json otherwise) and compress large bodies when the client
+accepts it.
+"""
+import gzip
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+from core.config import get_env
+from core.constants import RESPONSE_COMPRESSION_MIN_BYTES
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+COMPRESSION_MIN_BYTES_ENV = "RESPONSE_COMPRESSION_MIN_BYTES"
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _default(value: Any) -> Any:
+    """Encode values the stdlib json module doesn't know about."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content as compact JSON.
+
+    Datetimes are ISO 8601 strings, matching FastAPI's default encoding.
+    NaN/Infinity become null.
+
+    Args:
+        content: JSON-compatible content (tuples, datetimes and NumPy values allowed)
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _compress(body: bytes, accept_encoding: str) -> tuple[bytes, Optional[str]]:
+    """Compress a body with the best encoding the client accepts."""
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def encoded_response(
+    body: bytes,
+    media_type: str,
+    request: Optional[Request] = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    Build a response from an encoded body, compressing it when worthwhile.
+
+    Bodies larger than RESPONSE_COMPRESSION_MIN_BYTES are compressed with
+    brotli (if installed) or gzip when the request's Accept-Encoding allows.
+
+    Args:
+        body: Encoded response body
+        media_type: Content type of the body
+        request: Incoming request (used for Accept-Encoding)
+        status_code: HTTP status code
+
+    Returns:
+        Response with the (possibly compressed) body
+    """
+    headers = {"Vary": "Accept-Encoding"}
+
+    min_bytes = int(get_env(COMPRESSION_MIN_BYTES_ENV, str(RESPONSE_COMPRESSION_MIN_BYTES)))
+    if request is not None and min_bytes >= 0 and len(body) >= min_bytes:
+        body, encoding = _compress(body, request.headers.get("accept-encoding", ""))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def json_response(content: Any, request: Optional[Request] = None, status_code: int = 200) -> Response:
+    """
+    Build a JSON response without response-model validation.
+
+    Args:
+        content: Payload to encode
+        request: Incoming request (used for Accept-Encoding)
+        status_code: HTTP status code
+
+    Returns:
+        Response with the encoded body
+    """
+    return encoded_response(dumps(content), "application/json", request, status_code)
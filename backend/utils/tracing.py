@@ -0,0 +1,333 @@
+"""
+Per-request traces of the query pipeline.
+
+A Trace is created for each traced request and held in a context variable,
+so every pipeline stage timed with utils.metrics.stage() in that request
+(including stages run in the threadpool or in gathered tasks) is recorded
+as a span. Finished traces are summarized in a Server-Timing header and
+handed to the configured exporters on a background thread:
+
+- TRACE_EXPORT_PATH: append one JSON line per trace to a local file
+- OTEL_EXPORTER_OTLP_ENDPOINT (or ..._TRACES_ENDPOINT): send spans to an
+  OpenTelemetry collector with OTLP/HTTP JSON
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Protocol
+
+from core.config import get_env
+
+logger = logging.getLogger(__name__)
+
+# Environment variable names
+TRACE_EXPORT_PATH_ENV = "TRACE_EXPORT_PATH"
+OTLP_ENDPOINT_ENV = "OTEL_EXPORTER_OTLP_ENDPOINT"
+OTLP_TRACES_ENDPOINT_ENV = "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"
+SERVICE_NAME_ENV = "OTEL_SERVICE_NAME"
+DEFAULT_SERVICE_NAME = "dripdrop-backend"
+
+# Traces waiting for export beyond this are dropped rather than queued
+EXPORT_QUEUE_SIZE = 1024
+EXPORT_BATCH_SIZE = 64
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar(
+    "dripdrop_trace", default=None
+)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span(NamedTuple):
+    """One timed stage of a trace (times are time.perf_counter() seconds)."""
+    span_id: str
+    name: str
+    start: float
+    end: float
+    error: Optional[str]  # exception class name if the stage failed
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self, name: str, traceparent: Optional[str] = None):
+        """
+        Start a trace.
+
+        Args:
+            name: Root span name (e.g. "POST /query")
+            traceparent: Incoming W3C traceparent header, to join the caller's trace
+        """
+        self.name = name
+        self.trace_id = _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_span_id: Optional[str] = None
+        if traceparent:
+            parts = traceparent.strip().split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                self.trace_id, self.parent_span_id = parts[1], parts[2]
+        self.start_unix_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.spans: List[Span] = []
+
+    def add_span(self, name: str, start: float, end: float, error: Optional[str] = None) -> None:
+        """Record a finished stage (list.append is atomic, so threads and tasks can share a trace)."""
+        self.spans.append(Span(_new_id(64), name, start, end, error))
+
+    def finish(self, status_code: Optional[int] = None) -> None:
+        self.end = time.perf_counter()
+        self.status_code = status_code
+
+    def timings(self) -> Dict[str, float]:
+        """
+        Milliseconds spent per stage, summed over repeated stages, in first-seen order.
+
+        Returns:
+            Dictionary of stage name -> milliseconds
+        """
+        totals: Dict[str, float] = {}
+        for span in list(self.spans):
+            totals[span.name] = totals.get(span.name, 0.0) + (span.end - span.start) * 1000
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: one metric per stage plus the total so far.
+
+        Returns:
+            Header value, e.g. "llm;dur=812.4, database;dur=35.1, total;dur=851.0"
+        """
+        metrics = [f"{name};dur={ms}" for name, ms in self.timings().items()]
+        end = self.end if self.end is not None else time.perf_counter()
+        metrics.append(f"total;dur={round((end - self.start) * 1000, 3)}")
+        return ", ".join(metrics)
+
+    def _unix_ns(self, perf: float) -> int:
+        return self.start_unix_ns + int((perf - self.start) * 1e9)
+
+    def to_dict(self) -> dict:
+        """
+        JSON-friendly form, as written by JsonLinesExporter.
+
+        Returns:
+            Dictionary with trace metadata and spans (offsets in milliseconds)
+        """
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_unix_ms": self.start_unix_ns // 1_000_000,
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "status_code": self.status_code,
+            "spans": [
+                {
+                    "span_id": span.span_id,
+                    "name": span.name,
+                    "offset_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round((span.end - span.start) * 1000, 3),
+                    "error": span.error,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the request being handled, or None outside a traced request."""
+    return _current.get()
+
+
+def start_trace(trace: Trace) -> contextvars.Token:
+    """Make trace the current trace; pass the token to end_trace()."""
+    return _current.set(trace)
+
+
+def end_trace(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+class SpanExporter(Protocol):
+    """Destination for finished traces. export() runs on the exporter thread."""
+
+    def export(self, traces: List[Trace]) -> None:
+        ...
+
+
+class JsonLinesExporter:
+    """Appends one JSON line per trace to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, traces: List[Trace]) -> None:
+        lines = "".join(json.dumps(trace.to_dict()) + "\n" for trace in traces)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OTLPExporter:
+    """Sends traces to an OpenTelemetry collector over OTLP/HTTP with JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str = DEFAULT_SERVICE_NAME, timeout_seconds: float = 5.0):
+        """
+        Initialize the exporter.
+
+        Args:
+            endpoint: Traces URL (e.g. http://localhost:4318/v1/traces)
+            service_name: service.name resource attribute
+            timeout_seconds: Per-request timeout
+        """
+        import httpx
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(timeout=timeout_seconds)
+
+    @staticmethod
+    def _span(trace_id: str, span_id: str, parent: Optional[str], name: str, kind: int,
+              start_ns: int, end_ns: int, attributes: dict, error: bool) -> dict:
+        span = {
+            "traceId": trace_id,
+            "spanId": span_id,
+            "name": name,
+            "kind": kind,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [
+                {"key": key, "value": {"intValue": str(value)} if isinstance(value, int) else {"stringValue": str(value)}}
+                for key, value in attributes.items()
+            ],
+            # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+            "status": {"code": 2 if error else 0},
+        }
+        if parent:
+            span["parentSpanId"] = parent
+        return span
+
+    def _payload(self, traces: List[Trace]) -> dict:
+        spans = []
+        for trace in traces:
+            end = trace.end if trace.end is not None else trace.start
+            root_attributes = {"http.status_code": trace.status_code} if trace.status_code else {}
+            # SPAN_KIND_SERVER = 2, SPAN_KIND_INTERNAL = 1
+            spans.append(self._span(
+                trace.trace_id, trace.span_id, trace.parent_span_id, trace.name, 2,
+                trace.start_unix_ns, trace._unix_ns(end), root_attributes,
+                trace.status_code is not None and trace.status_code >= 500,
+            ))
+            for span in trace.spans:
+                spans.append(self._span(
+                    trace.trace_id, span.span_id, trace.span_id, span.name, 1,
+                    trace._unix_ns(span.start), trace._unix_ns(span.end),
+                    {"error.type": span.error} if span.error else {},
+                    span.error is not None,
+                ))
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}},
+                ]},
+                "scopeSpans": [{"scope": {"name": "dripdrop"}, "spans": spans}],
+            }]
+        }
+
+    def export(self, traces: List[Trace]) -> None:
+        response = self._client.post(self.endpoint, json=self._payload(traces))
+        response.raise_for_status()
+
+
+class BackgroundExporter:
+    """
+    Queues finished traces and exports them in batches on a daemon thread,
+    so a slow file system or collector never delays a response.
+    """
+
+    def __init__(self, exporters: List[SpanExporter]):
+        self.exporters = exporters
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, trace: Trace) -> None:
+        """Queue a finished trace (dropped if the queue is full)."""
+        if not self.exporters:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        """Start the export thread, again after a fork (threads don't survive it)."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.export(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def export(self, batch: List[Trace]) -> None:
+        """Hand a batch to every exporter; one failing exporter doesn't stop the others."""
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"{type(exporter).__name__} failed to export {len(batch)} traces: {e}")
+
+    def flush(self, timeout_seconds: float = 5.0) -> None:
+        """Wait until queued traces have been exported (best effort)."""
+        deadline = time.monotonic() + timeout_seconds
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+def exporter_from_env() -> BackgroundExporter:
+    """
+    Build the exporters configured in the environment.
+
+    Returns:
+        BackgroundExporter (with no exporters when nothing is configured)
+    """
+    exporters: List[SpanExporter] = []
+
+    path = get_env(TRACE_EXPORT_PATH_ENV)
+    if path:
+        exporters.append(JsonLinesExporter(path))
+
+    endpoint = get_env(OTLP_TRACES_ENDPOINT_ENV)
+    if not endpoint and get_env(OTLP_ENDPOINT_ENV):
+        endpoint = get_env(OTLP_ENDPOINT_ENV).rstrip("/") + "/v1/traces"
+    if endpoint:
+        exporters.append(OTLPExporter(endpoint, get_env(SERVICE_NAME_ENV, DEFAULT_SERVICE_NAME)))
+
+    return BackgroundExporter(exporters)
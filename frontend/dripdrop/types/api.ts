@@ -10,6 +10,9 @@ export interface QueryResponse {
   sql: string;
   data: QueryData;
   warning?: string;
+  source?: "range_index" | "database";
+  sql_source?: "rules" | "cache" | "llm";
+  timings?: Record<string, number>;
 }
 
 export type QueryData =
@@ -26,6 +29,20 @@ export interface RowsColumnsData {
 
 export interface ArrayOfObjectsData extends Array<Record<string, unknown>> {}
 
+/** Response body for POST /query?format=columnar (one array per column) */
+export interface ColumnarQueryResponse {
+  sql: string;
+  data: ColumnarData;
+  warning?: string | null;
+  source?: "range_index" | "database";
+  sql_source?: "rules" | "cache" | "llm";
+}
+
+export interface ColumnarData {
+  columns: string[];
+  values: unknown[][];
+}
+
 export interface EvalTestCase {
   name?: string;
   question: string;